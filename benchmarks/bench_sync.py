@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# sync_obsidian_to_zola.py 벤치마크
+#   python3 benchmarks/bench_sync.py --sizes 100,1000,10000 [--repeat 3] [--jobs 1]
+#   python3 benchmarks/bench_sync.py --sizes 1000 --compare benchmarks/results/<old>.json
+#   python3 benchmarks/bench_sync.py --sizes 1000 --skip-transforms --read-latency 0.005 --prefetch 0  (iCloud 흉내)
+# 합성 vault 를 만들고 main() 전체 (처음부터 / --incremental 무변경) 와 변환 함수 하나하나의
+# 시간을 잰 뒤 JSON 으로 저장 → 커밋끼리 결과 파일을 비교
+
+import os, sys, io, json, time, shutil, argparse, platform, statistics, subprocess, contextlib
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+sys.path.insert(0, HERE)
+
+import sync_obsidian_to_zola as sync
+from make_vault import ensure_vault
+
+
+# =============================================================================
+# TIMING HELPERS
+# =============================================================================
+
+def _summary(samples: list[float], calls: int = 1) -> dict:
+    out = {
+        "min_s": min(samples),
+        "median_s": statistics.median(samples),
+        "samples_s": samples,
+    }
+    if calls > 1:
+        out["calls"] = calls
+        out["per_call_us"] = min(samples) / calls * 1e6
+    return out
+
+def _run_main(argv: list[str]) -> float:
+    # main() 출력은 버림 (수천 줄의 UPDATE/DANGLING 이 시간에 섞이지 않도록)
+    with contextlib.redirect_stdout(io.StringIO()):
+        t0 = time.perf_counter()
+        sync.main(argv)
+        return time.perf_counter() - t0
+
+def _clear_caches():
+    for fn in sync.CACHED_RESOLVERS:
+        fn.cache_clear()
+    # --read-latency 는 파일마다 처음 한 번만 지연 → 처음부터 실행할 때마다 다시 "내려받지 않은" 상태로
+    sync._WARM_PATHS.clear()
+
+
+# =============================================================================
+# END-TO-END: main()
+# =============================================================================
+
+def bench_main(vault: str, dest: str, repeat: int, jobs: int, extra: list[str]) -> dict:
+    base = ["--vault", vault, "--dest", dest, "--jobs", str(jobs)] + extra
+
+    full = []
+    for _ in range(repeat):
+        shutil.rmtree(dest, ignore_errors=True)
+        os.makedirs(dest)
+        _clear_caches()
+        full.append(_run_main(base))
+
+    # 방금 만든 출력 위에서 아무것도 바뀌지 않은 --incremental 실행
+    _run_main(base + ["--incremental"])
+    incremental = [_run_main(base + ["--incremental"]) for _ in range(repeat)]
+
+    return {"full": _summary(full), "incremental_noop": _summary(incremental)}
+
+
+# =============================================================================
+# PER-TRANSFORM
+# =============================================================================
+
+def _load_docs(vault: str) -> list[dict]:
+    docs = []
+    for src_path, rel in sync.iter_vault_notes():
+        text = sync.read_file(src_path)
+        kind, head, body = sync.split_front_matter(text)
+        docs.append({
+            "src": src_path, "rel": rel, "text": text,
+            "kind": kind, "head": head, "body": body,
+            "d": sync.doc_parent_of(rel),
+        })
+    return docs
+
+# 이름 → 노트 하나에 적용할 함수
+TRANSFORMS = {
+    "split_front_matter":            lambda x: sync.split_front_matter(x["text"]),
+    "FrontMatter.parse":             lambda x: sync.FrontMatter.parse(x["kind"], x["head"]),
+    "ensure_normalized_date":        lambda x: sync.ensure_normalized_date(x["text"]),
+    "move_custom_fields_into_extra": lambda x: sync.move_custom_fields_into_extra(x["text"], x["d"], []),
+    "rewrite_media_paths":           lambda x: sync.rewrite_media_paths(x["d"], x["body"]),
+    "transform_image_blocks":        lambda x: sync.transform_image_blocks(x["d"], x["body"]),
+    "transform_markdown_images_with_directives":
+                                     lambda x: sync.transform_markdown_images_with_directives(x["d"], x["body"]),
+    "transform_disabled_links":      lambda x: sync.transform_disabled_links(x["body"]),
+    "rewrite_wikilinks_in_body":     lambda x: sync.rewrite_wikilinks_in_body(x["kind"], x["head"], x["body"], x["d"]),
+    "rewrite_footnotes_in_body":     lambda x: sync.rewrite_footnotes_in_body(x["body"], x["d"]),
+    "extract_footnotes_for_meta":    lambda x: sync.extract_footnotes_for_meta(x["body"], x["d"]),
+    "transform_body":                lambda x: sync.transform_body(x["d"], x["body"]),
+    "process_markdown":              lambda x: sync.process_markdown(x["src"], x["rel"]),
+}
+
+def bench_transforms(vault: str, dest: str, repeat: int, only: set[str] | None) -> dict:
+    sync.VAULT, sync.DEST = vault, dest
+    docs = _load_docs(vault)
+    sync.set_vault_index(sync.build_vault_index(x["rel"] for x in docs))
+
+    results = {}
+    for name, fn in TRANSFORMS.items():
+        if only and name not in only:
+            continue
+        samples = []
+        for _ in range(repeat):
+            _clear_caches()
+            sync.DANGLING_LINKS.clear()
+            t0 = time.perf_counter()
+            for x in docs:
+                fn(x)
+            samples.append(time.perf_counter() - t0)
+        results[name] = _summary(samples, calls=len(docs))
+    return results
+
+
+# =============================================================================
+# REPORTING
+# =============================================================================
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def _vault_bytes(vault: str) -> int:
+    return sum(os.path.getsize(os.path.join(dp, f)) for dp, _, fs in os.walk(vault) for f in fs)
+
+def print_table(report: dict, baseline: dict | None):
+    for size, r in report["results"].items():
+        print(f"\n== {size} notes ({r['vault_bytes'] / 1e6:.1f} MB vault) ==")
+        old = (baseline or {}).get("results", {}).get(size, {})
+        rows = [(f"main {k}", v) for k, v in r.get("main", {}).items()]
+        rows += list(r.get("transforms", {}).items())
+        for name, v in rows:
+            ref = old.get("main", {}).get(name[5:]) if name.startswith("main ") else old.get("transforms", {}).get(name)
+            delta = f"  {v['min_s'] / ref['min_s']:5.2f}x" if ref and ref.get("min_s") else ""
+            per = f"  {v['per_call_us']:9.1f} us/note" if "per_call_us" in v else ""
+            print(f"  {name:<44} {v['min_s'] * 1000:10.1f} ms{per}{delta}")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark sync_obsidian_to_zola.py on synthetic vaults.")
+    ap.add_argument("--sizes", default="100,1000", help="comma-separated note counts (default: 100,1000)")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--jobs", "-j", type=int, default=1, help="passed to main() as --jobs")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workdir", default=os.path.join(HERE, ".work"),
+                    help="where synthetic vaults and outputs live (vaults are reused between runs)")
+    ap.add_argument("--only", default="", help="comma-separated transform names to run (default: all)")
+    ap.add_argument("--skip-main", action="store_true", help="only time the individual transforms")
+    ap.add_argument("--skip-transforms", action="store_true", help="only time main()")
+    ap.add_argument("--read-latency", type=float, default=0.0, metavar="SEC",
+                    help="passed to main() as --read-latency (artificial first-read delay per vault file)")
+    ap.add_argument("--prefetch", type=int, default=None, metavar="N", help="passed to main() as --prefetch")
+    ap.add_argument("--cache", action="store_true",
+                    help="let main() use the transform cache (default: --no-cache, so repeats measure rendering)")
+    ap.add_argument("--out", default="", help="JSON result path (default: benchmarks/results/<commit>-<time>.json)")
+    ap.add_argument("--compare", default="", metavar="JSON", help="earlier result file to print ratios against")
+    args = ap.parse_args(argv)
+
+    only = set(filter(None, args.only.split(","))) or None
+    extra = ["--read-latency", str(args.read_latency)] if args.read_latency else []
+    if args.prefetch is not None:
+        extra += ["--prefetch", str(args.prefetch)]
+    if not args.cache:
+        extra.append("--no-cache")
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": args.repeat, "jobs": args.jobs, "seed": args.seed,
+            "read_latency": args.read_latency, "prefetch": args.prefetch, "cache": args.cache,
+        },
+        "results": {},
+    }
+
+    for size in [int(s) for s in args.sizes.split(",") if s]:
+        vault = os.path.join(args.workdir, f"vault-{size}")
+        dest = os.path.join(args.workdir, f"site-{size}")
+        t0 = time.perf_counter()
+        info = ensure_vault(vault, size, args.seed)
+        print(f"vault {size}: {info['notes']} notes ready in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+
+        r = {"notes": info["notes"], "media_images": info["media_images"], "vault_bytes": _vault_bytes(vault)}
+        if not args.skip_main:
+            r["main"] = bench_main(vault, dest, args.repeat, args.jobs, extra)
+        if not args.skip_transforms:
+            r["transforms"] = bench_transforms(vault, dest, args.repeat, only)
+        report["results"][str(size)] = r
+
+    out = args.out or os.path.join(HERE, "results", f"{report['meta']['commit']}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_table(report, baseline)
+    print(f"\nwrote {out}")
+
+if __name__ == "__main__":
+    main()
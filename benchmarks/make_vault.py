@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# 벤치마크용 합성 Obsidian vault 생성기
+#   python3 benchmarks/make_vault.py OUT_DIR --notes 1000 [--seed 0]
+# 실제 vault 와 같은 모양: .md/.kr.md 쌍, 섹션별 media/ 폴더, 위키링크, 각주,
+# :::images 블록, 제목 지시어가 붙은 이미지, YAML/TOML 프런트매터
+
+import os, random, shutil, struct, zlib, argparse, json
+
+
+# =============================================================================
+# SHAPE OF THE VAULT
+# =============================================================================
+
+GENERATOR_VERSION = 1
+
+# (섹션 폴더, 문서 번호 접두어, 카테고리 라벨)
+SECTIONS = [
+    ("glossary",               "GL", "Glossary"),
+    ("method",                 "MT", "Method"),
+    ("thought",                "TH", "Thought"),
+    ("shop",                   "SH", "Shop"),
+    ("works/project",          "PR", "Project"),
+    ("works/workshop",         "WS", "Workshop"),
+    ("works/workshop-practice", "WP", "Workshop Practice"),
+]
+
+TOML_SHARE      = 0.3    # 나머지는 YAML
+MEDIA_DIR_SHARE = 0.25   # 자기 media/<slug>/ 폴더를 가진 노트 비율
+IMAGE_SIZES     = [(640, 480), (1200, 800), (1600, 1067), (2000, 1333), (800, 1200), (1080, 1080)]
+
+WORDS_EN = ("silhouette flower picture method archive surface image field note web document "
+            "practice workshop twelve combination index layer strike light paper").split()
+WORDS_KR = ("실루엣 꽃 사진 방법 기록 표면 이미지 현장 노트 웹 문서 실천 워크숍 열둘 조합 "
+            "색인 층 파업 빛 종이").split()
+
+
+# =============================================================================
+# MEDIA FILES
+# =============================================================================
+
+def _png_bytes(w: int, h: int) -> bytes:
+    # 디코딩 가능한 회색조 PNG (내용은 0 이라 압축 후 크기는 작음)
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+    raw = (b"\x00" + b"\x00" * w) * h
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, 0, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw, 9))
+            + chunk(b"IEND", b""))
+
+def _webp_bytes(w: int, h: int, pad: int) -> bytes:
+    # VP8X 헤더만 있는 WebP (캔버스 크기는 읽히지만 디코딩은 안 됨) + 실제 파일 크기를 흉내 내는 padding
+    vp8x = b"VP8X" + struct.pack("<I", 10) + b"\x00\x00\x00\x00" + (w - 1).to_bytes(3, "little") + (h - 1).to_bytes(3, "little")
+    pad_chunk = b"JUNK" + struct.pack("<I", pad) + b"\x00" * pad
+    body = b"WEBP" + vp8x + pad_chunk
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+class MediaFactory:
+    def __init__(self, rnd: random.Random):
+        self.rnd = rnd
+        self._png = {}
+
+    def image(self, path: str) -> tuple[int, int]:
+        w, h = self.rnd.choice(IMAGE_SIZES)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if path.endswith(".png"):
+            if (w, h) not in self._png:
+                self._png[(w, h)] = _png_bytes(w, h)
+            data = self._png[(w, h)]
+        else:
+            data = _webp_bytes(w, h, self.rnd.randint(2_000, 30_000) & ~1)
+        with open(path, "wb") as f:
+            f.write(data)
+        return w, h
+
+    def blob(self, path: str, size: int):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(os.urandom(size))
+
+
+# =============================================================================
+# NOTE TEXT
+# =============================================================================
+
+def _sentence(rnd: random.Random, words: list[str], n: int) -> str:
+    return " ".join(rnd.choice(words) for _ in range(n)).capitalize()
+
+def _wikilink(rnd: random.Random, docs: list[tuple[str, str]], here: str) -> str:
+    sec, doc_id = rnd.choice(docs)
+    style = rnd.random()
+    if style < 0.35:
+        return f"[[{doc_id}]]"                                   # 최단 경로
+    if style < 0.6:
+        return f"[[{sec}/{doc_id}|{doc_id.lower()}]]"            # vault 절대 경로 + 별칭
+    if style < 0.75:
+        return f"[[{sec}/{doc_id}.kr]]"                          # 한국어 쪽
+    if style < 0.85 and sec == here:
+        return f"[[./{doc_id}#Intro]]"                           # 같은 폴더 + 제목 앵커
+    if style < 0.95:
+        return f"[[{sec}/{doc_id}]]"
+    return "[[missing/NOPE]]"                                    # 끊어진 링크
+
+def _front_matter(rnd, kind, title, doc_id, n, category, sec, thumb, links, kr):
+    date = f"{rnd.randint(2015, 2025)}.{rnd.randint(1, 12)}.{rnd.randint(1, 28)}"
+    if kind == "toml":
+        lines = [
+            f'title = "{title}"',
+            f'date = {date.replace(".", "-") if rnd.random() < 0.5 else chr(34) + date + chr(34)}',
+            f'doc_no = {n}',
+            f'category = "[[{sec}/_index|{category}]]"',
+            f'date_sort = "{date}"',
+        ]
+        if thumb:
+            lines.append(f'thumbnail = "[[{thumb}]]"')
+        if links:
+            lines.append(f'link = "{links[0]}"')
+        lines += ["", "[extra]", f'lang = "{"kr" if kr else "en"}"']
+        return "+++\n" + "\n".join(lines) + "\n+++\n"
+
+    lines = [
+        f'title: "{title}"',
+        f"date: {date}" if rnd.random() < 0.8 else f"date_sort: {date}",
+        f"doc_no: {n}",
+        f'category: "[[{sec}/_index|{category}]]"',
+    ]
+    if thumb:
+        lines.append(f'thumbnail: "[[{thumb}]]"')
+    for link in links:
+        lines.append(f'link: "{link}"')
+    if rnd.random() < 0.6:
+        lines.append("meta_description:")
+        lines.append(f'  - "{_sentence(rnd, WORDS_KR if kr else WORDS_EN, 8)} {links[0] if links else ""}"')
+        lines.append("  - see https://example.com/" + doc_id.lower())
+    return "---\n" + "\n".join(lines) + "\n---\n"
+
+def _body(rnd, words, docs, sec, doc_id, images, files):
+    out = []
+    n_fn = 0
+    for p in range(rnd.randint(3, 9)):
+        parts = [_sentence(rnd, words, rnd.randint(8, 30))]
+        for _ in range(rnd.randint(0, 3)):
+            parts.append(_wikilink(rnd, docs, sec))
+        if rnd.random() < 0.3:
+            n_fn += 1
+            parts.append(f"note[^{n_fn}]")
+        if rnd.random() < 0.15:
+            parts.append("[soon](#disabled)")
+        if rnd.random() < 0.2:
+            parts.append(f"https://example.org/{doc_id.lower()}/{p}")
+        out.append(" ".join(parts) + ".")
+
+        if images and rnd.random() < 0.4:
+            img = rnd.choice(images)
+            directive = rnd.choice(["", ' "fixed=720; caption: Figure"', ' "max=480px"', ' "full;plain"'])
+            out.append(f"![{doc_id} figure](media/{img}{directive})")
+        if len(images) >= 2 and rnd.random() < 0.2:
+            picks = rnd.sample(images, min(len(images), rnd.randint(2, 4)))
+            out.append(":::images\n" + "\n".join(f"![{i}](media/{m})" for i, m in enumerate(picks))
+                       + f"\ncaption: {_sentence(rnd, words, 4)}\n:::")
+
+    if files and rnd.random() < 0.5:
+        out.append(f"Download [file](media/{rnd.choice(files)}).")
+    if rnd.random() < 0.1:
+        out.append("```\n![code](media/not-rewritten.webp)\n[[not/a/link]]\n```")
+    for i in range(1, n_fn + 1):
+        out.append(f"[^{i}]: {_sentence(rnd, words, 6)} {_wikilink(rnd, docs, sec)}")
+    return "\n\n".join(out) + "\n"
+
+
+# =============================================================================
+# GENERATOR
+# =============================================================================
+
+def make_vault(out: str, notes: int, seed: int = 0) -> dict:
+    rnd = random.Random(seed)
+    media = MediaFactory(rnd)
+    if os.path.isdir(out):
+        shutil.rmtree(out)
+
+    pairs = max(1, notes // 2)
+    docs = []
+    for i in range(pairs):
+        sec, prefix, _ = SECTIONS[i % len(SECTIONS)]
+        docs.append((sec, f"{prefix}-{i // len(SECTIONS) + 1:03d}"))
+
+    # 섹션마다 썸네일 몇 장과 첨부 파일 하나 (실제 vault 의 media/thumbnail, media/files 처럼)
+    thumbs, files = {}, {}
+    for sec, prefix, _ in SECTIONS:
+        thumbs[sec] = []
+        for k in range(4):
+            rel = f"thumbnail/thumbnail_{prefix.lower()}_{k:02d} cover.webp"
+            media.image(os.path.join(out, sec, "media", rel))
+            thumbs[sec].append(rel)
+        files[sec] = [f"files/{prefix}-kit.zip"]
+        media.blob(os.path.join(out, sec, "media", files[sec][0]), rnd.randint(50_000, 500_000))
+        with open(os.path.join(out, sec, "media", ".DS_Store"), "wb") as f:
+            f.write(b"\x00\x00\x00\x01Bud1")
+
+    n_files = n_media = 0
+    for n, (sec, doc_id) in enumerate(docs, 1):
+        slug = doc_id.lower()
+        images = []
+        if rnd.random() < MEDIA_DIR_SHARE:
+            for k in range(rnd.randint(2, 6)):
+                ext = "png" if rnd.random() < 0.2 else "webp"
+                rel = f"{slug}/{slug} silhouette {k:02d}.{ext}"
+                media.image(os.path.join(out, sec, "media", rel))
+                images.append(rel)
+            n_media += len(images)
+
+        category = next(c for s, _, c in SECTIONS if s == sec)
+        kind = "toml" if rnd.random() < TOML_SHARE else "yaml"
+        thumb = rnd.choice(thumbs[sec]) if rnd.random() < 0.7 else ""
+        links = [_wikilink(rnd, docs, sec).replace('"', "") for _ in range(rnd.randint(0, 2))]
+
+        for kr in (False, True):
+            words = WORDS_KR if kr else WORDS_EN
+            title = _sentence(rnd, words, 3)
+            text = (_front_matter(rnd, kind, title, doc_id, n, category, sec, thumb and f"media/{thumb}", links, kr)
+                    + _body(rnd, words, docs, sec, doc_id, images, files[sec]))
+            path = os.path.join(out, sec, f"{doc_id}{'.kr' if kr else ''}.md")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+            n_files += 1
+
+    # 건너뛰어야 하는 섹션 index 노트
+    for sec in ("about", "contact"):
+        for suffix in ("", ".kr"):
+            path = os.path.join(out, sec, f"index{suffix}.md")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(f'---\ntitle: "{sec}"\n---\n{sec} page\n')
+
+    info = {"version": GENERATOR_VERSION, "seed": seed, "notes": n_files, "media_images": n_media}
+    with open(os.path.join(out, ".bench-vault.json"), "w", encoding="utf-8") as f:
+        json.dump(info, f)
+    return info
+
+def ensure_vault(out: str, notes: int, seed: int = 0) -> dict:
+    # 같은 크기/시드/버전으로 이미 만들어 둔 vault 는 재사용
+    try:
+        with open(os.path.join(out, ".bench-vault.json"), encoding="utf-8") as f:
+            info = json.load(f)
+        if info.get("version") == GENERATOR_VERSION and info.get("seed") == seed \
+                and info.get("notes") == max(1, notes // 2) * 2:
+            return info
+    except (OSError, ValueError):
+        pass
+    return make_vault(out, notes, seed)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Generate a synthetic Obsidian vault for benchmarking the sync.")
+    ap.add_argument("out", help="directory to (re)create")
+    ap.add_argument("--notes", type=int, default=1000, help="number of note files (.md + .kr.md; default: 1000)")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+    info = make_vault(args.out, args.notes, args.seed)
+    print(f"{info['notes']} notes, {info['media_images']} media images → {args.out}")
+
+if __name__ == "__main__":
+    main()
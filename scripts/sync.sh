@@ -1,2 +1,4 @@
 #!/bin/bash
+# 배포 전에 반드시 실행: content/ 와 static/media 뿐 아니라 allarchive.html, page.html 이 받는
+# static/archive/<lang>.json, static/search/**, static/preview/** 도 이 스크립트가 만듦 (같이 커밋)
 python3 /Users/jaehyeonlee/web/j-h/scripts/sync_obsidian_to_zola.py
@@ -1,7 +1,14 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import os, re, shutil, pathlib, sys
+import os, re, shutil, pathlib, sys, json, hashlib, argparse, ctypes, threading, time, struct, io, base64, difflib, fnmatch
+import concurrent.futures
+import urllib.parse
+import contextlib
+import tomllib
+import sqlite3
+import functools
+from html import unescape as html_unescape
 
 
 # =============================================================================
@@ -116,6 +123,11 @@ WIKILINK_ONE_RE    = re.compile(r'^\[\[\s*([^\]|]+?)(?:\|([^\]]+))?\s*\]\]$')
 
 KEYVAL_LINE_TOML = re.compile(r'^\s*([A-Za-z0-9_\-]+)\s*=\s*(.+?)\s*$')
 KEYVAL_LINE_YAML = re.compile(r'^\s*([A-Za-z0-9_\-]+)\s*:\s*(.+?)\s*$')
+YAML_BLOCK_KEY_RE = re.compile(r'^\s*([A-Za-z0-9_\-]+)\s*:\s*$')
+YAML_EXTRA_KEY_RE = re.compile(r'^\s*extra\s*:\s*$')
+TOML_TABLE_RE = re.compile(r'^\s*\[([^\[\]]+)\]\s*$')
+TOML_EXTRA_TABLE_RE = re.compile(r'^\s*\[extra\]\s*$')
+TOML_DATE_LINE_RE = re.compile(r'^\s*date\s*=\s*(.+?)\s*$')
 
 FOOTNOTE_DEF_RE = re.compile(
     r'^\[\^([^\]]+)\]:\s*(.+)$',
@@ -124,6 +136,108 @@ FOOTNOTE_DEF_RE = re.compile(
 
 URL_RE = re.compile(r'(?<!\]\()(https?://[^\s<>"\']+)')
 
+URL_SCHEME_RE = re.compile(r'^https?://')
+WIKILINK_TARGET_RE = re.compile(r'\[\[\s*([^\]|]+)')
+YAML_LIST_ITEM_RE = re.compile(r'^\s*-\s*(.+)\s*$')
+DIGITS_RE = re.compile(r"\d+")
+
+
+# =============================================================================
+# PROFILING (--profile)
+# =============================================================================
+
+PROFILE = False
+_PROFILE_LOCK = threading.Lock()
+PROFILE_STAGES: dict[str, list] = {}  # 단계 이름 → [호출 수, 누적 초]
+PROFILE_IO = dict.fromkeys(
+    ("bytes_read", "bytes_written", "files_written", "bytes_hashed",
+     "files_copied", "bytes_copied", "files_linked"), 0)
+PROFILE_WORKERS: dict[int, dict] = {}  # pid → 워커 프로세스의 누적 stages/io
+NOTE_SECONDS: dict[str, float] = {}
+MEDIA_DIR_STATS: dict[str, dict] = {}
+
+@contextlib.contextmanager
+def profile_stage(name: str):
+    if not PROFILE:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        dt = time.perf_counter() - t0
+        with _PROFILE_LOCK:
+            st = PROFILE_STAGES.setdefault(name, [0, 0.0])
+            st[0] += 1
+            st[1] += dt
+
+def _count_io(key: str, n: int = 1):
+    if PROFILE:
+        with _PROFILE_LOCK:
+            PROFILE_IO[key] += n
+
+def reset_profile():
+    PROFILE_STAGES.clear()
+    PROFILE_IO.update(dict.fromkeys(PROFILE_IO, 0))
+    PROFILE_WORKERS.clear()
+    NOTE_SECONDS.clear()
+    MEDIA_DIR_STATS.clear()
+
+def _profile_snapshot() -> dict:
+    with _PROFILE_LOCK:
+        return {"stages": {k: list(v) for k, v in PROFILE_STAGES.items()}, "io": dict(PROFILE_IO)}
+
+def profile_report(wall_seconds: float, top: int = 10) -> dict:
+    # 이 프로세스 + 워커 프로세스들의 누적값을 합침 (워커 단계 시간은 프로세스별 합)
+    stages, io = {}, dict.fromkeys(PROFILE_IO, 0)
+    for snap in [_profile_snapshot(), *PROFILE_WORKERS.values()]:
+        for name, (calls, secs) in snap["stages"].items():
+            st = stages.setdefault(name, {"calls": 0, "seconds": 0.0})
+            st["calls"] += calls
+            st["seconds"] += secs
+        for k, v in snap["io"].items():
+            io[k] += v
+
+    slowest = sorted(NOTE_SECONDS.items(), key=lambda kv: -kv[1])[:top]
+    largest = sorted(MEDIA_DIR_STATS.items(), key=lambda kv: (-kv[1]["bytes"], kv[0]))[:top]
+    return {
+        "wall_seconds": wall_seconds,
+        "jobs": JOBS,
+        "stages": stages,
+        "io": io,
+        "notes": len(NOTE_SECONDS),
+        "slowest_notes": [{"note": rel, "seconds": secs} for rel, secs in slowest],
+        "largest_media_dirs": [{"dir": d or ".", **st} for d, st in largest],
+    }
+
+def _fmt_bytes(n: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+
+def print_profile(report: dict):
+    print(f"\nprofile: {report['wall_seconds'] * 1000:.1f} ms wall, jobs={report['jobs']}"
+          f" (note.* stages are summed over worker processes)")
+    print(f"  {'stage':<24}{'calls':>8}{'total ms':>12}{'avg ms':>10}")
+    for name, st in report["stages"].items():
+        print(f"  {name:<24}{st['calls']:>8}{st['seconds'] * 1000:>12.1f}"
+              f"{st['seconds'] * 1000 / max(1, st['calls']):>10.2f}")
+
+    io = report["io"]
+    print(f"  read {_fmt_bytes(io['bytes_read'])}, wrote {_fmt_bytes(io['bytes_written'])}"
+          f" in {io['files_written']} files, hashed {_fmt_bytes(io['bytes_hashed'])}")
+    print(f"  media: {io['files_copied']} copied ({_fmt_bytes(io['bytes_copied'])}), {io['files_linked']} linked")
+
+    if report["slowest_notes"]:
+        print("  slowest notes:")
+        for it in report["slowest_notes"]:
+            print(f"    {it['seconds'] * 1000:9.2f} ms  {it['note']}")
+    if report["largest_media_dirs"]:
+        print("  largest media dirs:")
+        for it in report["largest_media_dirs"]:
+            print(f"    {_fmt_bytes(it['bytes']):>10}  {it['files']:>5} files {it['seconds'] * 1000:9.1f} ms  {it['dir']}")
+
 
 # =============================================================================
 # BASIC FILE UTILITIES
@@ -131,21 +245,211 @@ URL_RE = re.compile(r'(?<!\]\()(https?://[^\s<>"\']+)')
 
 def read_file(p):
     with open(p, "r", encoding="utf-8") as f:
-        return f.read()
+        s = f.read()
+        if PROFILE:
+            _count_io("bytes_read", os.fstat(f.fileno()).st_size)
+        return s
+
+# 디스크를 바꾸는 일 (쓰기, media 배치, 삭제) 은 모두 SINK 를 거침 → --dry-run 은 DryRunSink 로 기록만
+class FileSink:
+    dry = False
+
+    def write(self, p: str, s: str):
+        os.makedirs(os.path.dirname(p), exist_ok=True)
+        with open(p, "w", encoding="utf-8") as f:
+            f.write(s)
+            if PROFILE:
+                _count_io("bytes_written", f.tell())
+                _count_io("files_written")
+
+    def place(self, sp: str, dp: str) -> str:
+        return _place_file(sp, dp)
+
+    def replace(self, sp: str, dp: str):
+        os.makedirs(os.path.dirname(dp), exist_ok=True)
+        os.replace(sp, dp)
+
+    def remove(self, p: str):
+        os.remove(p)
+
+class DryRunSink(FileSink):
+    dry = True
+
+    def __init__(self):
+        # DEST 기준 경로 → {"op": create/modify/delete, "bytes": n, ("old", "new"): 글 내용}
+        self.changes: dict[str, dict] = {}
+        self.written: set[str] = set()   # 내용이 같아 바뀌지 않는 것까지 포함한 출력 목록
+
+    def _rel(self, p: str) -> str:
+        rel = os.path.relpath(p, DEST).replace("\\", "/")
+        return rel[len(STAGING_DIR) + 1:] if rel.startswith(STAGING_DIR + "/") else rel
+
+    def write(self, p: str, s: str):
+        rel = self._rel(p)
+        self.written.add(rel)
+        live = os.path.join(DEST, rel)
+        if same_file_text(live, s):
+            return
+        old = read_file(live) if os.path.isfile(live) else None
+        self.changes[rel] = {"op": "modify" if old is not None else "create",
+                             "bytes": len(s.encode("utf-8")), "old": old, "new": s}
+
+    def place(self, sp: str | None, dp: str) -> str:
+        # sp 가 None 이면 아직 만들어지지 않은 파생본 (크기 모름)
+        rel = self._rel(dp)
+        self.written.add(rel)
+        self.changes[rel] = {"op": "modify" if os.path.isfile(dp) else "create",
+                             "bytes": os.path.getsize(sp) if sp else None}
+        return "copied"
+
+    def replace(self, sp: str, dp: str):
+        pass
+
+    def remove(self, p: str):
+        self.changes[self._rel(p)] = {"op": "delete", "bytes": os.path.getsize(p)}
+
+    def take(self) -> tuple[dict, set]:
+        # 워커 프로세스가 기록한 내용을 부모에게 넘길 때
+        out = (self.changes, self.written)
+        self.changes, self.written = {}, set()
+        return out
+
+    def merge(self, changes: dict, written: set):
+        self.changes.update(changes)
+        self.written |= written
+
+SINK = FileSink()
+
+def op_label(op: str) -> str:
+    # --dry-run 에서는 실제로 하지 않은 일이므로 "WOULD UPDATE" 처럼 표시
+    return f"WOULD {op}" if SINK.dry else op
 
 def write_file(p, s):
-    os.makedirs(os.path.dirname(p), exist_ok=True)
-    with open(p, "w", encoding="utf-8") as f:
-        f.write(s)
+    SINK.write(p, s)
+
+def same_file_text(p, s) -> bool:
+    data = s.encode("utf-8")
+    try:
+        if os.path.getsize(p) != len(data):
+            return False
+        with open(p, "rb") as f:
+            return f.read() == data
+    except OSError:
+        return False
+
+def write_file_if_changed(p, s) -> bool:
+    # 내용이 같으면 건드리지 않고 (mtime 유지 → zola 재빌드 없음), 다르면 임시 파일 + os.replace
+    if same_file_text(p, s):
+        return False
+    if SINK.dry:
+        SINK.write(p, s)
+        return True
+    tmp = p + ".sync-tmp"
+    write_file(tmp, s)
+    os.replace(tmp, p)
+    return True
+
+def cache_hit(cache: dict, key: str, value) -> tuple | None:
+    # cache[key] = (value, 파생값...) 중 value 가 지난번과 같으면 그 항목. 보통은 같은 객체인지만 보고
+    # (manifest 항목 등은 바뀔 때마다 새 객체로 바뀜), 다른 객체면 내용을 비교 (--watch 시작 때 manifest 를 다시 읽은 경우)
+    hit = cache.get(key)
+    if hit is None or hit[0] is value:
+        return hit
+    if hit[0] == value:
+        hit = cache[key] = (value, *hit[1:])
+        return hit
+    return None
+
+def dumps_cached(key: str, value, cache: dict, with_key: bool = False, sort_keys: bool = True) -> str:
+    # value 가 지난번 (같은 key) 과 같으면 cache 에 둔 JSON 을 그대로 씀 — --watch 에서는 바뀐 항목만 다시 직렬화
+    hit = cache_hit(cache, key, value)
+    if hit is None:
+        text = json.dumps(value, ensure_ascii=False, separators=(",", ":"), sort_keys=sort_keys)
+        hit = cache[key] = (value, f"{json.dumps(key, ensure_ascii=False)}:{text}" if with_key else text)
+    return hit[1]
+
+def dumps_entries(entries: dict, cache: dict) -> str:
+    # 경로 → dict 를 경로 순 JSON 객체로 (항목은 "경로":{...} 째로 dumps_cached)
+    for k in cache.keys() - entries.keys():
+        del cache[k]
+    return "{" + ",".join([dumps_cached(k, entries[k], cache, with_key=True) for k in sorted(entries)]) + "}"
+
+def _hash_file(p: str) -> str:
+    h = hashlib.sha1()
+    with open(p, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+        if PROFILE:
+            _count_io("bytes_hashed", f.tell())
+    return h.hexdigest()
 
 def is_subsection(section_rel: str) -> bool:
     return "/" in section_rel if section_rel else False
 
 
+# =============================================================================
+# VAULT READS (READ-AHEAD PREFETCH)
+# =============================================================================
+# iCloud vault 는 처음 읽을 때 file provider 가 내려받느라 read 하나가 오래 멈출 수 있음
+# → 곧 읽을 원본을 스레드에서 최대 PREFETCH 개까지 미리 읽어 두어, 느린 읽기가 앞 노트의 변환과 겹치도록
+# READ_LATENCY 는 파일마다 처음 읽을 때 넣는 인공 지연 (iCloud 없이 로컬 폴더로 확인할 때, --read-latency)
+
+PREFETCH = 8              # 0 이면 미리 읽지 않음
+PREFETCH_MEDIA = False    # media 도 미리 읽어 둠 (내려받기만 하고 내용은 버림, --prefetch-media)
+READ_LATENCY = 0.0
+_WARM_PATHS: set[str] = set()
+
+def _cold_stall(p: str):
+    # 한 번 내려받은 파일은 로컬에 남으므로 지연은 파일마다 처음 한 번만
+    if READ_LATENCY and p not in _WARM_PATHS:
+        time.sleep(READ_LATENCY)
+        _WARM_PATHS.add(p)
+
+def read_source(p: str) -> bytes:
+    _cold_stall(p)
+    with open(p, "rb") as f:
+        data = f.read()
+    _count_io("bytes_read", len(data))
+    return data
+
+def decode_source(data: bytes) -> str:
+    # open(p, "r") 로 읽은 것과 같게 (universal newlines)
+    return data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+
+def read_note(p: str) -> str:
+    return decode_source(read_source(p))
+
+def warm_source(p: str) -> None:
+    _cold_stall(p)
+    with open(p, "rb") as f:
+        while f.read(1 << 20):
+            pass
+
+def read_ahead(paths, reader=read_source, depth: int | None = None):
+    # paths 순서대로 (path, reader(path)) 를 내보냄. 읽는 중이거나 아직 소비되지 않은 결과는 최대 depth 개
+    paths = list(paths)
+    depth = PREFETCH if depth is None else depth
+    if depth <= 0 or len(paths) < 2:
+        for p in paths:
+            yield p, reader(p)
+        return
+    with concurrent.futures.ThreadPoolExecutor(max_workers=depth, thread_name_prefix="read-ahead") as ex:
+        pending = {i: ex.submit(reader, paths[i]) for i in range(min(depth, len(paths)))}
+        for i, p in enumerate(paths):
+            fut = pending.pop(i)
+            if i + depth < len(paths):
+                pending[i + depth] = ex.submit(reader, paths[i + depth])
+            yield p, fut.result()
+
+
 # =============================================================================
 # MEDIA PATH HANDLING
 # =============================================================================
 
+# 같은 (경로, 문서 폴더) 쌍이 문서마다 반복되므로 해석 결과를 캐시
+RESOLVER_CACHE_SIZE = 8192
+
+@functools.lru_cache(maxsize=RESOLVER_CACHE_SIZE)
 def to_web_media_path(doc_parent_rel: str, media_rel: str) -> str:
     s = (media_rel or "").strip()
     if not s:
@@ -172,42 +476,330 @@ def to_web_media_path(doc_parent_rel: str, media_rel: str) -> str:
     return media_rel
 
 
+NOTE_MEDIA: set[str] = set()   # 렌더링 중인 노트가 참조하는 /media/ 경로 (노트마다 비움)
+NOTE_MEDIA_EMBEDS: set[str] = set()   # 그중 페이지에 바로 실리는 것 (이미지, <video src>, thumbnail 등. 링크는 제외)
+NOTE_MEDIA_URLS: dict[str, str] = {}   # 그중 정본/배포 경로로 바꾼 것 (노트마다 비움)
+HTML_MEDIA_ATTR_RE = re.compile(r'\b(?:src|href|poster|data)="(/media/[^"]+)"')
+LINK_TITLE_RE = re.compile(r"""\s+["'(].*$""", re.S)   # (href "title") 의 title 부분
+
+def media_ref(href: str, embed: bool = True) -> str:
+    # 해석한 /media/ 경로를 기록 → 참조된 파일만 복사하고, vault 에 없는 파일은 알려줌
+    # embed=False: 내려받기 링크 ([파일](media/x.zip)) 처럼 페이지를 열 때 받지 않는 참조 (페이지 무게에서 제외)
+    # 다른 media 폴더에 같은 내용의 파일이 있으면 정본 경로로, --fingerprint-media 면 해시가 붙은 이름으로 바꿈
+    if href.startswith("/media/"):
+        path = LINK_TITLE_RE.sub("", href).split("#", 1)[0].split("?", 1)[0]
+        web = urllib.parse.unquote(path)
+        web = MEDIA_LOGICAL.get(web, web)   # 앞 단계에서 이미 배포 경로로 바뀐 참조
+        NOTE_MEDIA.add(web)
+        if embed:
+            NOTE_MEDIA_EMBEDS.add(web)
+        url = published_media_path(web)
+        if url != web:
+            NOTE_MEDIA_URLS[web] = url
+            href = (urllib.parse.quote(url, safe="/") if "%" in path else url) + href[len(path):]
+    return href
+
+def _html_media_repl(m) -> str:
+    return m.group(0)[:m.start(1) - m.start(0)] + media_ref(m.group(1), not m.group(0).startswith("href")) + '"'
+
+def rewrite_html_media_attrs(body: str) -> str:
+    # 본문에 직접 쓴 HTML (<video src=...> 등) 의 /media/ 참조 (코드 블록/인라인 코드는 그대로)
+    out, pos = [], 0
+    for m in LINK_SCAN_CODE_RE.finditer(body):
+        out.append(HTML_MEDIA_ATTR_RE.sub(_html_media_repl, body[pos:m.start()]))
+        out.append(m.group(0))
+        pos = m.end()
+    out.append(HTML_MEDIA_ATTR_RE.sub(_html_media_repl, body[pos:]))
+    return "".join(out)
+
 def rewrite_media_paths(doc_rel_dir: str, text: str) -> str:
     def repl_img(m):
         alt, mrel, title = m.group(1) or "", m.group(2) or "", m.group(3) or ""
-        abs_src = to_web_media_path(doc_rel_dir, mrel)
+        abs_src = media_ref(to_web_media_path(doc_rel_dir, mrel))
         return f'![{alt}]({abs_src} "{title}")' if title else f'![{alt}]({abs_src})'
 
     def repl_link(m):
         label, mrel = m.group(1), m.group(2)
-        return f'[{label}]({to_web_media_path(doc_rel_dir, mrel)})'
+        return f'[{label}]({media_ref(to_web_media_path(doc_rel_dir, mrel), embed=False)})'
 
     text = IMG_LINK_RE.sub(repl_img, text)
     text = LINK_RE.sub(repl_link, text)
     return text
 
 
-def copy_media_folder(src_doc_dir: str, doc_parent_rel: str):
+LINK_MEDIA = True
+MEDIA_STATS = {"copied": 0, "linked": 0, "unchanged": 0, "removed": 0, "skipped": 0}
+
+# media/ 폴더에서 노트가 참조하는 파일만 static/media 로 (참조되지 않은 파일은 prune 에서 제거)
+MEDIA_ALL = False                      # --all-media: 참조와 상관없이 폴더 전체 (예전 동작)
+MEDIA_ALLOW = ["*.zip", "*.otf", "*.ttf", "*.woff", "*.woff2", "*.pdf"]   # 참조가 없어도 복사 (내려받기 파일)
+MEDIA_JUNK = (".ds_store", "thumbs.db", "desktop.ini", "._*", "*.sync-tmp")  # 어떤 경우에도 복사하지 않음
+MEDIA_WANTED: set[str] = set()         # 이번 실행에서 노트들이 참조하는 /media/ 경로
+
+def set_media_wanted(refs):
+    global MEDIA_WANTED
+    MEDIA_WANTED = {MEDIA_CANONICAL.get(r, r) for r in refs}
+
+def _is_media_junk(name: str) -> bool:
+    return any(fnmatch.fnmatchcase(name.lower(), pat) for pat in MEDIA_JUNK)
+
+def media_wanted(web: str) -> bool:
+    name = web.rsplit("/", 1)[-1].lower()
+    if _is_media_junk(name) or web in MEDIA_CANONICAL:
+        return False
+    return MEDIA_ALL or web in MEDIA_WANTED or any(fnmatch.fnmatchcase(name, pat) for pat in MEDIA_ALLOW)
+
+def media_refs_fingerprint(doc_parent_rel: str) -> str:
+    # 이 media 폴더에서 복사할 파일을 정하는 값 (참조 목록, 중복 파일, 배포 이름 규칙이 바뀌면 폴더를 다시 동기화)
+    prefix = f"/media/{doc_parent_rel}/" if doc_parent_rel else "/media/"
+    refs = sorted(r for r in MEDIA_WANTED if r.startswith(prefix))
+    dups = sorted(r for r in MEDIA_CANONICAL if r.startswith(prefix))
+    data = [MEDIA_ALL, MEDIA_ALLOW, refs] + ([dups] if dups else []) + (["fingerprint"] if FINGERPRINT_MEDIA else [])
+    return hashlib.sha1(json.dumps(data, ensure_ascii=False).encode("utf-8")).hexdigest()[:12]
+
+def media_source_of(web: str) -> str | None:
+    # /media/a/b/c.webp → vault 의 a/b/media/c.webp, a/media/b/c.webp, media/a/b/c.webp 중 있는 것
+    parts = web[len("/media/"):].split("/")
+    for i in range(len(parts) - 1, -1, -1):
+        sp = os.path.join(VAULT, *parts[:i], "media", *parts[i:])
+        if os.path.isfile(sp):
+            return sp
+    return None
+
+def report_missing_media(notes: dict) -> int:
+    n = 0
+    for rel in sorted(notes):
+        for web in notes[rel].get("media_refs", []):
+            if f"/{DERIVATIVE_DIR}/" not in web and media_source_of(web) is None:
+                print(f"MISSING {web} in {rel}")
+                n += 1
+    return n
+
+
+# 같은 내용의 파일이 여러 media 폴더에 있으면 (썸네일 = 본문 이미지 등) 하나만 배포
+# 내용 해시가 같은 파일 중 경로가 가장 앞서는 것이 정본 → 나머지를 가리키는 참조는 렌더링할 때 정본으로 바꿈
+# --fingerprint-media: 파일을 <이름>.<해시 8자>.<확장자> 로 배포 (내용이 바뀌면 URL 도 바뀌므로 오래 캐시해도 됨)
+#   static/media-manifest.json 에 /media/ 경로 → 배포 경로
+MEDIA_DEDUP = True
+FINGERPRINT_MEDIA = False
+FINGERPRINT_LEN = 8
+MEDIA_MANIFEST = "static/media-manifest.json"
+MEDIA_MANIFEST_VERSION = 1
+MEDIA_HASHES: dict[str, list] = {}             # vault 기준 media 파일 → [mtime_ns, size, sha1] (manifest 에 저장)
+MEDIA_CANONICAL: dict[str, str] = {}           # 중복 파일의 /media/ 경로 → 정본 /media/ 경로
+MEDIA_CANONICAL_SOURCES: dict[str, str] = {}   # 정본 /media/ 경로 → vault 기준 원본 경로
+MEDIA_PUBLISHED: dict[str, str] = {}           # /media/ 경로 → 해시가 붙은 배포 경로 (--fingerprint-media)
+MEDIA_LOGICAL: dict[str, str] = {}             # 배포 경로 → /media/ 경로
+
+def media_index_enabled() -> bool:
+    return MEDIA_DEDUP or FINGERPRINT_MEDIA
+
+def fingerprinted_name(web: str, digest: str) -> str:
+    base, ext = os.path.splitext(web)
+    return f"{base}.{digest[:FINGERPRINT_LEN]}{ext}"
+
+def published_media_path(web: str) -> str:
+    # 참조를 렌더링할 때 쓸 URL (정본 → 배포 이름)
+    canon = MEDIA_CANONICAL.get(web, web)
+    return MEDIA_PUBLISHED.get(canon, canon)
+
+def iter_media_files(doc_parent_rels):
+    # (vault 기준 원본 경로, /media/ 경로) — copy_media_folder 가 보는 것과 같은 파일들
+    for d in sorted(doc_parent_rels):
+        media_src = os.path.join(VAULT, d, "media")
+        for root, dirs, files in os.walk(media_src):
+            dirs.sort()
+            rel = os.path.relpath(root, media_src)
+            for f in sorted(files):
+                if _is_media_junk(f):
+                    continue
+                web = os.path.normpath(os.path.join("/media", d, rel, f)).replace("\\", "/")
+                yield os.path.relpath(os.path.join(root, f), VAULT).replace("\\", "/"), web
+
+def _hash_media(p: str) -> str:
+    _cold_stall(p)
+    return _hash_file(p)
+
+def build_media_index(doc_parent_rels, prev_hashes: dict) -> int:
+    # mtime/size 가 manifest 와 같으면 이전 해시를 그대로 씀. 새로 해시한 파일 수를 돌려줌
+    global MEDIA_HASHES, MEDIA_CANONICAL, MEDIA_CANONICAL_SOURCES, MEDIA_PUBLISHED, MEDIA_LOGICAL
+    hashes, todo, webs = {}, {}, {}
+    for src_rel, web in iter_media_files(doc_parent_rels):
+        st = os.stat(os.path.join(VAULT, src_rel))
+        webs[src_rel] = web
+        old = prev_hashes.get(src_rel)
+        if old and old[:2] == [st.st_mtime_ns, st.st_size]:
+            hashes[src_rel] = old
+        else:
+            todo[os.path.join(VAULT, src_rel)] = (src_rel, [st.st_mtime_ns, st.st_size])
+    for p, digest in read_ahead(todo, _hash_media):
+        src_rel, stamp = todo[p]
+        hashes[src_rel] = stamp + [digest]
+
+    groups = {}
+    for src_rel in sorted(hashes, key=webs.get):
+        groups.setdefault(hashes[src_rel][2], []).append(src_rel)
+    canonical, sources = {}, {}
+    for members in groups.values():
+        if len(members) < 2 or not MEDIA_DEDUP:
+            continue
+        canon = webs[members[0]]
+        sources[canon] = members[0]
+        canonical.update({webs[m]: canon for m in members[1:] if webs[m] != canon})
+    published = {}
+    if FINGERPRINT_MEDIA:
+        published = {web: fingerprinted_name(web, hashes[src_rel][2])
+                     for src_rel, web in webs.items() if web not in canonical}
+    MEDIA_HASHES, MEDIA_CANONICAL, MEDIA_CANONICAL_SOURCES = hashes, canonical, sources
+    MEDIA_PUBLISHED, MEDIA_LOGICAL = published, {v: k for k, v in published.items()}
+    return len(todo)
+
+def clear_media_index():
+    global MEDIA_HASHES, MEDIA_CANONICAL, MEDIA_CANONICAL_SOURCES, MEDIA_PUBLISHED, MEDIA_LOGICAL
+    MEDIA_HASHES, MEDIA_CANONICAL, MEDIA_CANONICAL_SOURCES, MEDIA_PUBLISHED, MEDIA_LOGICAL = {}, {}, {}, {}, {}
+
+def _media_urls_unchanged(entry: dict) -> bool:
+    # 노트가 참조하는 파일의 정본/배포 경로가 렌더링할 때와 같은지
+    urls = entry.get("media_urls", {})
+    return all(published_media_path(r) == urls.get(r, r) for r in entry.get("media_refs", []))
+
+def published_media_dest(web: str) -> str:
+    # DEST 기준 static/media/... 출력 경로
+    return "static" + MEDIA_PUBLISHED.get(web, web)
+
+def build_media_manifest(outputs: set[str]) -> str:
+    # 실제로 배포한 파일만 (중복 파일은 정본의 배포 경로로)
+    files = {}
+    for web in sorted(MEDIA_PUBLISHED.keys() | MEDIA_CANONICAL.keys()):
+        url = published_media_path(web)
+        if "static" + url in outputs:
+            files[web] = url
+    return json.dumps({"v": MEDIA_MANIFEST_VERSION, "files": files}, ensure_ascii=False, indent=1) + "\n"
+
+def sync_media_manifest(media: dict) -> int:
+    p = os.path.join(DEST, MEDIA_MANIFEST)
+    if not FINGERPRINT_MEDIA:
+        if os.path.isfile(p):
+            SINK.remove(p)
+            return 1
+        return 0
+    return write_file_if_changed(p, build_media_manifest({o for m in media.values() for o in m["outputs"]}))
+
+
+_MEDIA_STATS_LOCK = threading.Lock()
+
+def _count_media(kind: str):
+    with _MEDIA_STATS_LOCK:
+        MEDIA_STATS[kind] += 1
+
+FICLONE = 0x40049409  # linux/fs.h
+
+def _reflink(sp: str, dp: str) -> bool:
+    try:
+        if sys.platform == "darwin":
+            libc = ctypes.CDLL(None, use_errno=True)
+            return libc.clonefile(os.fsencode(sp), os.fsencode(dp), 0) == 0
+        if sys.platform.startswith("linux"):
+            import fcntl
+            with open(sp, "rb") as fs, open(dp, "wb") as fd:
+                fcntl.ioctl(fd.fileno(), FICLONE, fs.fileno())
+            shutil.copystat(sp, dp)
+            return True
+    except (OSError, AttributeError):
+        pass
+    if os.path.exists(dp):
+        os.remove(dp)
+    return False
+
+def _same_file_bytes(sp: str, dp: str) -> bool:
+    try:
+        ss, ds = os.stat(sp), os.stat(dp)
+    except FileNotFoundError:
+        return False
+    if ss.st_size != ds.st_size:
+        return False
+    if (ss.st_dev, ss.st_ino) == (ds.st_dev, ds.st_ino):
+        return True
+    return _hash_file(sp) == _hash_file(dp)
+
+def _place_file(sp: str, dp: str) -> str:
+    # 임시 파일에 만든 뒤 os.replace 로 교체 (zola 가 반쯤 쓰인 파일을 보지 않도록)
+    os.makedirs(os.path.dirname(dp), exist_ok=True)
+    tmp = dp + ".sync-tmp"
+    if os.path.lexists(tmp):
+        os.remove(tmp)
+    how = "copied"
+    if LINK_MEDIA and os.stat(sp).st_dev == os.stat(os.path.dirname(dp)).st_dev:
+        if _reflink(sp, tmp):
+            how = "linked"
+        else:
+            try:
+                os.link(sp, tmp)
+                how = "linked"
+            except OSError:
+                pass
+    if how == "copied":
+        shutil.copy2(sp, tmp)
+        _count_io("files_copied")
+        _count_io("bytes_copied", os.path.getsize(tmp) if PROFILE else 0)
+    else:
+        _count_io("files_linked")
+    os.replace(tmp, dp)
+    return how
+
+def copy_media_folder(src_doc_dir: str, doc_parent_rel: str) -> list[str]:
     media_src = os.path.join(src_doc_dir, "media")
     if not os.path.isdir(media_src):
-        return
+        return []
 
     dest_media_dir = os.path.join(DEST, "static", "media", doc_parent_rel)
 
-    if os.path.isdir(dest_media_dir):
-        shutil.rmtree(dest_media_dir)
-
-    os.makedirs(dest_media_dir, exist_ok=True)
-
+    t0, n_bytes = time.perf_counter(), 0
+    pairs, outputs = [], []
     for root, dirs, files in os.walk(media_src):
+        dirs.sort()
         rel = os.path.relpath(root, media_src)
-        for d in dirs:
-            os.makedirs(os.path.join(dest_media_dir, rel, d), exist_ok=True)
+        for f in sorted(files):
+            dp = os.path.normpath(os.path.join(dest_media_dir, rel, f))
+            web = "/" + os.path.relpath(dp, os.path.join(DEST, "static")).replace("\\", "/")
+            if not media_wanted(web):
+                _count_media("skipped")
+                continue
+            if web in MEDIA_PUBLISHED:
+                dp = os.path.join(DEST, published_media_dest(web))
+            pairs.append((os.path.join(root, f), dp))
+    warmed = read_ahead([sp for sp, _ in pairs], warm_source) if PREFETCH_MEDIA else None
+    for sp, dp in pairs:
+        if warmed:
+            next(warmed)
+        _cold_stall(sp)
+        if _same_file_bytes(sp, dp):
+            _count_media("unchanged")
+        else:
+            _count_media(SINK.place(sp, dp))
+        if PROFILE:
+            n_bytes += os.path.getsize(sp)
+        outputs.append(os.path.relpath(dp, DEST).replace("\\", "/"))
+    if PROFILE:
+        with _PROFILE_LOCK:
+            MEDIA_DIR_STATS[doc_parent_rel] = {
+                "files": len(outputs), "bytes": n_bytes, "seconds": time.perf_counter() - t0,
+            }
+    return outputs
+
+def prune_media(expected: set[str]):
+    # 어떤 media 폴더에서도 나오지 않은 파일은 static/media 에서 제거
+    media_dir = os.path.join(DEST, "static", "media")
+    if not os.path.isdir(media_dir):
+        return
+    for root, dirs, files in os.walk(media_dir, topdown=False):
         for f in files:
-            sp = os.path.join(root, f)
-            dp = os.path.join(dest_media_dir, rel, f)
-            os.makedirs(os.path.dirname(dp), exist_ok=True)
-            shutil.copy2(sp, dp)
+            p = os.path.join(root, f)
+            if os.path.relpath(p, DEST).replace("\\", "/") not in expected:
+                SINK.remove(p)
+                _count_media("removed")
+        if root != media_dir and not SINK.dry and not os.listdir(root):
+            os.rmdir(root)
 
 
 # =============================================================================
@@ -247,39 +839,207 @@ def _norm_date_any(s: str) -> str | None:
             if not (1 <= dd <= 31): return None
     return f"{y:04d}-{mm:02d}-{dd:02d}"
 
+class FrontMatter:
+    # 프런트매터를 한 번만 파싱해 두고, 날짜 정규화/extra 이동을 이 객체 위에서 처리한 뒤 dump() 로 한 번만 직렬화
+    # items: ("kv", key, value, raw, parent) | ("list", key, values, raw, parent) | ("line", None, None, raw, parent)
+    #   parent: TOML 은 소속 테이블 이름, YAML 은 들여쓰기된 줄이 속한 최상위 키 (최상위면 None)
+
+    def __init__(self, kind: str | None, items: list | None = None):
+        self.kind = kind
+        self.items = items or []
+        self.extra = {}
+
+    @classmethod
+    def parse(cls, kind: str | None, head: str) -> "FrontMatter":
+        fm = cls(kind)
+        if not kind:
+            return fm
+
+        lines = head.splitlines()
+        parent = None
+        i = 0
+        while i < len(lines):
+            ln = lines[i]
+            i += 1
+
+            if kind == "toml":
+                mt = TOML_TABLE_RE.match(ln)
+                if mt:
+                    parent = mt.group(1).strip()
+                    fm.items.append(("line", None, None, ln, None))
+                    continue
+                m = KEYVAL_LINE_TOML.match(ln)
+                if not m:
+                    fm.items.append(("line", None, None, ln, parent))
+                    continue
+                k, v = m.group(1), m.group(2)
+                # 여러 줄 배열: 괄호가 닫힐 때까지 이어지는 줄을 같은 값으로 묶음
+                if v.startswith("[") and v.count("[") > v.count("]"):
+                    raw = [ln]
+                    while i < len(lines) and "".join(raw).count("[") > "".join(raw).count("]"):
+                        raw.append(lines[i])
+                        i += 1
+                    v = "\n".join([v] + raw[1:])
+                    ln = "\n".join(raw)
+                fm.items.append(("kv", k, v, ln, parent))
+                continue
+
+            indented = ln[:1].isspace()
+            if not indented and ln.strip():
+                parent = None
+            here = parent if indented else None
+
+            mb = YAML_BLOCK_KEY_RE.match(ln)
+            if mb:
+                j, values = i, []
+                while j < len(lines):
+                    mi = YAML_LIST_ITEM_RE.match(lines[j])
+                    if not mi:
+                        break
+                    values.append(_strip_quotes(mi.group(1)))
+                    j += 1
+                if not indented:
+                    parent = mb.group(1)
+                if j > i or mb.group(1) == "meta_description":
+                    fm.items.append(("list", mb.group(1), values, "\n".join(lines[i - 1:j]), here))
+                    i = j
+                else:
+                    fm.items.append(("line", None, None, ln, here))
+                continue
+
+            m = KEYVAL_LINE_YAML.match(ln)
+            if m:
+                fm.items.append(("kv", m.group(1), m.group(2), ln, here))
+                continue
+            # YAML 안에 TOML 식으로 적힌 date = ... 도 date 로 취급
+            m = TOML_DATE_LINE_RE.match(ln)
+            if m:
+                fm.items.append(("kv", "date", m.group(1), f"date: {m.group(1)}", here))
+                continue
+            fm.items.append(("line", None, None, ln, here))
+
+        return fm
+
+    def get(self, key: str) -> str | None:
+        # 최상위 값, 없으면 extra 로 옮겨진 값 (따옴표 제거)
+        for kind_, k, v, _, parent in self.items:
+            if kind_ == "kv" and parent is None and k.lower() == key:
+                return _strip_quotes(v)
+        v = self.extra.get(key)
+        return _strip_quotes(v) if isinstance(v, str) else None
+
+    def _kv(self, key: str, value: str) -> tuple:
+        sep = " = " if self.kind == "toml" else ": "
+        return ("kv", key, value, f"{key}{sep}{value}", None)
+
+    def normalize_date(self) -> bool:
+        if not self.kind:
+            return False
+
+        dates = [it for it in self.items if it[0] == "kv" and it[1] == "date"]
+        if dates:
+            n = _norm_date_any(dates[0][2])
+            items = []
+            for it in self.items:
+                if it[0] == "kv" and it[1] == "date":
+                    if n:
+                        items.append(self._kv("date", n))
+                else:
+                    items.append(it)
+            changed = [it[3] for it in items] != [it[3] for it in self.items]
+            self.items = items
+            return changed
+
+        for it in self.items:
+            if it[0] == "kv" and it[1] == "date_sort":
+                n = _norm_date_any(it[2])
+                if not n:
+                    return False
+                # TOML 은 테이블이 시작되기 전에 넣어야 최상위 date 로 읽힘
+                pos = len(self.items)
+                if self.kind == "toml":
+                    pos = next((k for k, x in enumerate(self.items)
+                                if x[0] == "line" and TOML_TABLE_RE.match(x[3])), pos)
+                self.items.insert(pos, self._kv("date", n))
+                return True
+        return False
+
+    def move_custom_fields_into_extra(self, doc_parent_rel: str, footnotes: list[dict]):
+        if not self.kind:
+            return
+
+        moved = {}
+        if self.kind == "yaml":
+            md_items = [v for it in self.items
+                        if it[0] == "list" and it[1] == "meta_description" for v in it[2]]
+            if md_items:
+                moved["meta_description"] = [_rewrite_meta_description_item(s, doc_parent_rel) for s in md_items]
+            if footnotes:
+                moved["notes"] = footnotes
+
+        kept = []
+        for it in self.items:
+            kind_, k, v, _, parent = it
+            if parent not in (None, "extra") or kind_ == "line":
+                kept.append(it)
+                continue
+            if self.kind == "yaml" and k == "meta_description" and kind_ == "list":
+                continue
+            if kind_ != "kv":
+                kept.append(it)
+                continue
+
+            k_low = k.lower()
+            if self.kind == "yaml" and k_low == "meta_description":
+                continue
+            if k_low in KEEP_TOPLEVEL:
+                kept.append(it)
+                continue
+
+            if k_low == "link":
+                href, label = _link_value_to_href_label(v, doc_parent_rel)
+                moved.setdefault("link", []).append({"href": href, "label": label})
+            else:
+                moved[k] = _extra_scalar(self.kind, k_low, v, doc_parent_rel)
+                if k_low in FILE_URL_KEYS:
+                    moved.update(image_extra_fields(k, media_href_from_value(v, doc_parent_rel), doc_parent_rel))
+
+        self.items = kept
+        self.extra = moved
+
+    def dump(self) -> str:
+        lines = [l for it in self.items for l in it[3].split("\n") if l.strip() != ""]
+
+        if self.kind == "toml":
+            extra_lines = _emit_toml_extra_lines(self.extra)
+            at = next((k for k, l in enumerate(lines) if TOML_EXTRA_TABLE_RE.match(l)), None)
+            if at is not None:
+                end = at + 1
+                while end < len(lines) and not TOML_TABLE_RE.match(lines[end]):
+                    end += 1
+                lines[end:end] = extra_lines
+            elif extra_lines:
+                lines += ["", "[extra]"] + extra_lines
+            return "\n".join(lines).strip("\n")
+
+        if self.kind == "yaml":
+            extra_lines = _emit_yaml_extra_lines(self.extra)
+            at = next((k for k, l in enumerate(lines) if YAML_EXTRA_KEY_RE.match(l)), None)
+            if at is not None:
+                lines[at + 1:at + 1] = extra_lines
+            elif self.extra:
+                lines += ["extra:"] + extra_lines
+            return "\n".join(lines).strip("\n")
+
+        return ""
+
 def sanitize_front_matter_text(text: str) -> tuple[str, bool]:
-    changed = False
     kind, head, body = split_front_matter(text)
     if not kind:
         return text, False
-
-    if kind == "toml":
-        m_date = re.search(r'^\s*date\s*=\s*(.+?)\s*$', head, re.M)
-        if m_date:
-            n = _norm_date_any(m_date.group(1))
-            head2 = re.sub(r'^\s*date\s*=\s*.+?$', f'date = {n}' if n else '', head, flags=re.M)
-            if head2 != head: head = head2; changed = True
-        else:
-            m_sort = re.search(r'^\s*date_sort\s*=\s*(.+?)\s*$', head, re.M)
-            if m_sort:
-                n = _norm_date_any(m_sort.group(1))
-                if n: head = head.rstrip("\n") + f"\ndate = {n}\n"; changed = True
-
-    elif kind == "yaml":
-        head2 = re.sub(r'^\s*date\s*=\s*(.+?)\s*$', r'date: \1', head, flags=re.M)
-        if head2 != head: head = head2; changed = True
-        m_date = re.search(r'^\s*date\s*:\s*(.+?)\s*$', head, re.M)
-        if m_date:
-            n = _norm_date_any(m_date.group(1))
-            head2 = re.sub(r'^\s*date\s*:\s*.+?$', f'date: {n}' if n else '', head, flags=re.M)
-            if head2 != head: head = head2; changed = True
-        else:
-            m_sort = re.search(r'^\s*date_sort\s*:\s*(.+?)\s*$', head, re.M)
-            if m_sort:
-                n = _norm_date_any(m_sort.group(1))
-                if n: head = head.rstrip("\n") + f"\ndate: {n}\n"; changed = True
-
-    return assemble_front_matter(kind, head, body), changed
+    fm = FrontMatter.parse(kind, head)
+    changed = fm.normalize_date()
+    return assemble_front_matter(kind, fm.dump(), body), changed
 
 def ensure_normalized_date(text: str) -> str:
     new_t, _ = sanitize_front_matter_text(text)
@@ -307,25 +1067,22 @@ def _split_lang_and_ext(last: str):
 def _slugify_segment(name: str) -> str:
     return name.strip().replace(" ", "-").lower()
 
-def _vault_path_to_site_href(raw_path: str, doc_parent_rel: str) -> str:
-    raw_path = (raw_path or "").strip()
-    if not raw_path:
-        return "/"
+def _vault_rel_from_link(raw_path: str, doc_parent_rel: str) -> str:
     if raw_path.startswith("/"):
-        vault_rel = raw_path.lstrip("/")
-    elif _is_vault_abs(raw_path):
-        vault_rel = raw_path
-    else:
-        p = pathlib.PurePosixPath(doc_parent_rel) / raw_path
-        parts = []
-        for part in str(p).split('/'):
-            if part in ("", "."): continue
-            if part == "..":
-                if parts: parts.pop()
-                continue
-            parts.append(part)
-        vault_rel = "/".join(parts)
+        return raw_path.lstrip("/")
+    if _is_vault_abs(raw_path):
+        return raw_path
+    p = pathlib.PurePosixPath(doc_parent_rel) / raw_path
+    parts = []
+    for part in str(p).split('/'):
+        if part in ("", "."): continue
+        if part == "..":
+            if parts: parts.pop()
+            continue
+        parts.append(part)
+    return "/".join(parts)
 
+def _vault_rel_to_href(vault_rel: str) -> str:
     parts = [seg for seg in vault_rel.split("/") if seg]
     if not parts: return "/"
     base, lang = _split_lang_and_ext(parts[-1])
@@ -334,17 +1091,111 @@ def _vault_path_to_site_href(raw_path: str, doc_parent_rel: str) -> str:
     href = prefix + "/" + "/".join(parts) + "/"
     return href.replace("//", "/")
 
+@functools.lru_cache(maxsize=RESOLVER_CACHE_SIZE)
+def _resolve_site_href(raw_path: str, doc_parent_rel: str) -> tuple[str, bool]:
+    target, _, heading = raw_path.partition("#")
+    anchor = f"#{_slugify_segment(heading)}" if heading.strip() else ""
+    target = target.strip()
+    if not target:
+        return anchor or "/", False
+
+    vault_rel = _vault_rel_from_link(target, doc_parent_rel)
+    href = resolve_in_vault_index(vault_rel, target, doc_parent_rel)
+    dangling = False
+    if href is None:
+        href = _vault_rel_to_href(vault_rel)
+        dangling = bool(VAULT_INDEX["paths"]) and "://" not in target
+    return href + anchor, dangling
+
+def _vault_path_to_site_href(raw_path: str, doc_parent_rel: str) -> str:
+    raw_path = (raw_path or "").strip()
+    if not raw_path:
+        return "/"
+    # 캐시에 걸려도 dangling 기록은 문서마다 남겨야 하므로 캐시 바깥에서 기록
+    href, dangling = _resolve_site_href(raw_path, doc_parent_rel)
+    NOTE_RESOLVED[raw_path] = [href, dangling]
+    if dangling:
+        DANGLING_LINKS.append(raw_path)
+    return href
+
+def _href_label(href: str) -> str:
+    return href.split("#", 1)[0].strip("/").split("/")[-1] or href
+
 def rewrite_wikilinks_in_body(kind: str, head: str, body: str, doc_parent_rel: str):
     def repl(m):
         path = (m.group(1) or "").strip()
         label = (m.group(2) or "").strip()
         href = _vault_path_to_site_href(path, doc_parent_rel)
         if not label:
-            label = href.strip("/").split("/")[-1] or href
+            label = _href_label(href)
         return f'[{label}]({href})'
     return head, WIKILINK_GLOBAL_RE.sub(repl, body)
 
 
+# =============================================================================
+# VAULT INDEX (WIKILINK TARGETS, BUILT ONCE PER RUN)
+# =============================================================================
+
+# paths: "glossary/gl-001.kr" → "/kr/glossary/gl-001/"
+# names: "gl-001.kr" → ["glossary/gl-001.kr", ...]  (Obsidian 식 최단 경로 해석용)
+VAULT_INDEX = {"paths": {}, "names": {}}
+STRICT_LINKS = False
+DANGLING_LINKS: list[str] = []
+NOTE_RESOLVED: dict[str, list] = {}   # 렌더링 중인 노트의 wikilink → [href, dangling] (노트마다 비움)
+
+def _index_key(vault_rel: str) -> str:
+    key = "/".join(p for p in vault_rel.lower().split("/") if p not in ("", ".", ".."))
+    return key[:-3] if key.endswith(".md") else key
+
+def build_vault_index(note_rels) -> dict:
+    paths, names, rels = {}, {}, {}
+
+    def add(key, href):
+        paths[key] = href
+        names.setdefault(key.rsplit("/", 1)[-1], []).append(key)
+
+    for sec in SECTIONS:
+        if sec:
+            add(f"{sec}/_index", f"/{sec}/")
+            add(f"{sec}/_index.kr", f"/kr/{sec}/")
+    for rel in note_rels:
+        if not should_skip_as_section_index(rel):
+            add(_index_key(rel), _vault_rel_to_href(rel))
+            rels[_vault_rel_to_href(rel)] = rel
+    for keys in names.values():
+        keys.sort(key=lambda k: (k.count("/"), k))
+    return {"paths": paths, "names": names, "rels": rels}
+
+def set_vault_index(index: dict):
+    global VAULT_INDEX
+    VAULT_INDEX = index
+    _resolve_site_href.cache_clear()
+
+def vault_index_fingerprint(index: dict) -> str:
+    return hashlib.sha1(json.dumps(index["paths"], sort_keys=True).encode("utf-8")).hexdigest()
+
+def _links_unchanged(rel: str, entry: dict) -> bool:
+    # 노트가 쓴 wikilink 가 지금 인덱스에서도 같은 곳으로 (같은 dangling 여부로) 해석되는지
+    # 노트가 생기거나 없어져도 이것이 그대로인 노트는 다시 렌더링하지 않음
+    d = doc_parent_of(rel)
+    return all(list(_resolve_site_href(raw, d)) == r for raw, r in entry.get("resolved", {}).items())
+
+def resolve_in_vault_index(vault_rel: str, target: str, doc_parent_rel: str) -> str | None:
+    paths = VAULT_INDEX["paths"]
+    href = paths.get(_index_key(vault_rel))
+    if href is not None:
+        return href
+    # 이름만 (혹은 경로 일부만) 적은 링크: 같은 폴더 → 가장 짧은 경로 순
+    tail = _index_key(target)
+    cands = [k for k in VAULT_INDEX["names"].get(tail.rsplit("/", 1)[-1], ())
+             if k == tail or k.endswith("/" + tail)]
+    if not cands:
+        return None
+    here = doc_parent_rel.lower()
+    same_dir = [k for k in cands if k.rpartition("/")[0] == here]
+    return paths[(same_dir or cands)[0]]
+
+
 # =============================================================================
 # FOOTNOTE EXTRACTION (FOR META)
 # =============================================================================
@@ -414,7 +1265,7 @@ def _strip_quotes(s: str) -> str:
     return s
 
 def _strip_url_scheme(url: str) -> str:
-    return re.sub(r'^https?://', '', url)
+    return URL_SCHEME_RE.sub('', url)
 
 def _yaml_quote(s: str) -> str:
     s = (s or "").strip()
@@ -424,255 +1275,499 @@ def _yaml_quote(s: str) -> str:
     s = s.replace("\\", "\\\\").replace('"', '\\"')
     return f'"{s}"'
 
-def _extract_yaml_block_list(head: str, key: str):
-    lines = head.splitlines()
-    values = []
-    out = []
-
-    i = 0
-    while i < len(lines):
-        ln = lines[i]
-        if re.match(rf'^\s*{re.escape(key)}\s*:\s*$', ln):
-            i += 1
-            while i < len(lines):
-                m = re.match(r'^\s*-\s*(.+)\s*$', lines[i])
-                if not m:
-                    break
-                values.append(_strip_quotes(m.group(1)))
-                i += 1
-            continue
-        out.append(ln)
-        i += 1
-
-    return values, "\n".join(out)
-
-def move_custom_fields_into_extra(text: str, doc_parent_rel: str, footnotes: list[dict]) -> str:
-    kind, head, body = split_front_matter(text)
-    if not kind:
-        return text
-
-    def handle_link_value(raw: str):
-        raw0 = _strip_quotes(raw)
-        m_w = WIKILINK_ONE_RE.match(raw0)
-        if m_w:
-            path = (m_w.group(1) or "").strip()
-            label = (m_w.group(2) or "").strip()
-        else:
-            path = raw0
-            label = ""
-        href = _vault_path_to_site_href(path, doc_parent_rel)
-        if not label:
-            label = href.strip("/").split("/")[-1] or href
-        return href, label
-
-    def label_from_wikilink_or_text(raw: str) -> str:
-        raw0 = _strip_quotes(raw)
-        m_w = WIKILINK_ONE_RE.match(raw0)
-        if m_w and m_w.group(2):
-            return m_w.group(2).strip()
+@functools.lru_cache(maxsize=RESOLVER_CACHE_SIZE)
+def media_href_from_value(raw: str, doc_parent_rel: str) -> str:
+    raw0 = _strip_quotes(raw).strip()
+    if not raw0:
         return raw0
 
-    def media_href_from_value(raw: str) -> str:
-        raw0 = _strip_quotes(raw).strip()
-        if not raw0:
-            return raw0
-
-        m_any = re.search(r'\[\[\s*([^\]|]+)', raw0)
-        candidate = (m_any.group(1).strip() if m_any else raw0)
-
-        if candidate.startswith("/media/"):
-            out = candidate
-            if doc_parent_rel:
-                out = out.replace(f"/media/{doc_parent_rel}/media/", f"/media/{doc_parent_rel}/")
-            return out
-
-        idx = candidate.find("media/")
-        if idx != -1:
-            return to_web_media_path(doc_parent_rel, candidate[idx:])
-
-        return candidate
+    m_any = WIKILINK_TARGET_RE.search(raw0)
+    candidate = (m_any.group(1).strip() if m_any else raw0)
 
-    if kind == "toml":
-        lines = head.splitlines()
-        keep_lines, moved = [], {}
-
-        for ln in lines:
-            m2 = KEYVAL_LINE_TOML.match(ln)
-            if not m2:
-                keep_lines.append(ln)
-                continue
-
-            k, v = m2.group(1), m2.group(2)
-            k_low = k.lower()
-
-            if k_low in KEEP_TOPLEVEL:
-                keep_lines.append(ln)
-                continue
+    if candidate.startswith("/media/"):
+        out = candidate
+        if doc_parent_rel:
+            out = out.replace(f"/media/{doc_parent_rel}/media/", f"/media/{doc_parent_rel}/")
+        return out
 
-            if k_low in NUMERIC_KEYS:
-                raw0 = _strip_quotes(v).strip()
-                try:
-                    val = str(int(raw0)) if raw0 else "0"
-                except ValueError:
-                    mnum = re.search(r"\d+", raw0)
-                    val = mnum.group(0) if mnum else "0"
-                moved[k] = val
-                continue
+    idx = candidate.find("media/")
+    if idx != -1:
+        return to_web_media_path(doc_parent_rel, candidate[idx:])
 
-            if k_low == "link":
-                href, label = handle_link_value(v)
+    return candidate
 
-                moved.setdefault("link", []).append({
-                    "href": href,
-                    "label": label,
-                })
+def _link_value_to_href_label(raw: str, doc_parent_rel: str) -> tuple[str, str]:
+    raw0 = _strip_quotes(raw)
+    m_w = WIKILINK_ONE_RE.match(raw0)
+    if m_w:
+        path = (m_w.group(1) or "").strip()
+        label = (m_w.group(2) or "").strip()
+    else:
+        path = raw0
+        label = ""
+    href = _vault_path_to_site_href(path, doc_parent_rel)
+    if not label:
+        label = _href_label(href)
+    return href, label
+
+def _label_from_wikilink_or_text(raw: str) -> str:
+    raw0 = _strip_quotes(raw)
+    m_w = WIKILINK_ONE_RE.match(raw0)
+    if m_w and m_w.group(2):
+        return m_w.group(2).strip()
+    return raw0
+
+def _toml_array_or_table(v: str) -> bool:
+    if v[:1] not in ("[", "{") or v.startswith("[["):
+        return False
+    try:
+        return isinstance(tomllib.loads(f"v = {v}")["v"], (list, dict))
+    except tomllib.TOMLDecodeError:
+        return False
+
+def _extra_scalar(kind: str, k_low: str, v: str, doc_parent_rel: str) -> str:
+    if k_low in NUMERIC_KEYS:
+        raw0 = _strip_quotes(v).strip()
+        try:
+            return str(int(raw0)) if raw0 else "0"
+        except ValueError:
+            mnum = DIGITS_RE.search(raw0)
+            return mnum.group(0) if mnum else "0"
+
+    if k_low in FILE_URL_KEYS:
+        return f'"{media_ref(media_href_from_value(v, doc_parent_rel))}"'
+
+    # TOML 배열/인라인 테이블은 문자열로 감싸지 않고 그대로 둠
+    if kind == "toml" and _toml_array_or_table(v):
+        return v
+
+    label = _label_from_wikilink_or_text(v)
+    return f'"{label}"' if not label.startswith('"') else label
+
+def _rewrite_meta_description_item(s: str, doc_parent_rel: str) -> str:
+    s = WIKILINK_GLOBAL_RE.sub(
+        lambda m: f"[{m.group(2) or m.group(1)}]"
+                f"({_vault_path_to_site_href(m.group(1), doc_parent_rel)})",
+        s
+    )
+    s = LINK_RE.sub(
+        lambda m: f"[{m.group(1)}]({media_ref(to_web_media_path(doc_parent_rel, m.group(2)), embed=False)})",
+        s
+    )
 
+    def repl_url(m):
+        url = m.group(1)
+        label = _strip_url_scheme(url)
+        return f"[{label}]({url})"
+
+    return URL_RE.sub(repl_url, s)
+
+def _emit_yaml_extra_lines(moved: dict) -> list[str]:
+    lines = []
+    for k, v in moved.items():
+        if k == "link":
+            lines.append("  link:")
+            for item in v:
+                if not isinstance(item, dict):
+                    continue
+
+                href_q  = _yaml_quote(item.get("href", ""))
+                label_q = _yaml_quote(item.get("label", ""))
+                lines.append(f"    - href: {href_q}")
+                lines.append(f"      label: {label_q}")
+
+        elif k == "notes":
+            lines.append("  notes:")
+            for item in v:
+                note_id = _yaml_quote(item.get("id", ""))
+                note_text = _yaml_quote(item.get("text", ""))
+                lines.append(f"    - id: {note_id}")
+                lines.append(f"      text: {note_text}")
+
+        elif isinstance(v, list) and v and isinstance(v[0], dict):
+            lines.append(f"  {k}:")
+            for item in v:
+                for j, (ik, iv) in enumerate(item.items()):
+                    lines.append(f"    {'- ' if j == 0 else '  '}{ik}: {_yaml_quote(iv)}")
 
-            elif k_low in FILE_URL_KEYS:
-                moved[k] = f'"{media_href_from_value(v)}"'
+        else:
+            if isinstance(v, list):
+                lines.append(f"  {k}:")
+                for item in v:
+                    lines.append(f"    - {_yaml_quote(item)}")
             else:
-                label = label_from_wikilink_or_text(v)
-                moved[k] = f'"{label}"' if not label.startswith('"') else label
-
-        head2 = "\n".join([l for l in keep_lines if l.strip() != ""])
-        if re.search(r'^\s*\[extra\]\s*$', head2, re.M):
-            head2 = re.sub(
-                r'(\[extra\][^\[]*)',
-                lambda mm: mm.group(1) + "".join([f'\n{k} = {moved[k]}' for k in moved]),
-                head2, flags=re.S
+                lines.append(f"  {k}: {_yaml_quote(v)}")
+
+    return lines
+
+def _emit_toml_extra_lines(moved: dict) -> list[str]:
+    lines = []
+    for k, v in moved.items():
+        if k == "link":
+            # TOML 인라인 테이블 배열 (문자열 규칙은 YAML 큰따옴표와 동일)
+            items = ", ".join(
+                f'{{ href = {_yaml_quote(item.get("href", ""))}, label = {_yaml_quote(item.get("label", ""))} }}'
+                for item in v if isinstance(item, dict)
             )
-        elif moved:
-            head2 = (head2 + "\n\n[extra]\n" + "\n".join(f"{k} = {moved[k]}" for k in moved)).strip("\n")
-
-        return assemble_front_matter(kind, head2, body)
-
-    if kind == "yaml":
-        md_items, head = _extract_yaml_block_list(head, "meta_description")
-
-        def rewrite_md_item(s: str) -> str:
-            s = WIKILINK_GLOBAL_RE.sub(
-                lambda m: f"[{m.group(2) or m.group(1)}]"
-                        f"({_vault_path_to_site_href(m.group(1), doc_parent_rel)})",
-                s
-            )
-            s = LINK_RE.sub(
-                lambda m: f"[{m.group(1)}]({to_web_media_path(doc_parent_rel, m.group(2))})",
-                s
+            lines.append(f"link = [{items}]")
+        elif isinstance(v, list):
+            items = ", ".join(
+                "{ " + ", ".join(f"{ik} = {_yaml_quote(iv)}" for ik, iv in item.items()) + " }" for item in v
             )
+            lines.append(f"{k} = [{items}]")
+        else:
+            lines.append(f"{k} = {v}")
+    return lines
 
-            def repl_url(m):
-                url = m.group(1)
-                label = _strip_url_scheme(url)
-                return f"[{label}]({url})"
-
-            s = URL_RE.sub(repl_url, s)
-
-            return s
-
-
-        moved = {}
-        if md_items:
-            moved["meta_description"] = [rewrite_md_item(s) for s in md_items]
-
-        if footnotes:
-            moved["notes"] = footnotes
-
-        lines = head.splitlines()
-        keep_lines = []
-
-        for ln in lines:
-            m2 = KEYVAL_LINE_YAML.match(ln)
-            if not m2:
-                keep_lines.append(ln)
-                continue
-
-            k, v = m2.group(1), m2.group(2)
-            k_low = k.lower()
-
-            if k_low == "meta_description":
-                continue
-
-            if k_low in KEEP_TOPLEVEL:
-                keep_lines.append(ln)
-                continue
+def move_custom_fields_into_extra(text: str, doc_parent_rel: str, footnotes: list[dict]) -> str:
+    kind, head, body = split_front_matter(text)
+    if not kind:
+        return text
+    fm = FrontMatter.parse(kind, head)
+    fm.move_custom_fields_into_extra(doc_parent_rel, footnotes)
+    return assemble_front_matter(kind, fm.dump(), body)
 
-            if k_low in NUMERIC_KEYS:
-                raw0 = _strip_quotes(v).strip()
-                try:
-                    val = str(int(raw0)) if raw0 else "0"
-                except ValueError:
-                    mnum = re.search(r"\d+", raw0)
-                    val = mnum.group(0) if mnum else "0"
-                moved[k] = val
-                continue
 
-            if k_low == "link":
-                href, label = handle_link_value(v)
-                moved.setdefault("link", []).append({
-                    "href": href,
-                    "label": label,
-                })
+# =============================================================================
+# IMAGE METADATA (INTRINSIC SIZE FROM HEADERS, OPTIONAL LQIP)
+# =============================================================================
 
+IMAGE_DIMS = True           # width/height 속성과 extra.<key>_w/_h (헤더만 읽음, 디코딩 없음)
+LQIP = False                # 흐린 초소형 placeholder (Pillow 필요)
+LQIP_WIDTH = 16
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".webp", ".gif"}
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
 
-            elif k_low in FILE_URL_KEYS:
-                moved[k] = f'"{media_href_from_value(v)}"'
+# vault 기준 경로 → {"stamp": [mtime_ns, size], "w", "h", ("hash", "lqip")}
+# manifest 에 저장해 두고 다음 실행에서 재사용, 워커가 새로 읽은 항목은 IMAGE_META_NEW 로 부모에게 돌려줌
+IMAGE_META: dict[str, dict] = {}
+IMAGE_META_NEW: dict[str, dict] = {}
 
-            else:
-                label = label_from_wikilink_or_text(v)
-                moved[k] = f'"{label}"' if not label.startswith('"') else label
-
-
-        head2 = "\n".join([l for l in keep_lines if l.strip() != ""])
-
-        def _emit_yaml_extra_lines(moved_dict: dict) -> list[str]:
-            lines = []
-            for k, v in moved_dict.items():
-                if k == "link":
-                    lines.append("  link:")
-                    for item in v:
-                        if not isinstance(item, dict):
-                            continue
-
-                        href_q  = _yaml_quote(item.get("href", ""))
-                        label_q = _yaml_quote(item.get("label", ""))
-                        lines.append(f"    - href: {href_q}")
-                        lines.append(f"      label: {label_q}")
-
-                elif k == "notes":
-                    lines.append("  notes:")
-                    for item in v:
-                        note_id = _yaml_quote(item.get("id", ""))
-                        note_text = _yaml_quote(item.get("text", ""))
-                        lines.append(f"    - id: {note_id}")
-                        lines.append(f"      text: {note_text}")
+# 렌더링 중인 노트가 참조한 원본 이미지 (노트마다 비움, DANGLING_LINKS 와 같은 방식)
+NOTE_IMAGES: dict[str, list] = {}      # vault 기준 원본 경로 → [mtime_ns, size]
 
-                else:
-                    if isinstance(v, list):
-                        lines.append(f"  {k}:")
-                        for item in v:
-                            lines.append(f"    - {_yaml_quote(item)}")
-                    else:
-                        lines.append(f"  {k}: {_yaml_quote(v)}")
+def _load_pil():
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    return Image
 
-            return lines
+def _exif_orientation(app1: bytes) -> int | None:
+    if not app1.startswith(b"Exif\0\0"):
+        return None
+    tiff = app1[6:]
+    order = "<" if tiff[:2] == b"II" else ">"
+    try:
+        ifd = struct.unpack(order + "I", tiff[4:8])[0]
+        count = struct.unpack(order + "H", tiff[ifd:ifd + 2])[0]
+        for i in range(count):
+            e = ifd + 2 + 12 * i
+            if struct.unpack(order + "H", tiff[e:e + 2])[0] == 0x0112:
+                return struct.unpack(order + "H", tiff[e + 8:e + 10])[0]
+    except struct.error:
+        pass
+    return None
+
+def _jpeg_size(f) -> tuple[int, int] | None:
+    # 마커를 따라가다 SOFn 에서 크기를 읽음 (EXIF 방향 5~8 은 브라우저가 돌려서 보여주므로 가로세로 교환)
+    f.seek(2)
+    orientation = 1
+    while True:
+        b = f.read(1)
+        while b and b != b"\xff":
+            b = f.read(1)
+        while b == b"\xff":
+            b = f.read(1)
+        if not b:
+            return None
+        marker = b[0]
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            continue
+        raw = f.read(2)
+        if len(raw) < 2:
+            return None
+        seg_len = struct.unpack(">H", raw)[0]
+        if marker in JPEG_SOF_MARKERS:
+            data = f.read(5)
+            if len(data) < 5:
+                return None
+            h, w = struct.unpack(">xHH", data)
+            return (h, w) if orientation in (5, 6, 7, 8) else (w, h)
+        if marker == 0xDA:
+            return None
+        if marker == 0xE1:
+            orientation = _exif_orientation(f.read(seg_len - 2)) or orientation
+            continue
+        f.seek(seg_len - 2, 1)
+
+def read_image_size(path: str) -> tuple[int, int] | None:
+    try:
+        with open(path, "rb") as f:
+            head = f.read(32)
+            if head.startswith(b"\x89PNG\r\n\x1a\n") and head[12:16] == b"IHDR":
+                return struct.unpack(">II", head[16:24])
+            if head[:6] in (b"GIF87a", b"GIF89a"):
+                return struct.unpack("<HH", head[6:10])
+            if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+                chunk = head[12:16]
+                if chunk == b"VP8X":
+                    return (1 + int.from_bytes(head[24:27], "little"), 1 + int.from_bytes(head[27:30], "little"))
+                if chunk == b"VP8 " and head[23:26] == b"\x9d\x01\x2a":
+                    w, h = struct.unpack("<HH", head[26:30])
+                    return (w & 0x3FFF, h & 0x3FFF)
+                if chunk == b"VP8L" and head[20] == 0x2F:
+                    bits = int.from_bytes(head[21:25], "little")
+                    return ((bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1)
+                return None
+            if head[:2] == b"\xff\xd8":
+                return _jpeg_size(f)
+    except (OSError, struct.error):
+        pass
+    return None
+
+def make_lqip(sp: str) -> str | None:
+    Image = _load_pil()
+    if Image is None:
+        return None
+    from PIL import ImageFilter, ImageOps
+    try:
+        with Image.open(sp) as im:
+            im.draft("RGB", (LQIP_WIDTH * 8, LQIP_WIDTH * 8))  # JPEG 은 축소 디코딩
+            small = ImageOps.exif_transpose(im).convert("RGB")
+            small.thumbnail((LQIP_WIDTH, LQIP_WIDTH))
+            small = small.filter(ImageFilter.GaussianBlur(1))
+            buf = io.BytesIO()
+            small.save(buf, "WEBP", quality=40)
+    except (OSError, ValueError, SyntaxError):
+        return None
+    return "data:image/webp;base64," + base64.b64encode(buf.getvalue()).decode("ascii")
 
+@functools.lru_cache(maxsize=RESOLVER_CACHE_SIZE)
+def _source_hash(path: str, mtime_ns: int, size: int) -> str:
+    return _hash_file(path)
 
-        extra_lines = _emit_yaml_extra_lines(moved)
+def image_meta(src_rel: str) -> dict | None:
+    sp = os.path.join(VAULT, src_rel)
+    try:
+        st = os.stat(sp)
+    except OSError:
+        return None
+    stamp = [st.st_mtime_ns, st.st_size]
+    NOTE_IMAGES[src_rel] = stamp
+
+    meta = IMAGE_META.get(src_rel)
+    if meta and meta["stamp"] == stamp and (not LQIP or "lqip" in meta or "w" not in meta):
+        return meta
+
+    new = None
+    if meta and LQIP and "lqip" in meta and meta.get("hash") == _source_hash(sp, *stamp):
+        # iCloud 동기화 등으로 mtime 만 바뀐 경우: 내용 해시가 같으면 그대로 재사용
+        new = {**meta, "stamp": stamp}
+    if new is None:
+        dims = read_image_size(sp)
+        new = {"stamp": stamp}
+        if dims:
+            new["w"], new["h"] = dims
+            if LQIP:
+                new["hash"] = _source_hash(sp, *stamp)
+                new["lqip"] = make_lqip(sp)   # 실패해도 None 으로 기록해 다시 시도하지 않음
+    IMAGE_META[src_rel] = IMAGE_META_NEW[src_rel] = new
+    return new
+
+def _media_source_rel(doc_rel_dir: str, web_src: str) -> str | None:
+    # /media/<doc_rel_dir>/<rel> → <doc_rel_dir>/media/<rel> (이 노트 폴더의 media 와, 다른 폴더에 있는 정본)
+    web_src = MEDIA_LOGICAL.get(web_src, web_src)
+    src_rel = MEDIA_CANONICAL_SOURCES.get(web_src)
+    if src_rel is None:
+        prefix = f"/media/{doc_rel_dir}/" if doc_rel_dir else "/media/"
+        if not web_src.startswith(prefix):
+            return None
+        rel = web_src[len(prefix):]
+        if f"/{DERIVATIVE_DIR}/" in f"/{rel}":
+            return None
+        src_rel = "/".join(p for p in (doc_rel_dir, "media", rel) if p)
+    if os.path.splitext(src_rel)[1].lower() not in IMAGE_EXTS:
+        return None
+    return src_rel
+
+def _images_unchanged(entry: dict) -> bool:
+    for src_rel, stamp in entry.get("images", {}).items():
+        try:
+            st = os.stat(os.path.join(VAULT, src_rel))
+        except OSError:
+            return False
+        if [st.st_mtime_ns, st.st_size] != stamp:
+            return False
+    return True
+
+def referenced_image_meta(notes: dict) -> dict:
+    # manifest 에는 지금 어떤 노트가 참조하는 이미지만 남김
+    used = {src for e in notes.values() for src in e.get("images", {})}
+    return {k: IMAGE_META[k] for k in sorted(used) if k in IMAGE_META}
+
+def image_extra_fields(key: str, web_src: str, doc_parent_rel: str) -> dict:
+    # thumbnail 등 → extra.thumbnail_w / thumbnail_h / thumbnail_lqip
+    if not IMAGE_DIMS:
+        return {}
+    src_rel = _media_source_rel(doc_parent_rel, web_src)
+    meta = image_meta(src_rel) if src_rel else None
+    if not meta or "w" not in meta:
+        return {}
+    out = {f"{key}_w": str(meta["w"]), f"{key}_h": str(meta["h"])}
+    if LQIP and meta.get("lqip"):
+        out[f"{key}_lqip"] = f'"{meta["lqip"]}"'
+    return out
 
-        if re.search(r'^\s*extra\s*:\s*$', head2, re.M):
-            head2 = re.sub(
-                r'(^\s*extra\s*:\s*$)',
-                lambda mm: mm.group(1) + "\n" + "\n".join(extra_lines),
-                head2,
-                count=1,
-                flags=re.M
-            )
-        elif moved:
-            head2 = (head2.rstrip("\n") + "\nextra:\n" + "\n".join(extra_lines)).strip("\n")
 
-        return assemble_front_matter(kind, head2, body)
+# =============================================================================
+# RESPONSIVE IMAGES (DERIVATIVES + SRCSET, --responsive)
+# =============================================================================
 
-    return text
+RESPONSIVE = False
+RESPONSIVE_WIDTHS = (480, 960, 1440, 1920)
+RESPONSIVE_MAX_DPR = 2      # fixed/max 폭의 몇 배까지 만들지 (고밀도 화면용)
+RESPONSIVE_EXTS = {".jpg", ".jpeg", ".png", ".webp"}
+DERIVATIVE_QUALITY = 80
+DERIVATIVE_VERSION = 1
+DERIVATIVE_DIR = "_w"                    # static/media/<...>/_w/<stem>-<w>.webp
+DERIVATIVE_CACHE = ".sync-derivatives"   # DEST/.sync-derivatives/<key>.webp (원본 내용 해시 + 폭 + 품질)
+DERIVATIVE_STATS = {"encoded": 0, "cached": 0, "unchanged": 0}
+# .page-body 는 600px 이상에서 화면 절반, 그 아래에서는 화면 전체 (main.css)
+PAGE_BODY_SIZES = ("(max-width: 599px)", 100, 50)
+
+# 렌더링 중인 노트에 필요한 파생본 (노트마다 비움)
+NOTE_DERIVATIVES: set[tuple] = set()   # (vault 기준 원본 경로, 폭, DEST 기준 출력 경로)
+
+def _srcset_url(url: str) -> str:
+    # srcset 은 공백/쉼표로 후보를 나누므로 파일 이름의 공백 등은 인코딩
+    return urllib.parse.quote(url, safe="/")
+
+def image_attrs(doc_rel_dir: str, web_src: str, cap: int | None = None, columns: int = 1) -> str:
+    # <img> 에 붙일 width/height (+ --responsive 면 srcset/sizes/lazy, --lqip 면 placeholder 배경)
+    if not (IMAGE_DIMS or RESPONSIVE):
+        return ""
+    src_rel = _media_source_rel(doc_rel_dir, web_src)
+    meta = image_meta(src_rel) if src_rel else None
+    if not meta or "w" not in meta:
+        return ""
+    w0, h0 = meta["w"], meta["h"]
+
+    attrs = ""
+    if RESPONSIVE and os.path.splitext(src_rel)[1].lower() in RESPONSIVE_EXTS:
+        # fixed/max 가 있으면 그 폭 × DPR 이 상한, 원본보다 큰 파생본은 만들지 않음
+        bound = min(w0, cap * RESPONSIVE_MAX_DPR) if cap else w0
+        widths = sorted({w for w in RESPONSIVE_WIDTHS if w < bound} | ({bound} if bound < w0 else set()))
+
+        base, name = web_src.rsplit("/", 1)
+        stem = os.path.splitext(name)[0]
+        if FINGERPRINT_MEDIA:
+            # 원본 해시는 stem 에 이미 있음 → 인코딩 설정만 더해서 URL 이 같으면 내용도 같도록
+            stem += f"-q{DERIVATIVE_QUALITY}v{DERIVATIVE_VERSION}"
+        candidates = []
+        for w in widths:
+            url = f"{base}/{DERIVATIVE_DIR}/{stem}-{w}.webp"
+            NOTE_DERIVATIVES.add((src_rel, w, "static" + url))
+            candidates.append(f"{_srcset_url(url)} {w}w")
+        if bound == w0:
+            candidates.append(f"{_srcset_url(web_src)} {w0}w")
+
+        if len(candidates) > 1:
+            media_q, narrow, wide = PAGE_BODY_SIZES
+            narrow, wide = f"{narrow / columns:g}vw", f"{wide / columns:g}vw"
+            if cap:
+                narrow, wide = f"min({narrow}, {cap}px)", f"min({wide}, {cap}px)"
+            attrs += f' srcset="{", ".join(candidates)}" sizes="{media_q} {narrow}, {wide}"'
+
+    attrs += f' width="{w0}" height="{h0}"'
+    if RESPONSIVE:
+        attrs += ' loading="lazy" decoding="async"'
+    if LQIP and meta.get("lqip"):
+        attrs += f' style="background:center / cover no-repeat url({meta["lqip"]})"'
+    return attrs
+
+def render_options_fingerprint() -> str:
+    # 렌더링 결과를 바꾸는 옵션이 달라지면 --incremental 에서도 전부 다시 렌더링
+    opts = {}
+    if RESPONSIVE:
+        opts["responsive"] = [list(RESPONSIVE_WIDTHS), RESPONSIVE_MAX_DPR, DERIVATIVE_QUALITY, DERIVATIVE_VERSION]
+    if not IMAGE_DIMS:
+        opts["no_image_dims"] = True
+    if LQIP:
+        opts["lqip"] = LQIP_WIDTH
+    return hashlib.sha1(json.dumps(opts, sort_keys=True).encode()).hexdigest()[:12] if opts else ""
+
+def _count_derivative(kind: str):
+    with _MEDIA_STATS_LOCK:
+        DERIVATIVE_STATS[kind] += 1
+
+def encode_derivative(sp: str, width: int) -> bytes:
+    Image = _load_pil()
+    with Image.open(sp) as im:
+        has_alpha = "A" in im.getbands() or "transparency" in im.info
+        im2 = im.convert("RGBA" if has_alpha else "RGB")
+        height = max(1, round(im2.height * width / im2.width))
+        im2 = im2.resize((width, height), Image.Resampling.LANCZOS)
+        buf = io.BytesIO()
+        im2.save(buf, "WEBP", quality=DERIVATIVE_QUALITY, method=4)
+    return buf.getvalue()
+
+def _encode_derivative(sp: str, width: int, out_path: str):
+    tmp = out_path + ".sync-tmp"
+    with open(tmp, "wb") as f:
+        f.write(encode_derivative(sp, width))
+    os.replace(tmp, out_path)
+
+def build_derivative(src_rel: str, width: int, dest_rel: str, prev: dict | None) -> dict:
+    sp = os.path.join(VAULT, src_rel)
+    st = os.stat(sp)
+    stamp = [st.st_mtime_ns, st.st_size]
+    dp = os.path.join(DEST, dest_rel)
+    if prev and prev.get("src") == stamp and os.path.isfile(dp):
+        _count_derivative("unchanged")
+        return prev
+
+    key = hashlib.sha1(
+        f"{_source_hash(sp, *stamp)}:{width}:{DERIVATIVE_QUALITY}:{DERIVATIVE_VERSION}".encode()
+    ).hexdigest()
+    cached = os.path.join(DEST, DERIVATIVE_CACHE, key[:2], f"{key}.webp")
+    if SINK.dry and not os.path.isfile(cached):
+        SINK.place(None, dp)   # 인코딩하지 않고 기록만
+        return {"src": stamp, "key": key}
+    if os.path.isfile(cached):
+        _count_derivative("cached")
+    else:
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        _encode_derivative(sp, width, cached)
+        _count_derivative("encoded")
+    if not _same_file_bytes(cached, dp):
+        SINK.place(cached, dp)
+    return {"src": stamp, "key": key}
+
+def sync_derivatives(notes: dict, prev: dict) -> dict:
+    wanted = {}
+    for entry in notes.values():
+        for src_rel, width, dest_rel in entry.get("derivatives", []):
+            wanted[dest_rel] = (src_rel, width)
+    if not wanted:
+        return {}
+
+    def one(item):
+        dest_rel, (src_rel, width) = item
+        try:
+            return dest_rel, build_derivative(src_rel, width, dest_rel, prev.get(dest_rel))
+        except (OSError, ValueError) as e:
+            print(f"WARN cannot build {dest_rel}: {e}")
+            return dest_rel, None
+
+    items = sorted(wanted.items())
+    if JOBS <= 1 or len(items) < 2:
+        results = [one(it) for it in items]
+    else:
+        # Pillow 는 resize/encode 중 GIL 을 놓으므로 스레드로 충분
+        with concurrent.futures.ThreadPoolExecutor(max_workers=JOBS) as ex:
+            results = list(ex.map(one, items))
+    return {d: r for d, r in results if r}
 
 
 # =============================================================================
@@ -707,7 +1802,7 @@ def transform_image_blocks(doc_rel_dir: str, text: str) -> str:
             alt = (mi.group(1) or "").strip()
             src = (mi.group(2) or "").strip()
 
-            src_abs = to_web_media_path(doc_rel_dir, src)
+            src_abs = media_ref(to_web_media_path(doc_rel_dir, src))
             imgs.append((alt, src_abs))
 
         # 이미지가 하나도 없으면 원문 유지
@@ -719,7 +1814,8 @@ def transform_image_blocks(doc_rel_dir: str, text: str) -> str:
 
         html.append('  <div class="img-set__images">')
         for alt, src_abs in imgs:
-            html.append(f'    <img src="{src_abs}" alt="{alt}">')
+            attrs = image_attrs(doc_rel_dir, src_abs, columns=len(imgs))
+            html.append(f'    <img src="{src_abs}" alt="{alt}"{attrs}>')
         html.append('  </div>')
 
         if caption:
@@ -758,9 +1854,13 @@ def _parse_img_title_directives(title: str) -> dict:
 def transform_markdown_images_with_directives(doc_rel_dir: str, text: str) -> str:
     def repl(m):
         alt, src, title = (m.group(1) or "").strip(), (m.group(2) or "").strip(), (m.group(3) or "").strip()
-        src_abs = to_web_media_path(doc_rel_dir, src)
+        src_abs = media_ref(to_web_media_path(doc_rel_dir, src))
         opts = _parse_img_title_directives(title)
         if not opts:
+            # 평범한 markdown 이미지는 --responsive 일 때만 <img> 로 바꿈
+            attrs = image_attrs(doc_rel_dir, src_abs) if RESPONSIVE else ""
+            if attrs:
+                return f'<img src="{src_abs}" alt="{alt}"{attrs}>'
             return f'![{alt}]({src_abs})'
 
         classes, style, data_attr = [], "", ""
@@ -768,16 +1868,19 @@ def transform_markdown_images_with_directives(doc_rel_dir: str, text: str) -> st
 
         if 'plain' in opts: classes.append('img--plain')
 
+        cap = None
         fixed = opts.get('fixed') or opts.get('max')
         if fixed:
             classes.append('img--fixed')
             try:
-                style += f'max-width:{int(str(fixed).replace("px",""))}px;'
+                cap = int(str(fixed).replace("px",""))
+                style += f'max-width:{cap}px;'
             except:
                 pass
 
+        attrs = image_attrs(doc_rel_dir, src_abs, cap)
         fig = [f'<figure class="{" ".join(classes)}" style="{style}"{data_attr}>',
-               f'  <img src="{src_abs}" alt="{alt}">']
+               f'  <img src="{src_abs}" alt="{alt}"{attrs}>']
         if 'caption' in opts and opts['caption']:
             fig.append(f'  <figcaption>{opts["caption"]}</figcaption>')
         fig.append('</figure>')
@@ -793,71 +1896,833 @@ def transform_disabled_links(text: str) -> str:
 
 
 # =============================================================================
-# SECTION INDEX GENERATION
+# BODY TOKENIZER (SINGLE PASS OVER THE DOCUMENT)
 # =============================================================================
 
-def ensure_index_for_section(section_rel: str):
+# 본문을 한 번만 훑어서 링크 / 이미지 / 위키링크 / 각주 정의 / :::images 블록 / 코드 블록을 토큰으로 자르고,
+# 각 토큰에만 기존 변환 함수를 적용. 나머지 일반 텍스트는 그대로 복사.
+# (정규식 하나에 대안을 모두 넣으면 re 가 글자마다 모든 대안을 시도해서 오히려 느림 →
+#  토큰이 시작될 수 있는 글자만 빠르게 찾고, 그 자리에서 해당 정규식만 match)
+TOKEN_START_RE = re.compile(r'[\[!:`~]')
+FENCE_RE = re.compile(r'^(`{3,}|~{3,})[^\n]*(?:\n.*?(?:^\1[ \t]*$|\Z)|\Z)', re.M | re.S)
+
+# 토큰이 안 되는 [ ... ] 중 짝이 맞는 것 ([sic], 본문 중의 [^1] 등) — 예전 정규식 체인과 결과가 같음
+PLAIN_BRACKETS_RE = re.compile(r'!?\[[^\[\]\n]*\](?!\()')
+
+def _match_body_token(body: str, i: int):
+    c = body[i]
+    at_line_start = i == 0 or body[i - 1] == "\n"
+    if c in "`~":
+        m = FENCE_RE.match(body, i) if at_line_start else None
+        return ("fence", m.end()) if m else None
+    if c == "[":
+        if at_line_start and body.startswith("[^", i):
+            m = FOOTNOTE_DEF_RE.match(body, i)
+            if m: return ("footnote", m.end())
+        m = WIKILINK_GLOBAL_RE.match(body, i) or LINK_RE.match(body, i)
+        return ("link", m.end()) if m else None
+    if c == "!":
+        m = IMG_LINK_RE.match(body, i)
+        if not m and body.startswith("![[", i):
+            m = WIKILINK_GLOBAL_RE.match(body, i + 1)
+        return ("img", m.end()) if m else None
+    m = IMG_BLOCK_RE.match(body, i) if body.startswith(":::", i) else None
+    return ("images", m.end()) if m else None
+
+def _unmatched_bracket(body: str, i: int) -> bool:
+    # 토큰이 되지 못한 [ / ![ / ::: — 앞 단계의 결과와 이어져 다음 단계 정규식에 걸릴 수 있음
+    if body.startswith(":::", i):
+        return True
+    if body[i] == "[" or body.startswith("![", i):
+        return not PLAIN_BRACKETS_RE.match(body, i)
+    return False
+
+def _has_unmatched_bracket(text: str, i: int = 0) -> bool:
+    # 각주 정의 줄 안 등, 토큰 내부에 남은 짝 없는 괄호
+    while True:
+        m = TOKEN_START_RE.search(text, i)
+        if not m:
+            return False
+        i = m.start()
+        hit = _match_body_token(text, i) if text[i] in "[!" else None
+        if hit and hit[0] != "footnote":
+            if _nested_bracket(text[i:hit[1]]):
+                return True
+            i = hit[1]
+        elif _unmatched_bracket(text, i):
+            return True
+        else:
+            i += 1
 
-    if section_rel == "":
-        content_root = os.path.join(DEST, "content")
+def _nested_bracket(tok: str) -> bool:
+    # [[[a]] 처럼 여는 괄호 뒤에 또 [ 나 ::: 가 있는 링크/이미지 토큰
+    inner = tok.lstrip("!")[2:]
+    return "[" in inner or ":::" in inner
+
+def _transform_body_chain(doc_parent_rel: str, body: str) -> tuple[str, list[dict]]:
+    # 짝이 맞지 않는 괄호가 있는 본문은 예전처럼 단계별 정규식을 차례로 (코드 블록만 그대로 둠)
+    out, pos = [], 0
+    for m in FENCE_RE.finditer(body):
+        out.append(_rewrite_body_token(doc_parent_rel, body[pos:m.start()]))
+        out.append(m.group(0))
+        pos = m.end()
+    out.append(_rewrite_body_token(doc_parent_rel, body[pos:]))
+    text = "".join(out)
+    return text, extract_footnotes_for_meta(text, doc_parent_rel) if "[^" in text else []
+
+def _rewrite_body_token(doc_parent_rel: str, tok: str) -> str:
+    # 각 단계는 자기 정규식이 필요로 하는 문자열이 토큰에 있을 때만 실행
+    if "](" in tok:
+        tok = rewrite_media_paths(doc_parent_rel, tok)
+    if "[[" in tok:
+        _, tok = rewrite_wikilinks_in_body(None, "", tok, doc_parent_rel)
+    if "[^" in tok:
+        tok = rewrite_footnotes_in_body(tok, doc_parent_rel)
+    if ":::" in tok:
+        tok = transform_image_blocks(doc_parent_rel, tok)
+    if "![" in tok:
+        tok = transform_markdown_images_with_directives(doc_parent_rel, tok)
+    if "#disabled" in tok:
+        tok = transform_disabled_links(tok)
+    return tok
+
+def transform_body(doc_parent_rel: str, body: str) -> tuple[str, list[dict]]:
+    out, footnotes = [], []
+    pos = scan = 0
+    while True:
+        m = TOKEN_START_RE.search(body, scan)
+        if not m:
+            break
+        start = m.start()
+        hit = _match_body_token(body, start)
+        if not hit:
+            if _unmatched_bracket(body, start):
+                return _transform_body_chain(doc_parent_rel, body)
+            scan = start + 1
+            continue
+        kind, end = hit
+        if kind == "footnote" and _has_unmatched_bracket(body[:end], body.index(":", start) + 1):
+            return _transform_body_chain(doc_parent_rel, body)
+        if kind in ("link", "img") and _nested_bracket(body[start:end]):
+            return _transform_body_chain(doc_parent_rel, body)
+        out.append(body[pos:start])
+        if kind == "fence":
+            out.append(body[start:end])
+            pos = scan = end
+            continue
+        # 토큰 안에서 시작한 :::images 블록은 (각주 줄 끝 등) 블록 끝까지 토큰에 포함
+        while ":::" in body[start:end]:
+            mb = IMG_BLOCK_RE.search(body, start)
+            if not mb or mb.start() >= end or mb.end() <= end:
+                break
+            end = mb.end()
+        tok = _rewrite_body_token(doc_parent_rel, body[start:end])
+        if "[^" in tok:
+            footnotes.extend(extract_footnotes_for_meta(tok, doc_parent_rel))
+        out.append(tok)
+        pos = scan = end
+    out.append(body[pos:])
+    return "".join(out), footnotes
 
-        en_path = os.path.join(content_root, "_index.md")
-        kr_path = os.path.join(content_root, "_index.kr.md")
 
+# =============================================================================
+# SECTION INDEX GENERATION
+# =============================================================================
+
+REDIRECT_SECTIONS = {
+    "about":   {"en": "/about/about/",   "kr": "/kr/about/about/"},
+    "contact": {"en": "/contact/contact/","kr": "/kr/contact/contact/"},
+}
+
+def section_index_texts(section_rel: str) -> dict[str, str]:
+    # content/ 기준 경로 → _index.md / _index.kr.md 내용
+    if section_rel == "":
         text = """+++
 title = ""
 template = "section.html"
 +++
 """
+        return {"_index.md": text, "_index.kr.md": text}
 
-        if not os.path.exists(en_path):
-            write_file(en_path, text)
-            print("CREATE content/_index.md")
-
-        if not os.path.exists(kr_path):
-            write_file(kr_path, text)
-            print("CREATE content/_index.kr.md")
-
-        return
-
-    dest_dir = os.path.join(DEST, "content", section_rel)
-    os.makedirs(dest_dir, exist_ok=True)
-    en_path = os.path.join(dest_dir, "_index.md")
-    kr_path = os.path.join(dest_dir, "_index.kr.md")
-
-    REDIRECT_SECTIONS = {
-        "about":   {"en": "/about/about/",   "kr": "/kr/about/about/"},
-        "contact": {"en": "/contact/contact/","kr": "/kr/contact/contact/"},
-    }
+    en_rel = f"{section_rel}/_index.md"
+    kr_rel = f"{section_rel}/_index.kr.md"
 
     if section_rel in REDIRECT_SECTIONS:
-        write_file(en_path, f"""+++
+        return {
+            en_rel: f"""+++
 title = "{TITLES_EN.get(section_rel, section_rel)}"
 redirect_to = "{REDIRECT_SECTIONS[section_rel]['en']}"
 +++ 
-""")
-        write_file(kr_path, f"""+++
+""",
+            kr_rel: f"""+++
 title = "{TITLES_KR.get(section_rel, section_rel)}"
 redirect_to = "{REDIRECT_SECTIONS[section_rel]['kr']}"
 +++ 
-""")
-        print(f"CREATE (redirect) _index.* @ {section_rel}")
-        return
+""",
+        }
 
     needs_transparent = is_subsection(section_rel)
     tmpl = SECTION_TEMPLATES.get(section_rel, "allarchive.html")
-
-    if not os.path.exists(en_path):
-        lines = ["+++", f'title = "{TITLES_EN.get(section_rel,"archive")}"', f'template = "{tmpl}"']
+    out = {}
+    for rel, titles, default in ((en_rel, TITLES_EN, "archive"), (kr_rel, TITLES_KR, "아카이브")):
+        lines = ["+++", f'title = "{titles.get(section_rel, default)}"', f'template = "{tmpl}"']
         if needs_transparent: lines.append("transparent = true")
         lines += ['# sort_by = "extra.date_sort"', "+++"]
-        write_file(en_path, "\n".join(lines) + "\n")
+        out[rel] = "\n".join(lines) + "\n"
+    return out
 
-    if not os.path.exists(kr_path):
-        lines = ["+++", f'title = "{TITLES_KR.get(section_rel,"아카이브")}"', f'template = "{tmpl}"']
-        if needs_transparent: lines.append("transparent = true")
-        lines += ['# sort_by = "extra.date_sort"', "+++"]
-        write_file(kr_path, "\n".join(lines) + "\n")
+def ensure_index_for_section(section_rel: str):
+    texts = section_index_texts(section_rel)
+    # 전체 동기화 중에는 content_dir() 가 비어 있는 staging 이므로, 있는지 / 같은지는 실제 content/ 를 기준으로
+    live_dir = os.path.join(DEST, "content")
+
+    if section_rel in REDIRECT_SECTIONS:
+        # redirect 는 항상 최신 내용으로
+        changed = False
+        for rel, text in texts.items():
+            changed |= not same_file_text(os.path.join(live_dir, rel), text)
+            write_file_if_changed(os.path.join(content_dir(), rel), text)
+        if changed:
+            print(f"{op_label('CREATE')} (redirect) _index.* @ {section_rel}")
+        return
+
+    # 나머지는 없을 때만 만듦 (손으로 고친 _index.md 는 유지 → staging 에도 그대로 옮겨 둠)
+    for rel, text in texts.items():
+        live = os.path.join(live_dir, rel)
+        if os.path.exists(live):
+            if STAGED:
+                write_file_if_changed(os.path.join(content_dir(), rel), read_file(live))
+            continue
+        write_file(os.path.join(content_dir(), rel), text)
+        if section_rel == "":
+            print(f"{op_label('CREATE')} content/{rel}")
+
+
+# =============================================================================
+# SEARCH INDEX SHARDS (static/search/<lang>/<section>.json)
+# =============================================================================
+# zola 의 search_index 하나를 통째로 받는 대신 언어 × 최상위 섹션별로 나눈 역색인
+#   static/search/index.json            {"v", "tokenizer", "shards": {lang: {section: {"url", "docs"}}}}
+#   static/search/<lang>/<section>.json {"v", "lang", "section", "docs": [[title, href, category, date_sort]],
+#                                        "terms": {token: [doc, score, doc, score, ...]}}
+# allarchive.html 의 검색창이 index.json 을 보고 목록에 나오는 섹션의 shard 만 받아 찾음
+# 검색어는 search_tokens 와 같은 규칙 (소문자, 한글은 음절 bigram) 으로 나눔 — 바꾸면 allarchive.html 의 tokens() 도 같이
+
+SEARCH_INDEX = True
+SEARCH_DIR = "static/search"
+SEARCH_CACHE_FILE = ".sync-search.json"
+SEARCH_VERSION = 1
+SEARCH_TITLE_WEIGHT = 5
+SEARCH_TOKEN_RE = re.compile(r"[가-힣]+|[^\W_가-힣]+")
+SEARCH_STRIP_RES = (
+    (re.compile(r"<[^>]+>"), " "),                      # 태그 (figure/img 등)
+    (re.compile(r"!?\[([^\]]*)\]\([^)]*\)"), r"\1"),    # [label](href), ![alt](src) → 글자만
+    (re.compile(r"https?://\S+"), " "),
+    (re.compile(r"\{\{.*?\}\}|\{%.*?%\}", re.S), " "),  # shortcode
+)
+
+# vault 기준 노트 경로 → {"hash": 원본 해시, "doc": search_doc(...)}, SEARCH_CACHE_FILE 에 저장
+SEARCH_DOCS: dict[str, dict] = {}
+SEARCH_SHARDS: dict[str, dict] = {}  # DEST 기준 shard 경로 → {"fp": 구성 노트들의 fingerprint, "v": 내용 해시, "docs"}
+NOTE_SEARCH: dict = {}               # 렌더링 중인 노트의 search_doc (노트마다 비움)
+SEARCH_DOCS_JSON: dict[str, tuple[dict, str]] = {}   # SEARCH_CACHE_FILE 에 쓸 항목 (dumps_entries 용)
+
+def search_tokens(text: str) -> list[str]:
+    out = []
+    for m in SEARCH_TOKEN_RE.finditer(text.lower()):
+        w = m.group(0)
+        if "가" <= w[0] <= "힣":
+            # 조사/띄어쓰기와 무관하게 찾히도록 음절 bigram ("검색엔진은" → 검색 색엔 엔진 진은)
+            out += [w] if len(w) == 1 else [w[i:i + 2] for i in range(len(w) - 1)]
+        elif len(w) > 1 or w.isdigit():
+            out.append(w)
+    return out
+
+def search_doc(fm: FrontMatter, body: str, rel: str) -> dict:
+    title = fm.get("title") or pathlib.PurePosixPath(rel).name.split(".")[0]
+    href = note_href(fm, rel)
+    for rx, sub in SEARCH_STRIP_RES:
+        body = rx.sub(sub, body)
+    terms = {}
+    for t in search_tokens(body):
+        terms[t] = terms.get(t, 0) + 1
+    for t in search_tokens(title):
+        terms[t] = terms.get(t, 0) + SEARCH_TITLE_WEIGHT
+    return {
+        "title": title, "href": href,
+        "category": fm.get("category") or "", "date_sort": fm.get("date_sort") or "",
+        "terms": terms,
+    }
+
+def search_shard_of(rel: str) -> str:
+    lang = "kr" if rel.lower().endswith(".kr.md") else "en"
+    return f"{SEARCH_DIR}/{lang}/{rel.split('/', 1)[0]}.json"
+
+def build_search_shard(dest_rel: str, members: list[tuple[str, dict]]) -> str:
+    lang, section = dest_rel[len(SEARCH_DIR) + 1:-len(".json")].split("/", 1)
+    # 최신 글이 먼저 (같은 점수면 앞 번호가 위로)
+    members = sorted(members, key=lambda m: (m[1]["date_sort"], m[0]), reverse=True)
+    terms = {}
+    for i, (_, d) in enumerate(members):
+        for t, n in d["terms"].items():
+            terms.setdefault(t, []).extend((i, n))
+    data = {
+        "v": SEARCH_VERSION, "lang": lang, "section": section,
+        "docs": [[d["title"], d["href"], d["category"], d["date_sort"]] for _, d in members],
+        "terms": dict(sorted(terms.items())),
+    }
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+def _search_version_of(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+
+def build_search_listing(shards: dict[str, dict]) -> str:
+    listing = {}
+    for dest_rel, sh in sorted(shards.items()):
+        lang, section = dest_rel[len(SEARCH_DIR) + 1:-len(".json")].split("/", 1)
+        listing.setdefault(lang, {})[section] = {"url": f"/{dest_rel[len('static/'):]}?v={sh['v']}", "docs": sh["docs"]}
+    return json.dumps({"v": SEARCH_VERSION, "tokenizer": "lower+hangul-bigram", "shards": listing},
+                      ensure_ascii=False, indent=1, sort_keys=True) + "\n"
+
+def load_search_cache():
+    SEARCH_DOCS.clear()
+    SEARCH_SHARDS.clear()
+    try:
+        with open(os.path.join(DEST, SEARCH_CACHE_FILE), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return
+    if data.get("version") == SEARCH_VERSION and data.get("script") == _script_fingerprint():
+        SEARCH_DOCS.update(data["docs"])
+        SEARCH_SHARDS.update(data["shards"])
+
+def _search_doc_current(rel: str, entry: dict) -> bool:
+    # 출력이 없는 노트 (about/index.md 등) 는 검색 대상도 아님
+    if not SEARCH_INDEX or not entry.get("outputs"):
+        return True
+    return SEARCH_DOCS.get(rel, {}).get("hash") == entry.get("hash")
+
+def sync_search_index(notes: dict, changed: set[str] | None = None) -> int:
+    # 구성 노트 (경로, 해시) 가 그대로인 shard 는 다시 만들지 않음. draft 와 ignored_content 는 넣지 않음
+    # changed (--watch 에서 이번에 바뀐 노트) 가 있으면 그 노트가 속한 shard 만 다시 모음
+    ignored = _zola_ignored_content(os.path.join(DEST, "config.toml"))
+    only = None if changed is None else {search_shard_of(rel) for rel in changed}
+    groups = {}
+    for rel in sorted(notes):
+        dest_rel = search_shard_of(rel)
+        if only is not None and dest_rel not in only:
+            continue
+        if (rel in SEARCH_DOCS and _search_doc_current(rel, notes[rel])
+                and is_published(rel, notes[rel].get("meta", {}), ignored)):
+            groups.setdefault(dest_rel, []).append((rel, SEARCH_DOCS[rel]["doc"]))
+
+    shards = {} if only is None else {k: v for k, v in SEARCH_SHARDS.items() if k not in only}
+    n_built = 0
+    for dest_rel, members in groups.items():
+        fp = hashlib.sha1(json.dumps(
+            [SEARCH_VERSION] + [[rel, SEARCH_DOCS[rel]["hash"]] for rel, _ in members]
+        ).encode("utf-8")).hexdigest()[:12]
+        old = SEARCH_SHARDS.get(dest_rel, {})
+        path = os.path.join(DEST, dest_rel)
+        if old.get("fp") == fp and os.path.isfile(path):
+            shards[dest_rel] = old
+            continue
+        text = build_search_shard(dest_rel, members)
+        write_file_if_changed(path, text)
+        shards[dest_rel] = {"fp": fp, "v": _search_version_of(text), "docs": len(members)}
+        n_built += 1
+    for dest_rel in sorted(set(SEARCH_SHARDS) - set(shards)):
+        path = os.path.join(DEST, dest_rel)
+        if os.path.isfile(path):
+            SINK.remove(path)
+    write_file_if_changed(os.path.join(DEST, SEARCH_DIR, "index.json"), build_search_listing(shards))
+
+    SEARCH_SHARDS.clear()
+    SEARCH_SHARDS.update(shards)
+    if not SINK.dry:
+        data = {"version": SEARCH_VERSION, "script": _script_fingerprint(), "shards": SEARCH_SHARDS}
+        docs = dumps_entries({rel: SEARCH_DOCS[rel] for rel in notes if rel in SEARCH_DOCS}, SEARCH_DOCS_JSON)
+        head = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+        write_file(os.path.join(DEST, SEARCH_CACHE_FILE), head[:-1] + ',"docs":' + docs + "}")
+    return n_built
+
+
+# =============================================================================
+# ARCHIVE MANIFEST (static/archive/<lang>.json FOR allarchive.html)
+# =============================================================================
+# allarchive.html 이 get_section 으로 모든 페이지를 매번 Tera 에서 정렬/필터하는 대신
+# 미리 정렬된 목록을 받아 필요한 만큼만 그림. 노트마다의 값은 렌더링할 때 manifest 의 "meta" 에 남겨 둠
+
+ARCHIVE_DIR = "static/archive"
+ARCHIVE_VERSION = 1
+ARCHIVE_SECTIONS = ("works", "shop", "glossary", "method", "thought", "web-document")
+ARCHIVE_SINGLE_PAGES = ("about", "contact")   # <name>/<name>(.kr).md
+ARCHIVE_LANGS = ("en", "kr")
+ARCHIVE_META_KEYS = ("doc_no", "display_title", "category", "date_sort", "date_ym", "date_year", "thumbnail", "draft")
+
+NOTE_META: dict = {}   # 렌더링 중인 노트의 note_meta (노트마다 비움)
+ARCHIVE_ITEMS: dict[str, tuple] = {}   # 노트 → (meta, (언어, 정렬 키, 항목 JSON) 또는 None) — meta 가 그대로면 재사용
+
+INLINE_MD_RES = (
+    (re.compile(r"`([^`]+)`"), r"<code>\1</code>"),
+    (re.compile(r"\*\*(.+?)\*\*|__(.+?)__"), lambda m: f"<strong>{m.group(1) or m.group(2)}</strong>"),
+    (re.compile(r"\*(.+?)\*|(?<!\w)_(.+?)_(?!\w)"), lambda m: f"<em>{m.group(1) or m.group(2)}</em>"),
+)
+
+def note_href(fm: FrontMatter, rel: str) -> str:
+    href = _vault_rel_to_href(rel)
+    slug = fm.get("slug")
+    if slug:
+        href = href.rstrip("/").rsplit("/", 1)[0] + f"/{slug}/"
+    return href
+
+def note_meta(fm: FrontMatter, rel: str) -> dict:
+    meta = {"title": fm.get("title") or "", "href": note_href(fm, rel)}
+    for k in ARCHIVE_META_KEYS:
+        v = fm.get(k)
+        if v:
+            meta[k] = v
+    return meta
+
+def inline_markdown_html(s: str) -> str:
+    # 제목에 쓰이는 정도만 (Tera 의 markdown(inline=true) 대신)
+    s = s.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    for rx, sub in INLINE_MD_RES:
+        s = rx.sub(sub, s)
+    return s
+
+@functools.lru_cache(maxsize=4)
+def _zola_ignored_content(config_path: str) -> tuple[str, ...]:
+    try:
+        with open(config_path, "rb") as f:
+            return tuple(tomllib.load(f).get("ignored_content", ()))
+    except (OSError, tomllib.TOMLDecodeError):
+        return ()
+
+def is_published(rel: str, meta: dict, ignored: tuple[str, ...] = ()) -> bool:
+    # draft 와 zola 가 무시하는 페이지 (ignored: config.toml 의 ignored_content) 는 공개 JSON (archive/preview/search) 에 넣지 않음
+    if _strip_quotes(meta.get("draft", "")).strip().lower() == "true":
+        return False
+    return not any(fnmatch.fnmatch(f"content/{rel}", pat) for pat in ignored)
+
+def archive_item(rel: str, meta: dict, ignored: tuple[str, ...] = ()) -> dict | None:
+    parts = rel.split("/")
+    name, lang = _split_lang_and_ext(parts[-1])
+    if parts[0] in ARCHIVE_SECTIONS:
+        default_cat = parts[0]
+    elif len(parts) == 2 and parts[0] in ARCHIVE_SINGLE_PAGES and name == parts[0]:
+        default_cat = ""
+    else:
+        return None
+    try:
+        doc = int(meta.get("doc_no", "0"))
+    except ValueError:
+        doc = 0
+    if doc == 0 or not is_published(rel, meta, ignored):
+        return None
+    title = meta.get("display_title") or meta["title"]
+    return {
+        "lang": lang or "en",
+        "id": doc,
+        "title": title,
+        "title_html": inline_markdown_html(title),
+        "date_sort": meta.get("date_sort", ""),
+        "date_ym": meta.get("date_ym", ""),
+        "date_year": meta.get("date_year", ""),
+        "category": meta.get("category", default_cat),
+        "thumbnail": meta.get("thumbnail", ""),
+        "href": meta["href"],
+    }
+
+def build_archive_manifests(metas: dict[str, dict], ignored: tuple[str, ...] = (),
+                            cache: dict | None = None) -> dict[str, str]:
+    # 언어별 목록, 문서 번호 내림차순 (allarchive.html 의 기본 정렬). 항목은 (언어, 정렬 키, JSON) 으로 만들어 둠
+    items = {lang: [] for lang in ARCHIVE_LANGS}
+    for rel in sorted(metas):
+        hit = cache_hit(cache, rel, metas[rel]) if cache is not None else None
+        if hit is None:
+            it = archive_item(rel, metas[rel], ignored)
+            hit = (metas[rel], it and (it.pop("lang"), (-it["id"], it["href"]),
+                                       json.dumps(it, ensure_ascii=False, separators=(",", ":"))))
+            if cache is not None:
+                cache[rel] = hit
+        if hit[1]:
+            lang, key, text = hit[1]
+            items.setdefault(lang, []).append((key, text))
+    out = {}
+    for lang, lst in items.items():
+        lst.sort()
+        out[f"{ARCHIVE_DIR}/{lang}.json"] = (
+            f'{{"v":{ARCHIVE_VERSION},"lang":{json.dumps(lang)},"items":[{",".join(t for _, t in lst)}]}}\n')
+    return out
+
+def sync_archive_manifests(notes: dict, changed: set[str] | None = None) -> int:
+    # changed (--watch 에서 이번에 바뀐 노트) 가 있으면 그 노트의 언어 목록만 다시 씀
+    def lang_of(rel):
+        return _split_lang_and_ext(rel.rsplit("/", 1)[-1])[1] or "en"
+
+    metas = {rel: e["meta"] for rel, e in notes.items() if "meta" in e}
+    if changed is None:
+        ARCHIVE_ITEMS.clear()
+        only = None
+    else:
+        langs = {lang_of(rel) for rel in changed}
+        metas = {rel: m for rel, m in metas.items() if lang_of(rel) in langs}
+        only = {f"{ARCHIVE_DIR}/{lang}.json" for lang in langs}
+    n = 0
+    ignored = _zola_ignored_content(os.path.join(DEST, "config.toml"))
+    for dest_rel, text in build_archive_manifests(metas, ignored, ARCHIVE_ITEMS).items():
+        if only is None or dest_rel in only:
+            n += write_file_if_changed(os.path.join(DEST, dest_rel), text)
+    return n
+
+
+# =============================================================================
+# LINK PREVIEWS (static/preview/<lang>/<section>.json FOR page.html HOVER)
+# =============================================================================
+# page.html 의 hover 미리보기가 링크마다 페이지 전체를 받아 첫 문단을 뽑던 것을 동기화 때 미리 해 둠
+#   static/preview/<lang>/<section>.json  {"v", "pages": {href: 첫 문단 텍스트}}
+# 페이지 스크립트와 같은 규칙: figure/img/code/table/각주 를 빼고 첫 번째 문단 (p) 이나 목록 항목 (li)
+
+LINK_PREVIEWS = True
+PREVIEW_DIR = "static/preview"
+PREVIEW_VERSION = 1
+PREVIEW_MAX_CHARS = 400
+PREVIEW_DROP_RES = (
+    (re.compile(r"^(```|~~~).*?^\1[^\n]*$", re.S | re.M), ""),                         # 코드 블록
+    (re.compile(r"<(figure|table|pre|script|style|aside)\b.*?</\1>", re.S | re.I), ""),
+    (re.compile(r"^\[\^[^\]]+\]:.*$", re.M), ""),                                       # 각주 정의
+    (re.compile(r"\{\{.*?\}\}|\{%.*?%\}", re.S), ""),                                   # shortcode
+)
+PREVIEW_INLINE_RES = (
+    (re.compile(r"!\[[^\]]*\]\([^)]*\)"), ""),                     # 이미지
+    (re.compile(r"\[\^[^\]]+\]"), ""),                             # 각주 참조 (sup)
+    (re.compile(r"`[^`]*`"), ""),
+    (re.compile(r"<(sup|code)\b.*?</\1>", re.S | re.I), ""),
+    (re.compile(r"<[^>]+>"), ""),
+    (re.compile(r"\[([^\]]*)\]\([^)]*\)"), r"\1"),
+    (re.compile(r"(\*\*|\*|~~)(?=\S)(.+?)(?<=\S)\1"), r"\2"),
+    (re.compile(r"(?<!\w)(__|_)(?=\S)(.+?)(?<=\S)\1(?!\w)"), r"\2"),   # _ 강조는 단어 경계에서만
+    (re.compile(r"\\([\\`*_{}\[\]()#+\-.!|])"), r"\1"),
+)
+PREVIEW_LIST_ITEM_RE = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s+")
+PREVIEW_SKIP_BLOCK_RE = re.compile(r"^\s*(?:#|\||(?:[-*_]\s*){3,}$)")   # 제목, 표, 구분선
+
+NOTE_PREVIEW: list[str] = []   # 렌더링 중인 노트의 미리보기 (노트마다 비움)
+
+def _preview_inline_text(s: str) -> str:
+    for rx, sub in PREVIEW_INLINE_RES:
+        s = rx.sub(sub, s)
+    return " ".join(html_unescape(s).split())
+
+def preview_text(body: str) -> str:
+    for rx, sub in PREVIEW_DROP_RES:
+        body = rx.sub(sub, body)
+    for block in re.split(r"\n\s*\n", body):
+        lines = [ln[1:].lstrip() if ln.lstrip().startswith(">") else ln for ln in block.strip("\n").split("\n")]
+        if not lines or PREVIEW_SKIP_BLOCK_RE.match(lines[0]):
+            continue
+        if PREVIEW_LIST_ITEM_RE.match(lines[0]):
+            # 목록이면 첫 항목만
+            item = [PREVIEW_LIST_ITEM_RE.sub("", lines[0])]
+            for ln in lines[1:]:
+                if PREVIEW_LIST_ITEM_RE.match(ln):
+                    break
+                item.append(ln)
+            lines = item
+        text = _preview_inline_text(" ".join(lines))
+        if text:
+            if len(text) > PREVIEW_MAX_CHARS:
+                text = text[:PREVIEW_MAX_CHARS].rsplit(" ", 1)[0] + "…"
+            return text
+    return ""
+
+def _preview_current(entry: dict) -> bool:
+    # --no-link-previews 로 렌더링한 노트는 "preview" 가 없음 → 미리보기를 다시 켜면 다시 렌더링
+    return not LINK_PREVIEWS or not entry.get("outputs") or "preview" in entry
+
+def preview_shard_of(href: str) -> str:
+    # /glossary/gl-001/ → en/glossary, /kr/works/project/pr-004/ → kr/works
+    parts = [p for p in href.split("/") if p]
+    lang = parts.pop(0) if parts and parts[0] == "kr" else "en"
+    return f"{PREVIEW_DIR}/{lang}/{parts[0] if parts else 'index'}.json"
+
+def preview_pages(metas: dict[str, dict], previews: dict[str, str], ignored: tuple[str, ...] = ()) -> dict[str, str]:
+    # 미리보기가 빈 노트도 "" 로 넣음 — page.html 은 shard 에 없는 href (섹션 페이지 등) 만 페이지를 받아서 뽑음
+    pages = {}
+    for rel in sorted(previews):
+        meta = metas.get(rel)
+        if not meta or not is_published(rel, meta, ignored):
+            continue
+        pages[meta["href"]] = previews[rel]
+    return pages
+
+def build_preview_shards(pages: dict[str, str]) -> dict[str, str]:
+    shards = {}
+    for href in sorted(pages):
+        shards.setdefault(preview_shard_of(href), {})[href] = pages[href]
+    return {
+        dest_rel: json.dumps({"v": PREVIEW_VERSION, "pages": shard}, ensure_ascii=False, separators=(",", ":")) + "\n"
+        for dest_rel, shard in sorted(shards.items())
+    }
+
+def sync_link_previews(notes: dict, changed: set[str] | None = None) -> int:
+    # changed (--watch 에서 이번에 바뀐 노트) 가 있으면 그 노트가 속한 shard 만 다시 씀
+    metas = {rel: e["meta"] for rel, e in notes.items() if "meta" in e}
+    previews = {rel: e["preview"] for rel, e in notes.items() if "preview" in e}
+    only = None
+    if changed is not None:
+        # slug 는 href 의 마지막 부분만 바꾸므로 shard 는 노트 경로로 정해짐 (지워진 노트도)
+        only = {preview_shard_of(_vault_rel_to_href(rel)) for rel in changed}
+        metas = {rel: m for rel, m in metas.items() if preview_shard_of(m["href"]) in only}
+    ignored = _zola_ignored_content(os.path.join(DEST, "config.toml"))
+    files = build_preview_shards(preview_pages(metas, previews, ignored))
+    n = 0
+    for dest_rel, text in files.items():
+        n += write_file_if_changed(os.path.join(DEST, dest_rel), text)
+    # 노트가 하나도 남지 않은 섹션의 shard 는 삭제
+    if only is None:
+        shards = [os.path.join(dirpath, fn) for dirpath, _, filenames in os.walk(os.path.join(DEST, PREVIEW_DIR))
+                  for fn in filenames]
+    else:
+        shards = [os.path.join(DEST, dest_rel) for dest_rel in sorted(only)
+                  if os.path.isfile(os.path.join(DEST, dest_rel))]
+    for p in shards:
+        if os.path.relpath(p, DEST).replace("\\", "/") not in files:
+            SINK.remove(p)
+            n += 1
+    return n
+
+
+# =============================================================================
+# LINK GRAPH (extra.backlinks / extra.related)
+# =============================================================================
+# 렌더링 전에 모든 노트의 wikilink 를 한 번 훑어 (원본 해시가 같으면 manifest 의 "links" 재사용)
+# 방향 그래프를 만들고, 노트마다 받은 링크와 관련 노트를 front matter extra 에 넣음.
+# 노트별 결과의 fingerprint ("graph") 가 바뀐 노트만 다시 렌더링
+
+BACKLINKS = True
+RELATED_K = 5             # 0 이면 extra.related 를 만들지 않음
+LINK_SCAN_CODE_RE = re.compile(r"```.*?```|~~~.*?~~~|`[^`\n]*`", re.S)
+
+NOTE_GRAPH: dict[str, dict] = {}   # 노트 → {"backlinks": [...], "related": [...]} (부모가 계산해 워커로 넘김)
+
+def link_graph_enabled() -> bool:
+    return BACKLINKS or RELATED_K > 0
+
+def scan_note_links(text: str, rel: str) -> dict:
+    kind, head, body = split_front_matter(text)
+    fm = FrontMatter.parse(kind, head)
+    d = doc_parent_of(rel)
+    out = set()
+    for m in WIKILINK_GLOBAL_RE.finditer(LINK_SCAN_CODE_RE.sub("", text)):
+        href, dangling = _resolve_site_href(m.group(1).strip(), d)
+        target = VAULT_INDEX["rels"].get(href.split("#", 1)[0])
+        if target and target != rel and not dangling:
+            out.add(target)
+    title = fm.get("display_title") or fm.get("title") or pathlib.PurePosixPath(rel).name.split(".")[0]
+    return {"out": sorted(out), "title": title, "href": note_href(fm, rel)}
+
+def _note_lang(rel: str) -> str:
+    return "kr" if rel.lower().endswith(".kr.md") else "en"
+
+# 실행 사이 (--watch 에서는 저장 사이) 에 유지하는 그래프 상태. 바뀐 노트의 간선만 고치고,
+# 이웃이 달라진 노트의 backlinks/related 만 다시 계산함
+GRAPH_LINKS: dict[str, dict] = {}     # 노트 → 그래프에 반영된 scan_note_links 결과 (나가는 간선)
+GRAPH_IN: dict[str, set[str]] = {}    # 대상 노트 → 그 노트를 가리키는 노트들 (들어오는 간선)
+GRAPH_LANG: dict[str, str] = {}       # 노트 → "en" / "kr" (노트가 들어올 때 한 번만 계산)
+GRAPH_FPS: dict[str, str] = {}        # 노트 → NOTE_GRAPH 항목의 fingerprint
+
+def link_graph_options() -> list:
+    # manifest 에 저장 — 값이 같을 때만 지난 실행의 그래프 fingerprint 를 재사용
+    return [BACKLINKS, RELATED_K]
+
+def reset_link_graph():
+    for d in (NOTE_GRAPH, GRAPH_LINKS, GRAPH_IN, GRAPH_LANG, GRAPH_FPS):
+        d.clear()
+
+def _set_graph_links(rel: str, entry: dict | None):
+    old = GRAPH_LINKS.pop(rel, None)
+    for t in old["out"] if old else ():
+        GRAPH_IN[t].discard(rel)
+        if not GRAPH_IN[t]:
+            del GRAPH_IN[t]
+    if entry is None:
+        GRAPH_LANG.pop(rel, None)
+        return
+    GRAPH_LINKS[rel] = entry
+    if rel not in GRAPH_LANG:
+        GRAPH_LANG[rel] = _note_lang(rel)
+    for t in entry["out"]:
+        GRAPH_IN.setdefault(t, set()).add(rel)
+
+def _graph_neighbourhood(rel: str) -> set[str]:
+    # rel 의 링크/제목/존재 여부가 바뀌면 결과가 달라질 수 있는 노트:
+    # rel 이 가리키는 노트와 그 노트를 같이 가리키는 노트, rel 을 가리키는 노트와 그 노트가 가리키는 노트
+    near = {rel}
+    entry = GRAPH_LINKS.get(rel)
+    for t in entry["out"] if entry else ():
+        near.add(t)
+        near |= GRAPH_IN.get(t, set())
+    for s in GRAPH_IN.get(rel, ()):
+        near.add(s)
+        near.update(GRAPH_LINKS[s]["out"])
+    return near
+
+def _graph_entry(rel: str) -> dict:
+    links, lang = GRAPH_LINKS, GRAPH_LANG[rel]
+
+    def ref(r):
+        return {"href": links[r]["href"], "title": links[r]["title"]}
+
+    data = {}
+    if BACKLINKS:
+        back = [s for s in sorted(GRAPH_IN.get(rel, ())) if GRAPH_LANG[s] == lang]
+        if back:
+            data["backlinks"] = [ref(s) for s in back]
+    if RELATED_K > 0:
+        # 같은 노트를 가리키거나 (공동 인용) 같은 노트에게서 가리켜지는 (공동 피인용) 만큼 점수
+        scores = {}
+        for t in links[rel]["out"]:
+            if t in links:
+                for other in GRAPH_IN.get(t, ()):
+                    scores[other] = scores.get(other, 0) + 1
+        for s in GRAPH_IN.get(rel, ()):
+            for other in links[s]["out"]:
+                if other in links:
+                    scores[other] = scores.get(other, 0) + 1
+        scores.pop(rel, None)
+        ranked = sorted((r for r in scores if GRAPH_LANG[r] == lang), key=lambda r: (-scores[r], r))
+        if ranked:
+            data["related"] = [ref(r) for r in ranked[:RELATED_K]]
+    return data
+
+def seed_link_graph(links: dict[str, dict], fps: dict[str, str]):
+    # 지난 실행의 링크와 fingerprint 로 상태를 되살림 (NOTE_GRAPH 는 ensure_link_graph 가 필요한 노트만 채움)
+    reset_link_graph()
+    for rel, entry in links.items():
+        _set_graph_links(rel, entry)
+    GRAPH_FPS.update({rel: fps.get(rel, "") for rel in links})
+
+def update_link_graph(links: dict[str, dict]) -> dict[str, str]:
+    # 지난 호출과 링크가 다른 노트의 간선만 고치고, 노트별 fingerprint 를 돌려줌
+    if not link_graph_enabled():
+        reset_link_graph()
+        return {rel: "" for rel in links}
+    if not GRAPH_LINKS:
+        reset_link_graph()
+        for rel in sorted(links):
+            _set_graph_links(rel, links[rel])
+        affected = set(links)
+    else:
+        changed = [rel for rel in GRAPH_LINKS.keys() | links.keys() if GRAPH_LINKS.get(rel) != links.get(rel)]
+        # 고치기 전과 후의 이웃을 합쳐야 끊어진 관계와 새로 생긴 관계를 모두 잡음
+        affected = set()
+        for rel in changed:
+            affected |= _graph_neighbourhood(rel)
+        for rel in changed:
+            _set_graph_links(rel, links.get(rel))
+        for rel in changed:
+            affected |= _graph_neighbourhood(rel)
+    for rel in affected:
+        if rel not in links:
+            NOTE_GRAPH.pop(rel, None)
+            GRAPH_FPS.pop(rel, None)
+            continue
+        data = NOTE_GRAPH[rel] = _graph_entry(rel)
+        GRAPH_FPS[rel] = (hashlib.sha1(json.dumps(data, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+                          .hexdigest()[:12] if data else "")
+    return dict(GRAPH_FPS)
+
+def ensure_link_graph(rels):
+    # seed 로 되살린 노트는 다시 렌더링할 때만 backlinks/related 를 계산
+    for rel in rels:
+        if rel in GRAPH_LINKS and rel not in NOTE_GRAPH:
+            NOTE_GRAPH[rel] = _graph_entry(rel)
+
+
+# =============================================================================
+# INCREMENTAL SYNC (MANIFEST)
+# =============================================================================
+
+MANIFEST_FILE = ".sync-manifest.json"
+MANIFEST_VERSION = 1
+MANIFEST_NOTES_JSON: dict[str, tuple[dict, str]] = {}   # 노트 → (항목, 직렬화한 항목) (dumps_entries 용)
+
+def _script_fingerprint() -> str:
+    return _hash_file(os.path.abspath(__file__))
+
+def source_stamp(p: str, prev: dict | None = None, data: bytes | None = None) -> dict:
+    # mtime + size 가 같으면 해시를 다시 계산하지 않음 (이미 읽어 둔 data 가 있으면 그것으로)
+    st = os.stat(p)
+    if prev and prev.get("mtime") == st.st_mtime_ns and prev.get("size") == st.st_size:
+        h = prev.get("hash")
+    elif data is not None:
+        h = hashlib.sha1(data).hexdigest()
+        _count_io("bytes_hashed", len(data))
+    else:
+        h = _hash_file(p)
+    return {"mtime": st.st_mtime_ns, "size": st.st_size, "hash": h}
+
+def _needs_read(p: str, prev: dict | None, stale: bool) -> bool:
+    # scan 단계에서 원본 내용이 필요한지 (해시를 다시 계산하거나 링크를 다시 훑어야 할 때)
+    st = os.stat(p)
+    if not (prev and prev.get("mtime") == st.st_mtime_ns and prev.get("size") == st.st_size):
+        return True
+    return link_graph_enabled() and (stale or "links" not in prev)
+
+def media_stamp(media_src: str) -> str:
+    h = hashlib.sha1()
+    for root, dirs, files in os.walk(media_src):
+        dirs.sort()
+        for f in sorted(files):
+            sp = os.path.join(root, f)
+            st = os.stat(sp)
+            rel = os.path.relpath(sp, media_src).replace("\\", "/")
+            h.update(f"{rel}\0{st.st_size}\0{st.st_mtime_ns}\n".encode("utf-8"))
+    return h.hexdigest()
+
+def load_manifest() -> dict | None:
+    p = os.path.join(DEST, MANIFEST_FILE)
+    try:
+        with open(p, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != MANIFEST_VERSION or data.get("script") != _script_fingerprint():
+        return None
+    return data
+
+def save_manifest(notes: dict, media: dict, index_fp: str = "", **extra):
+    if SINK.dry:
+        return
+    data = {
+        "version": MANIFEST_VERSION,
+        "script": _script_fingerprint(),
+        "index": index_fp,
+        "media": media,
+        **extra,
+    }
+    # 한 줄짜리 JSON. 노트 항목은 바뀐 것만 다시 직렬화 (--watch 에서 저장마다 수 MB 를 다시 만들지 않도록)
+    head = json.dumps(data, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+    write_file(os.path.join(DEST, MANIFEST_FILE),
+               head[:-1] + ',"notes":' + dumps_entries(notes, MANIFEST_NOTES_JSON) + "}\n")
+
+def _outputs_exist(outputs: list[str]) -> bool:
+    return all(os.path.isfile(os.path.join(DEST, o)) for o in outputs)
+
+def remove_outputs(outputs: list[str]):
+    for o in outputs:
+        p = os.path.join(DEST, o)
+        if os.path.isfile(p):
+            SINK.remove(p)
+            print(f"{op_label('DELETE')} {o}")
+        # 비어버린 상위 폴더 정리 (content/, static/media/ 자체는 유지)
+        d = os.path.dirname(p)
+        stop = {os.path.join(DEST, "content"), os.path.join(DEST, "static", "media")}
+        while not SINK.dry and d not in stop and d.startswith(DEST) and os.path.isdir(d) and not os.listdir(d):
+            os.rmdir(d)
+            d = os.path.dirname(d)
 
 
 # =============================================================================
@@ -871,64 +2736,1328 @@ def should_skip_as_section_index(rel_path_from_vault: str) -> bool:
         lower.endswith("contact/index.md") or lower.endswith("contact/index.kr.md")
     )
 
+# 전체 동기화는 content/ 를 지우고 다시 쓰는 대신 DEST/.sync-staging/content 에 만든 뒤
+# 바뀐 파일만 os.replace 로 옮기고 사라진 파일을 지움 → 도중에 멈춰도 content/ 는 이전 상태 그대로,
+# zola serve 는 마지막에 한 번 실제로 바뀐 파일만 봄
+STAGING_DIR = ".sync-staging"
+STAGED = False
+STAGE_STATS = {"written": 0, "unchanged": 0, "removed": 0}
+
+def content_dir() -> str:
+    if STAGED:
+        return os.path.join(DEST, STAGING_DIR, "content")
+    return os.path.join(DEST, "content")
+
+def _make_staging():
+    global STAGED
+    STAGE_STATS.update(dict.fromkeys(STAGE_STATS, 0))
+    STAGED = True
+    if SINK.dry:
+        return
+    stage_root = os.path.join(DEST, STAGING_DIR)
+    if os.path.isdir(stage_root):
+        shutil.rmtree(stage_root)   # 이전에 중단된 실행이 남긴 것
+    os.makedirs(os.path.join(stage_root, "content"))
+
+def stage_changed_content():
+    # --strict --incremental: 다시 렌더링하는 노트도 staging 에 쓰고, dangling 검사를 통과한 뒤에만 옮김
+    if not SINK.dry:
+        _make_staging()
+
+def discard_staged_content():
+    # --strict 로 중단: staging 에 쓴 것은 버리고 content/ 는 이전 상태 그대로
+    global STAGED
+    if STAGED and not SINK.dry:
+        shutil.rmtree(os.path.join(DEST, STAGING_DIR), ignore_errors=True)
+    STAGED = False
+
 def clean_destination():
-    content_dir = os.path.join(DEST, "content")
-    media_dir   = os.path.join(DEST, "static", "media")
-    if os.path.isdir(content_dir):
-        shutil.rmtree(content_dir)
-    os.makedirs(content_dir, exist_ok=True)
-    if os.path.isdir(media_dir):
-        shutil.rmtree(media_dir)
-
-def process_markdown(src_path: str, rel_path_from_vault: str):
+    _make_staging()
+    if SINK.dry:
+        return
+    os.makedirs(os.path.join(DEST, "content"), exist_ok=True)
+    # static/media 는 지우지 않음: copy_media_folder 가 바뀐 파일만 갱신하고 prune_media 가 정리
+    os.makedirs(os.path.join(DEST, "static", "media"), exist_ok=True)
+
+def commit_staged_content(prune: bool = True):
+    # prune=False (stage_changed_content): staging 에 있는 파일만 옮기고 나머지 content/ 는 그대로
+    global STAGED
+    if not STAGED:
+        return
+    stage = content_dir()
+    live = os.path.join(DEST, "content")
+    staged = set()
+    if SINK.dry:
+        staged = {os.path.relpath(os.path.join(DEST, r), live) for r in SINK.written if r.startswith("content/")}
+        STAGE_STATS["written"] = sum(r.startswith("content/") for r in SINK.changes)
+        STAGE_STATS["unchanged"] = len(staged) - STAGE_STATS["written"]
+    else:
+        for root, dirs, files in os.walk(stage):
+            for f in files:
+                sp = os.path.join(root, f)
+                rel = os.path.relpath(sp, stage)
+                staged.add(rel)
+                dp = os.path.join(live, rel)
+                if _same_file_bytes(sp, dp):
+                    STAGE_STATS["unchanged"] += 1
+                    continue
+                SINK.replace(sp, dp)
+                STAGE_STATS["written"] += 1
+    if prune:
+        for root, dirs, files in os.walk(live, topdown=False):
+            for f in files:
+                p = os.path.join(root, f)
+                if os.path.relpath(p, live) not in staged:
+                    SINK.remove(p)
+                    STAGE_STATS["removed"] += 1
+            if root != live and not SINK.dry and not os.listdir(root):
+                os.rmdir(root)
+    if not SINK.dry:
+        shutil.rmtree(os.path.join(DEST, STAGING_DIR))
+    STAGED = False
+
+def doc_parent_of(rel_path_from_vault: str) -> str:
+    doc_parent_rel = str(pathlib.PurePosixPath(rel_path_from_vault).parent)
+    return "" if doc_parent_rel == "." else doc_parent_rel
+
+def process_markdown(src_path: str, rel_path_from_vault: str, text: str | None = None) -> str | None:
     if should_skip_as_section_index(rel_path_from_vault):
+        return None
+
+    with profile_stage("note.read"):
+        if text is None:
+            text = read_note(src_path)
+    text2 = render_markdown(text, rel_path_from_vault)
+    NOTE_RENDERED.append(text2)
+
+    with profile_stage("note.write"):
+        return write_note(rel_path_from_vault, text2)
+
+def write_note(rel_path_from_vault: str, text: str) -> str:
+    dest_path = os.path.join(content_dir(), rel_path_from_vault)
+    write_file_if_changed(dest_path, text)
+    return os.path.join("content", rel_path_from_vault).replace("\\", "/")
+
+def render_markdown(text: str, rel_path_from_vault: str) -> str:
+    # 노트 하나의 변환 전체 (디스크를 건드리지 않음)
+    doc_parent_rel = doc_parent_of(rel_path_from_vault)
+
+    with profile_stage("note.split"):
+        kind, head, body = split_front_matter(text)
+    with profile_stage("note.body"):
+        body, footnotes = transform_body(doc_parent_rel, body)
+    if LINK_PREVIEWS:
+        with profile_stage("note.preview"):
+            NOTE_PREVIEW.append(preview_text(body))
+    if "/media/" in body:
+        body = rewrite_html_media_attrs(body)
+
+    with profile_stage("note.front_matter"):
+        fm = FrontMatter.parse(kind, head)
+        fm.normalize_date()
+        fm.move_custom_fields_into_extra(doc_parent_rel, footnotes)
+        if fm.kind and NOTE_GRAPH.get(rel_path_from_vault):
+            fm.extra.update(NOTE_GRAPH[rel_path_from_vault])
+        NOTE_META.update(note_meta(fm, rel_path_from_vault))
+        if SEARCH_INDEX:
+            NOTE_SEARCH.update(search_doc(fm, body, rel_path_from_vault))
+        return assemble_front_matter(kind, fm.dump(), body)
+
+def iter_vault_notes():
+    for root in SRC_CONTENT_ROOTS:
+        src_root = os.path.join(VAULT, root)
+        if not os.path.isdir(src_root):
+            continue
+        for dirpath, dirnames, filenames in os.walk(src_root):
+            dirnames.sort()
+            for fn in sorted(filenames):
+                if not MD_RE.search(fn): continue
+                if fn.startswith("_index"): continue
+                src_path = os.path.join(dirpath, fn)
+                rel = os.path.relpath(src_path, VAULT).replace("\\", "/")
+                yield src_path, rel
+
+# =============================================================================
+# PAGE WEIGHT REPORT (--page-budget)
+# =============================================================================
+# 페이지 (노트 × 언어) 마다 변환된 markdown + 페이지에 들어가는 media 크기를 더해 무거운 순으로
+#   DEST/.sync-page-weights.json  {"v", "budget", "pages": [{"page", "lang", "total", "markdown", "media", "files", "largest", "linked"}]}
+# media 는 참조하는 원본 크기 (중복 파일은 한 번). --responsive 면 브라우저가 더 작은 파생본을 받을 수 있으므로 상한값
+# 링크로만 거는 파일 ([파일](media/x.zip), [그림](media/a.webp)) 은 페이지를 열 때 받지 않으므로 예산에서 빼고 "linked" 로 따로
+
+PAGE_WEIGHT_FILE = ".sync-page-weights.json"
+PAGE_WEIGHT_VERSION = 2
+PAGE_WEIGHT_EXTS = IMAGE_EXTS | {".mp4", ".webm", ".mov", ".m4v"}
+PAGE_BUDGET = 5 << 20      # 이보다 무거운 페이지는 HEAVY 로 알림 (0 = 끔)
+STRICT_BUDGET = False      # --strict-budget: 예산을 넘는 페이지가 있으면 실패
+PAGE_WEIGHT_ROWS: dict[str, tuple[dict, dict]] = {}   # 노트 → (manifest 항목, page_weight) — 항목이 그대로면 재사용
+PAGE_WEIGHT_JSON: dict[str, tuple[dict, str]] = {}    # 노트 → (page_weight, 직렬화한 행) (dumps_cached 용)
+
+def _media_file_size(web: str, sizes: dict) -> int:
+    if web not in sizes:
+        sp = media_source_of(web)
+        sizes[web] = os.path.getsize(sp) if sp else 0
+    return sizes[web]
+
+def _weighed_media(webs, sizes: dict) -> dict[str, int]:
+    files = {}
+    for web in webs:
+        if os.path.splitext(web)[1].lower() in PAGE_WEIGHT_EXTS and f"/{DERIVATIVE_DIR}/" not in web:
+            canon = MEDIA_CANONICAL.get(web, web)
+            files[canon] = _media_file_size(canon, sizes)
+    return files
+
+def page_weight(rel: str, entry: dict, sizes: dict) -> dict:
+    # 예산에는 페이지에 실리는 media 만 셈. 링크로만 거는 파일은 "linked" 로 따로 보고
+    embeds = entry.get("media_embeds", [])
+    files = _weighed_media(embeds, sizes)
+    linked = _weighed_media(set(entry.get("media_refs", [])) - set(embeds), sizes)
+    md, media = entry.get("md_bytes", 0), sum(files.values())
+    largest = sorted(files.items(), key=lambda kv: (-kv[1], kv[0]))[:3]
+    return {"page": rel, "lang": _note_lang(rel), "total": md + media, "markdown": md, "media": media,
+            "files": len(files), "largest": [list(kv) for kv in largest],
+            "linked": sum(v for k, v in linked.items() if k not in files)}
+
+def page_weights(notes: dict) -> list[dict]:
+    # media 파일 크기가 바뀌었을 수 있으면 (--watch 의 media 변경) 호출 전에 PAGE_WEIGHT_ROWS 를 비움
+    sizes = {}
+    for rel in PAGE_WEIGHT_ROWS.keys() - notes.keys():
+        del PAGE_WEIGHT_ROWS[rel]
+    rows = []
+    for rel, e in notes.items():
+        if not e.get("outputs"):
+            continue
+        hit = cache_hit(PAGE_WEIGHT_ROWS, rel, e)
+        if hit is None:
+            hit = PAGE_WEIGHT_ROWS[rel] = (e, page_weight(rel, e, sizes))
+        rows.append(hit[1])
+    rows.sort(key=lambda r: (-r["total"], r["page"]))
+    return rows
+
+def write_page_weights(rows: list[dict]) -> int:
+    for rel in PAGE_WEIGHT_JSON.keys() - {r["page"] for r in rows}:
+        del PAGE_WEIGHT_JSON[rel]
+    pages = ",".join(dumps_cached(r["page"], r, PAGE_WEIGHT_JSON, sort_keys=False) for r in rows)
+    return write_file_if_changed(os.path.join(DEST, PAGE_WEIGHT_FILE),
+                                 f'{{"v":{PAGE_WEIGHT_VERSION},"budget":{PAGE_BUDGET},"pages":[{pages}]}}\n')
+
+def report_page_weights(rows: list[dict]) -> int:
+    # 예산을 넘는 페이지를 무거운 순으로 알리고 그 수를 돌려줌
+    n = 0
+    for r in rows:
+        if PAGE_BUDGET and r["total"] > PAGE_BUDGET:
+            print(f"HEAVY {r['page']}: {_fmt_bytes(r['total'])} ({_fmt_bytes(r['markdown'])} markdown + "
+                  f"{_fmt_bytes(r['media'])} in {r['files']} media file(s)) > {_fmt_bytes(PAGE_BUDGET)}")
+            n += 1
+    return n
+
+
+# =============================================================================
+# TRANSFORM CACHE (SQLite, --no-cache)
+# =============================================================================
+# (노트 경로, 원본 해시, 스크립트 버전, 렌더링 설정) → 변환된 markdown + manifest 항목
+# DEST 를 통째로 지운 경우 (CI 의 새 checkout 등) 에도 변환을 건너뛰고 캐시 내용을 그대로 씀
+# wikilink 의 해석 결과, 참조 이미지의 크기/LQIP, 중복 media 의 정본이 저장할 때와 다르면 캐시를 쓰지 않음. 크기 상한을 넘으면 오래 안 쓴 항목부터 삭제
+
+USE_CACHE = True
+CACHE_FILE = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+                          "sync_obsidian_to_zola", "transforms.sqlite")
+CACHE_MAX_BYTES = 256 << 20
+TRANSFORM_CACHE = None        # 부모 프로세스에서만 여는 TransformCache
+NOTE_RENDERED: list[str] = []   # 노트 하나의 변환 결과 (캐시에 넣기 위해 워커가 돌려줌)
+
+class TransformCache:
+    def __init__(self, path: str, max_bytes: int, readonly: bool = False):
+        # readonly (--dry-run): 있는 캐시를 읽기만 함. 파일/테이블 생성, used 갱신, 삭제 모두 안 함
+        self.readonly = readonly
+        if readonly:
+            self.db = sqlite3.connect(pathlib.Path(os.path.abspath(path)).as_uri() + "?mode=ro", uri=True, timeout=30)
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.db = sqlite3.connect(path, timeout=30)
+            self.db.execute("CREATE TABLE IF NOT EXISTS transforms "
+                            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, used REAL NOT NULL)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS transforms_used ON transforms (used)")
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "evicted": 0}
+
+    def get(self, key: str) -> dict | None:
+        row = self.db.execute("SELECT value FROM transforms WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if not self.readonly:
+            self.db.execute("UPDATE transforms SET used = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, key: str, value: dict):
+        if self.readonly:
+            return
+        s = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+        self.db.execute("INSERT OR REPLACE INTO transforms VALUES (?, ?, ?, ?)",
+                        (key, s, len(s.encode("utf-8")), time.time()))
+        self.stats["stored"] += 1
+
+    def commit(self):
+        # LRU: 합계가 max_bytes 를 넘으면 가장 오래 안 쓴 항목부터
+        if self.readonly:
+            return
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM transforms").fetchone()[0]
+        if total > self.max_bytes:
+            drop = []
+            for key, size in self.db.execute("SELECT key, size FROM transforms ORDER BY used, key"):
+                if total <= self.max_bytes:
+                    break
+                drop.append((key,))
+                total -= size
+            self.db.executemany("DELETE FROM transforms WHERE key = ?", drop)
+            self.stats["evicted"] += len(drop)
+        self.db.commit()
+
+def open_transform_cache(path: str, max_bytes: int):
+    global TRANSFORM_CACHE
+    TRANSFORM_CACHE = None
+    if not USE_CACHE:
+        return
+    if SINK.dry and not os.path.isfile(path):
         return
+    try:
+        TRANSFORM_CACHE = TransformCache(path, max_bytes, readonly=SINK.dry)
+    except (OSError, sqlite3.Error) as e:
+        print(f"WARN transform cache {path} unavailable ({e}); rendering everything")
+
+def transform_config_fingerprint() -> str:
+    # 노트 원본 말고 변환 결과를 바꾸는 것: 스크립트 자체, 렌더링 옵션, 검색 문서/미리보기 생성 여부
+    # 링크 대상 목록은 넣지 않음 — 노트 하나가 생기거나 없어질 때 캐시 전체가 무효가 되므로,
+    # 대신 꺼낼 때 그 노트가 쓴 wikilink 가 같은 곳으로 해석되는지 (_links_unchanged) 확인
+    data = [_script_fingerprint(), render_options_fingerprint(), SEARCH_INDEX, LINK_PREVIEWS]
+    return hashlib.sha1(json.dumps(data).encode("utf-8")).hexdigest()
+
+def transform_cache_key(rel: str, stamp: dict, config_fp: str) -> str:
+    data = [rel, stamp["hash"], stamp.get("graph", ""), config_fp]
+    return hashlib.sha1(json.dumps(data, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def _image_signature(src_rel: str) -> list:
+    meta = IMAGE_META.get(src_rel) or {}
+    return [meta.get("w"), meta.get("h"), meta.get("lqip") if LQIP else None]
+
+def cache_value(entry: dict, stats: dict) -> dict:
+    return {
+        "text": stats["text"],
+        "entry": {k: v for k, v in entry.items() if k != "images"},
+        "images": {src: _image_signature(src) for src in entry.get("images", {})},
+        "search": stats.get("search"),
+    }
 
-    text = read_file(src_path)
-    doc_parent_rel = str(pathlib.PurePosixPath(rel_path_from_vault).parent)
-    if doc_parent_rel == ".": doc_parent_rel = ""
+def _cached_markdown_task(rel: str, value: dict) -> tuple[dict, dict] | None:
+    # _process_markdown_task 와 같은 (entry, stats) 를 캐시에서 만듦
+    NOTE_IMAGES.clear()
+    IMAGE_META_NEW.clear()
+    t0 = time.perf_counter()
+    if not _links_unchanged(rel, value["entry"]) or not _media_urls_unchanged(value["entry"]):
+        return None
+    for src_rel, sig in value["images"].items():
+        image_meta(src_rel)
+        if _image_signature(src_rel) != sig:
+            return None
+    entry = dict(value["entry"])
+    write_note(rel, value["text"])
+    if NOTE_IMAGES:
+        entry["images"] = dict(NOTE_IMAGES)
+    stats = {"pid": os.getpid(), "cache": _resolver_snapshot(), "seconds": time.perf_counter() - t0}
+    if IMAGE_META_NEW:
+        stats["image_meta"] = dict(IMAGE_META_NEW)
+    if value["search"]:
+        stats["search"] = value["search"]
+    return entry, stats
 
-    kind, head, body = split_front_matter(text)
-    body = rewrite_media_paths(doc_parent_rel, body)
-    head, body = rewrite_wikilinks_in_body(kind, head, body, doc_parent_rel)
 
-    body = rewrite_footnotes_in_body(body, doc_parent_rel)
+# =============================================================================
+# PARALLEL EXECUTION
+# =============================================================================
 
-    body = transform_image_blocks(doc_parent_rel, body)
-    body = transform_markdown_images_with_directives(doc_parent_rel, body)
-    body = transform_disabled_links(body)
+JOBS = 1
+
+# 워커 프로세스로 넘겨야 하는 모듈 전역값 (spawn 방식에서는 모듈이 새로 import 되므로)
+WORKER_GLOBALS = ("VAULT", "DEST", "VAULT_INDEX", "PROFILE", "MAIN_PID",
+                  "RESPONSIVE", "RESPONSIVE_WIDTHS", "RESPONSIVE_MAX_DPR", "DERIVATIVE_QUALITY",
+                  "IMAGE_DIMS", "LQIP", "IMAGE_META", "STAGED", "SINK", "SEARCH_INDEX", "NOTE_GRAPH",
+                  "PREFETCH", "READ_LATENCY", "USE_CACHE", "MEDIA_CANONICAL", "MEDIA_CANONICAL_SOURCES",
+                  "MEDIA_PUBLISHED", "MEDIA_LOGICAL", "FINGERPRINT_MEDIA", "LINK_PREVIEWS")
+
+CACHED_RESOLVERS = (_resolve_site_href, to_web_media_path, media_href_from_value)
+RESOLVER_STATS: dict[int, dict] = {}  # pid → 해당 프로세스의 누적 cache_info
+MAIN_PID = os.getpid()
+
+def _init_worker(state: dict):
+    globals().update(state)
+    for fn in CACHED_RESOLVERS:
+        fn.cache_clear()
+    # fork 로 시작하면 부모의 누적값을 물려받으므로 비우고 시작
+    reset_profile()
+
+def _resolver_snapshot() -> dict:
+    return {fn.__name__: fn.cache_info()[:2] for fn in CACHED_RESOLVERS}
+
+def _process_markdown_task(item: tuple[str, str, str | None]) -> tuple[dict, dict]:
+    DANGLING_LINKS.clear()
+    NOTE_RESOLVED.clear()
+    NOTE_IMAGES.clear()
+    NOTE_DERIVATIVES.clear()
+    IMAGE_META_NEW.clear()
+    NOTE_SEARCH.clear()
+    NOTE_META.clear()
+    NOTE_PREVIEW.clear()
+    NOTE_MEDIA.clear()
+    NOTE_MEDIA_EMBEDS.clear()
+    NOTE_MEDIA_URLS.clear()
+    NOTE_RENDERED.clear()
+    t0 = time.perf_counter()
+    out = process_markdown(*item)
+    entry = {"outputs": [out] if out else [], "dangling": sorted(set(DANGLING_LINKS))}
+    if NOTE_RESOLVED and out:
+        entry["resolved"] = dict(sorted(NOTE_RESOLVED.items()))
+    if NOTE_IMAGES:
+        entry["images"] = dict(NOTE_IMAGES)
+    if NOTE_DERIVATIVES:
+        entry["derivatives"] = sorted(list(d) for d in NOTE_DERIVATIVES)
+    if NOTE_META and out:
+        entry["meta"] = dict(NOTE_META)
+    if NOTE_PREVIEW and out:
+        entry["preview"] = NOTE_PREVIEW[-1]
+    if NOTE_MEDIA and out:
+        entry["media_refs"] = sorted(NOTE_MEDIA)
+    if NOTE_MEDIA_EMBEDS and out:
+        entry["media_embeds"] = sorted(NOTE_MEDIA_EMBEDS)
+    if NOTE_RENDERED and out:
+        entry["md_bytes"] = len(NOTE_RENDERED[-1].encode("utf-8"))
+    if NOTE_MEDIA_URLS and out:
+        entry["media_urls"] = dict(sorted(NOTE_MEDIA_URLS.items()))
+    stats = {"pid": os.getpid(), "cache": _resolver_snapshot(), "seconds": time.perf_counter() - t0}
+    if PROFILE and stats["pid"] != MAIN_PID:
+        stats["profile"] = _profile_snapshot()
+    if IMAGE_META_NEW:
+        stats["image_meta"] = dict(IMAGE_META_NEW)
+    if NOTE_SEARCH:
+        stats["search"] = dict(NOTE_SEARCH)
+    if SINK.dry and stats["pid"] != MAIN_PID:
+        stats["sink"] = SINK.take()
+    if USE_CACHE and NOTE_RENDERED:
+        stats["text"] = NOTE_RENDERED[-1]
+    return entry, stats
+
+def run_markdown_jobs(items) -> list[dict]:
+    # 결과는 항상 입력 순서대로 (로그 순서가 실행마다 같도록)
+    if JOBS <= 1:
+        return [_process_markdown_task(it) for it in items]
+    items = list(items)
+    if len(items) < 2:
+        return [_process_markdown_task(it) for it in items]
+    state = {k: globals()[k] for k in WORKER_GLOBALS}
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=JOBS, initializer=_init_worker, initargs=(state,)
+    ) as ex:
+        return list(ex.map(_process_markdown_task, items, chunksize=max(1, len(items) // (JOBS * 4))))
+
+def _note_sources(todo: list[tuple[str, str]], sources: dict[str, str]):
+    # scan 에서 읽어 둔 원본은 그대로, 나머지는 변환하는 동안 앞질러 읽음
+    # (병렬 실행에서는 워커가 각자 읽으므로 None 으로 넘김)
+    if JOBS > 1:
+        return [(p, rel, sources.get(rel)) for p, rel in todo]
+    ahead = read_ahead(p for p, rel in todo if rel not in sources)
+    return ((p, rel, sources[rel] if rel in sources else decode_source(next(ahead)[1])) for p, rel in todo)
+
+def render_notes(todo: list[tuple[str, str]], stamps: dict, notes: dict, verbose: bool,
+                 sources: dict[str, str] | None = None):
+    # 캐시에 있는 노트는 그 결과를 쓰고, 나머지만 변환해서 캐시에 넣음
+    cache, keys, results = TRANSFORM_CACHE, {}, {}
+    if cache:
+        config_fp = transform_config_fingerprint()
+        for _, rel in todo:
+            keys[rel] = transform_cache_key(rel, stamps[rel], config_fp)
+            value = cache.get(keys[rel])
+            res = _cached_markdown_task(rel, value) if value else None
+            if res:
+                results[rel] = res
+        cache.stats["hits"] += len(results)
+        cache.stats["misses"] += len(todo) - len(results)
+    misses = [(p, rel) for p, rel in todo if rel not in results]
+    results.update(zip((rel for _, rel in misses), run_markdown_jobs(_note_sources(misses, sources or {}))))
+
+    for src_path, rel in todo:
+        entry, stats = results[rel]
+        notes[rel] = {**stamps[rel], **entry}
+        RESOLVER_STATS[stats["pid"]] = stats["cache"]
+        NOTE_SECONDS[rel] = stats["seconds"]
+        IMAGE_META.update(stats.get("image_meta", {}))
+        if cache and "text" in stats:
+            cache.put(keys[rel], cache_value(entry, stats))
+        if "sink" in stats:
+            SINK.merge(*stats["sink"])
+        if "search" in stats:
+            SEARCH_DOCS[rel] = {"hash": stamps[rel]["hash"], "doc": stats["search"]}
+        if "profile" in stats:
+            PROFILE_WORKERS[stats["pid"]] = stats["profile"]
+        if verbose:
+            print(f"{op_label('UPDATE')} {rel}")
+    if cache:
+        cache.commit()
+
+def print_resolver_stats():
+    for fn in CACHED_RESOLVERS:
+        hits = sum(s[fn.__name__][0] for s in RESOLVER_STATS.values())
+        misses = sum(s[fn.__name__][1] for s in RESOLVER_STATS.values())
+        if hits or misses:
+            print(f"cache {fn.__name__}: {hits} hits, {misses} misses ({100 * hits / (hits + misses):.0f}%)")
+
+def report_dangling_links(notes: dict) -> int:
+    n = 0
+    for rel in sorted(notes):
+        for target in notes[rel].get("dangling", []):
+            print(f"DANGLING [[{target}]] in {rel}")
+            n += 1
+    return n
+
+def print_dry_run(sink: DryRunSink, show_diff: bool):
+    print("\nDRY RUN: nothing under DEST was changed")
+    counts = {}
+    for rel in sorted(sink.changes):
+        c = sink.changes[rel]
+        kind = "content" if rel.startswith("content/") else "static"
+        counts.setdefault(kind, {}).setdefault(c["op"], [0, 0])
+        counts[kind][c["op"]][0] += 1
+        counts[kind][c["op"]][1] += c["bytes"] or 0
+        size = _fmt_bytes(c["bytes"]) if c["bytes"] is not None else "not encoded yet"
+        print(f"  {c['op'].upper():<7} {rel}  ({size})")
+        if show_diff and "new" in c:
+            diff = difflib.unified_diff((c["old"] or "").splitlines(keepends=True), c["new"].splitlines(keepends=True),
+                                        f"a/{rel}" if c["old"] is not None else "/dev/null", f"b/{rel}")
+            sys.stdout.writelines("    " + ln if ln.endswith("\n") else "    " + ln + "\n" for ln in diff)
+    for kind in ("content", "static"):
+        ops = counts.get(kind, {})
+        print(f"{kind}: " + ", ".join(f"{ops.get(op, [0])[0]} {done}" for op, done in
+                                      (("create", "created"), ("modify", "modified"), ("delete", "deleted")))
+              + (f"; {_fmt_bytes(sum(ops.get(op, [0, 0])[1] for op in ('create', 'modify')))} to write" if ops else ""))
+
+def _group_media_dirs(doc_parent_rels: list[str]) -> list[list[str]]:
+    # 서로 포함 관계인 폴더 (works, works/project ...) 는 같은 static/media 하위 트리에 쓰므로 한 그룹으로
+    groups = []
+    for d in sorted(doc_parent_rels):
+        for g in groups:
+            if g[0] == "" or d.startswith(g[0] + "/"):
+                g.append(d)
+                break
+        else:
+            groups.append([d])
+    return groups
 
-    footnotes = extract_footnotes_for_meta(body, doc_parent_rel)
+def run_media_jobs(items: dict[str, str]) -> dict[str, list[str]]:
+    def sync_group(group):
+        return [(d, copy_media_folder(items[d], d)) for d in group]
 
+    groups = _group_media_dirs(list(items))
+    if JOBS <= 1 or len(groups) < 2:
+        results = [sync_group(g) for g in groups]
+    else:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=JOBS) as ex:
+            results = list(ex.map(sync_group, groups))
+    return {d: outputs for res in results for d, outputs in res}
 
-    text2 = assemble_front_matter(kind, head, body)
-    text2 = ensure_normalized_date(text2)
-    text2 = move_custom_fields_into_extra(text2, doc_parent_rel, footnotes)
 
-    dest_path = os.path.join(DEST, "content", rel_path_from_vault)
-    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-    write_file(dest_path, text2)
-    copy_media_folder(os.path.dirname(src_path), doc_parent_rel)
+# =============================================================================
+# LIBRARY API (SyncPipeline → (dest_path, bytes) → sink)
+# =============================================================================
+#   from sync_obsidian_to_zola import SyncPipeline, DirectorySink, DictSink, TarSink
+#   SyncPipeline({"vault": "/path/to/vault", "responsive": True}).run(DirectorySink("site"))
+#   files = SyncPipeline(vault=v).run(DictSink(), documents={"thought/a.md": "..."}).files
+# 설정은 실행하는 동안만 모듈 전역값에 적용하고 끝나면 되돌림 → 한 프로세스에서 여러 번 돌려도 됨
+
+class DirectorySink:
+    # root 아래에 씀, 내용이 같은 파일은 건드리지 않음
+    def __init__(self, root: str):
+        self.root = root
+        self.stats = {"written": 0, "unchanged": 0}
+
+    def put(self, dest_path: str, data: bytes):
+        p = os.path.join(self.root, dest_path)
+        try:
+            if os.path.getsize(p) == len(data):
+                with open(p, "rb") as f:
+                    if f.read() == data:
+                        self.stats["unchanged"] += 1
+                        return
+        except OSError:
+            pass
+        os.makedirs(os.path.dirname(p), exist_ok=True)
+        tmp = p + ".sync-tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, p)
+        self.stats["written"] += 1
+
+    def close(self):
+        pass
+
+class DictSink:
+    def __init__(self):
+        self.files: dict[str, bytes] = {}
+
+    def put(self, dest_path: str, data: bytes):
+        self.files[dest_path] = data
+
+    def close(self):
+        pass
+
+class TarSink:
+    # target 은 경로나 쓰기용 파일 객체, mode 는 tarfile.open 과 같음 ("w", "w:gz", "w:xz" ...)
+    def __init__(self, target, mode: str = "w:gz"):
+        import tarfile
+        self._tarfile = tarfile
+        if isinstance(target, (str, os.PathLike)):
+            self.tar = tarfile.open(target, mode)
+        else:
+            self.tar = tarfile.open(fileobj=target, mode=mode)
+        self.mtime = int(time.time())
+
+    def put(self, dest_path: str, data: bytes):
+        info = self._tarfile.TarInfo(dest_path)
+        info.size, info.mtime, info.mode = len(data), self.mtime, 0o644
+        self.tar.addfile(info, io.BytesIO(data))
+
+    def close(self):
+        self.tar.close()
+
+class SyncPipeline:
+    # config 키 → 모듈 전역값
+    SETTINGS = {
+        "vault": "VAULT",
+        "responsive": "RESPONSIVE",
+        "widths": "RESPONSIVE_WIDTHS",
+        "derivative_quality": "DERIVATIVE_QUALITY",
+        "image_dims": "IMAGE_DIMS",
+        "lqip": "LQIP",
+        "search_index": "SEARCH_INDEX",
+        "link_previews": "LINK_PREVIEWS",
+        "all_media": "MEDIA_ALL",
+        "dedup_media": "MEDIA_DEDUP",
+        "fingerprint_media": "FINGERPRINT_MEDIA",
+        "backlinks": "BACKLINKS",
+        "related": "RELATED_K",
+    }
+    DEFAULTS = {
+        "vault": VAULT,
+        "responsive": False,
+        "widths": RESPONSIVE_WIDTHS,
+        "derivative_quality": DERIVATIVE_QUALITY,
+        "image_dims": True,
+        "lqip": False,
+        "search_index": True,      # static/search/** (언어 × 섹션별 검색 shard)
+        "link_previews": True,     # static/preview/** (hover 미리보기용 첫 문단)
+        "backlinks": True,
+        "related": RELATED_K,
+        "section_indexes": True,   # content/**/_index*.md 도 내보냄
+        "media": True,             # static/media/** (노트가 참조하는 media/ 파일과 파생본)
+        "all_media": False,        # 참조되지 않은 media/ 파일도 (junk 제외)
+        "dedup_media": True,       # 내용이 같은 media 파일은 정본 하나만 (참조도 정본 URL 로)
+        "fingerprint_media": False,   # media 를 <이름>.<해시>.<확장자> 로 + static/media-manifest.json
+        "config_toml": os.path.join(DEST, "config.toml"),   # ignored_content 를 읽을 zola 설정
+        "ignored_content": None,   # glob 목록을 직접 주면 config_toml 대신 사용
+    }
 
-def main():
-    clean_destination()
+    def __init__(self, config: dict | None = None, **overrides):
+        cfg = {**self.DEFAULTS, **(config or {}), **overrides}
+        unknown = sorted(set(cfg) - set(self.DEFAULTS))
+        if unknown:
+            raise ValueError(f"unknown SyncPipeline option(s): {', '.join(unknown)}")
+        cfg["widths"] = tuple(sorted(set(cfg["widths"])))
+        if cfg["ignored_content"] is None:
+            cfg["ignored_content"] = _zola_ignored_content(cfg["config_toml"]) if cfg["config_toml"] else ()
+        cfg["ignored_content"] = tuple(cfg["ignored_content"])
+        if (cfg["responsive"] or cfg["lqip"]) and _load_pil() is None:
+            raise RuntimeError("responsive/lqip need Pillow (pip install Pillow)")
+        self.config = cfg
+        self.dangling: dict[str, list[str]] = {}   # 노트 → 없는 wikilink 대상
+        self.derivatives: set[tuple] = set()
+        self.search_docs: dict[str, dict] = {}
+        self.metas: dict[str, dict] = {}
+        self.previews: dict[str, str] = {}
+        self.media_refs: set[str] = set()
+
+    @contextlib.contextmanager
+    def _activate(self):
+        names = list(self.SETTINGS.values()) + ["VAULT_INDEX", "SINK", "STAGED", "MEDIA_WANTED",
+                                                "MEDIA_HASHES", "MEDIA_CANONICAL", "MEDIA_CANONICAL_SOURCES",
+                                                "MEDIA_PUBLISHED", "MEDIA_LOGICAL",
+                                                "GRAPH_LINKS", "GRAPH_IN", "GRAPH_LANG", "GRAPH_FPS"]
+        saved = {g: globals()[g] for g in names}
+        saved_meta, saved_graph = dict(IMAGE_META), dict(NOTE_GRAPH)
+        globals().update({g: self.config[k] for k, g in self.SETTINGS.items()})
+        globals().update(SINK=FileSink(), STAGED=False, GRAPH_LINKS={}, GRAPH_IN={}, GRAPH_LANG={}, GRAPH_FPS={})
+        IMAGE_META.clear()
+        for fn in CACHED_RESOLVERS:
+            fn.cache_clear()
+        try:
+            yield
+        finally:
+            globals().update(saved)
+            IMAGE_META.clear()
+            IMAGE_META.update(saved_meta)
+            NOTE_GRAPH.clear()
+            NOTE_GRAPH.update(saved_graph)
+            for fn in CACHED_RESOLVERS:
+                fn.cache_clear()
+
+    def iter_documents(self, documents: dict[str, str] | None = None):
+        # (vault 기준 경로, 원문) — documents 를 주면 vault 대신 그것을 씀
+        if documents is not None:
+            for rel in sorted(documents):
+                if MD_RE.search(rel) and not should_skip_as_section_index(rel):
+                    yield rel, documents[rel]
+            return
+        notes = [(p, rel) for p, rel in iter_vault_notes() if not should_skip_as_section_index(rel)]
+        for (_, rel), (_, data) in zip(notes, read_ahead(p for p, _ in notes)):
+            yield rel, decode_source(data)
+
+    def transform(self, docs):
+        for rel, text in docs:
+            DANGLING_LINKS.clear()
+            NOTE_RESOLVED.clear()
+            NOTE_IMAGES.clear()
+            IMAGE_META_NEW.clear()
+            NOTE_DERIVATIVES.clear()
+            NOTE_SEARCH.clear()
+            NOTE_META.clear()
+            NOTE_PREVIEW.clear()
+            NOTE_MEDIA.clear()
+            NOTE_MEDIA_EMBEDS.clear()
+            NOTE_MEDIA_URLS.clear()
+            out = render_markdown(text, rel)
+            self.media_refs |= NOTE_MEDIA
+            self.metas[rel] = dict(NOTE_META)
+            if NOTE_PREVIEW:
+                self.previews[rel] = NOTE_PREVIEW[-1]
+            if NOTE_SEARCH:
+                self.search_docs[rel] = dict(NOTE_SEARCH)
+            if DANGLING_LINKS:
+                self.dangling[rel] = sorted(set(DANGLING_LINKS))
+            self.derivatives |= NOTE_DERIVATIVES
+            yield f"content/{rel}", out.encode("utf-8")
+
+    def iter_section_indexes(self):
+        for sec in SECTIONS:
+            for rel, text in section_index_texts(sec).items():
+                yield f"content/{rel}", text.encode("utf-8")
+
+    def iter_media(self, note_rels):
+        set_media_wanted(self.media_refs)
+        published = set()
+        for d in sorted({doc_parent_of(r) for r in note_rels}):
+            media_src = os.path.join(VAULT, d, "media")
+            for root, dirs, files in os.walk(media_src):
+                dirs.sort()
+                rel = os.path.relpath(root, media_src)
+                for f in sorted(files):
+                    dest = os.path.normpath(os.path.join("static", "media", d, rel, f)).replace("\\", "/")
+                    if not media_wanted(dest[len("static"):]):
+                        continue
+                    dest = published_media_dest(dest[len("static"):])
+                    published.add(dest)
+                    with open(os.path.join(root, f), "rb") as fh:
+                        yield dest, fh.read()
+        for src_rel, width, dest_rel in sorted(self.derivatives):
+            yield dest_rel, encode_derivative(os.path.join(VAULT, src_rel), width)
+        if FINGERPRINT_MEDIA:
+            yield MEDIA_MANIFEST, build_media_manifest(published).encode("utf-8")
+
+    def iter_search_index(self):
+        groups = {}
+        for rel in sorted(self.search_docs):
+            if not is_published(rel, self.metas.get(rel, {}), self.config["ignored_content"]):
+                continue
+            groups.setdefault(search_shard_of(rel), []).append((rel, self.search_docs[rel]))
+        shards = {}
+        for dest_rel, members in groups.items():
+            text = build_search_shard(dest_rel, members)
+            shards[dest_rel] = {"v": _search_version_of(text), "docs": len(members)}
+            yield dest_rel, text.encode("utf-8")
+        yield f"{SEARCH_DIR}/index.json", build_search_listing(shards).encode("utf-8")
+
+    def iter_outputs(self, documents: dict[str, str] | None = None):
+        self.dangling, self.derivatives, self.search_docs, self.metas, self.previews = {}, set(), {}, {}, {}
+        self.media_refs = set()
+        with self._activate():
+            if documents is not None:
+                note_rels = [r for r in documents if MD_RE.search(r)]
+            else:
+                note_rels = [rel for _, rel in iter_vault_notes()]
+            set_vault_index(build_vault_index(note_rels))
+            if media_index_enabled():
+                build_media_index({doc_parent_of(r) for r in note_rels}, {})
+            else:
+                clear_media_index()
+            docs = self.iter_documents(documents)
+            if link_graph_enabled():
+                # 그래프에 전체 노트가 필요하므로 한 번 읽어 둔 원문을 변환에도 그대로 씀
+                docs = list(docs)
+                update_link_graph({rel: scan_note_links(text, rel) for rel, text in docs})
+            else:
+                NOTE_GRAPH.clear()
+            if self.config["section_indexes"]:
+                yield from self.iter_section_indexes()
+            yield from self.transform(docs)
+            if self.config["media"]:
+                yield from self.iter_media(note_rels)
+            if self.config["search_index"]:
+                yield from self.iter_search_index()
+            ignored = self.config["ignored_content"]
+            for dest_rel, text in build_archive_manifests(self.metas, ignored).items():
+                yield dest_rel, text.encode("utf-8")
+            if self.config["link_previews"]:
+                for dest_rel, text in build_preview_shards(preview_pages(self.metas, self.previews, ignored)).items():
+                    yield dest_rel, text.encode("utf-8")
+
+    def run(self, sink, documents: dict[str, str] | None = None):
+        try:
+            for dest_path, data in self.iter_outputs(documents):
+                sink.put(dest_path, data)
+        finally:
+            sink.close()
+        return sink
 
-    for sec in SECTIONS:
-        ensure_index_for_section(sec)
 
+# =============================================================================
+# WATCH MODE
+# =============================================================================
+
+def _snapshot_vault() -> dict[str, tuple[int, int]]:
+    snap = {}
     for root in SRC_CONTENT_ROOTS:
-        src_root = os.path.join(VAULT, root)
-        if not os.path.isdir(src_root):
-            continue
-        for dirpath, _, filenames in os.walk(src_root):
+        for dirpath, _, filenames in os.walk(os.path.join(VAULT, root)):
             for fn in filenames:
-                if not MD_RE.search(fn): continue
-                if fn.startswith("_index"): continue
-                src_path = os.path.join(dirpath, fn)
-                rel = os.path.relpath(src_path, VAULT).replace("\\", "/")
-                process_markdown(src_path, rel)
+                p = os.path.join(dirpath, fn)
+                try:
+                    st = os.stat(p)
+                except FileNotFoundError:
+                    continue
+                snap[p] = (st.st_mtime_ns, st.st_size)
+    return snap
+
+def _start_native_watcher():
+    # watchdog (FSEvents / inotify) 가 있으면 사용, 없으면 None → stdlib 폴링
+    try:
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+    except ImportError:
+        return None, None
+
+    changed, lock = set(), threading.Lock()
+
+    class Handler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            with lock:
+                changed.add(event.src_path)
+                if getattr(event, "dest_path", None):
+                    changed.add(event.dest_path)
+
+    observer = Observer()
+    for root in SRC_CONTENT_ROOTS:
+        src_root = os.path.join(VAULT, root)
+        if os.path.isdir(src_root):
+            observer.schedule(Handler(), src_root, recursive=True)
+    observer.start()
+
+    def drain() -> set[str]:
+        with lock:
+            out = set(changed)
+            changed.clear()
+        return out
+
+    return observer, drain
+
+def sync_changed_paths(paths: set[str], state: dict) -> int:
+    notes, media = state["notes"], state["media"]
+    changed_notes, changed_media = set(), set()
 
-    print("\nDone. Now run: zola serve")
+    for p in paths:
+        rel = os.path.relpath(p, VAULT).replace("\\", "/")
+        if rel.startswith("../") or rel.split("/", 1)[0] not in SRC_CONTENT_ROOTS:
+            continue
+        if MD_RE.search(rel) and not os.path.basename(rel).startswith("_index"):
+            changed_notes.add(rel)
+        if "/media/" in "/" + rel:
+            changed_media.add(("/" + rel).split("/media/", 1)[0].lstrip("/"))
+        if not os.path.exists(p):
+            # 폴더째 지워진 경우
+            changed_notes.update(n for n in notes if n.startswith(rel + "/"))
+            changed_media.update(d for d in media if d == rel or d.startswith(rel + "/"))
+
+    if changed_media:
+        # media 파일 크기가 바뀌었을 수 있으므로 페이지 무게를 전부 다시 계산
+        PAGE_WEIGHT_ROWS.clear()
+
+    # 노트가 생기거나 없어지면 링크 대상이 바뀌므로 인덱스를 다시 만들고, 달라졌으면 전부 다시 렌더링
+    force = set()
+    if (RESPONSIVE or IMAGE_DIMS) and changed_media:
+        # 이미지 크기가 바뀌면 srcset/width/height/lqip 도 바뀜
+        force = {n for n in notes if doc_parent_of(n) in changed_media and not _images_unchanged(notes[n])}
+        changed_notes |= force
+    if media_index_enabled() and changed_media:
+        # 중복 파일이 생기거나 없어지거나 내용이 바뀌면 정본/배포 URL 이 바뀐 노트도 다시 렌더링
+        build_media_index({doc_parent_of(rel) for _, rel in iter_vault_notes()}, MEDIA_HASHES)
+        redo = {n for n in notes if not _media_urls_unchanged(notes[n])}
+        force |= redo
+        changed_notes |= redo
+    if any(os.path.isfile(os.path.join(VAULT, r)) != (r in notes) for r in changed_notes):
+        set_vault_index(build_vault_index(rel for _, rel in iter_vault_notes()))
+        fp = vault_index_fingerprint(VAULT_INDEX)
+        if fp != state.get("index"):
+            # wikilink 해석이 달라진 노트만 (새 노트는 이미 changed_notes 에 있음)
+            state["index"] = fp
+            redo = {n for n in notes if not _links_unchanged(n, notes[n])}
+            force |= redo
+            changed_notes |= redo
+
+    todo, stamps = [], {}
+    for rel in sorted(changed_notes):
+        src_path = os.path.join(VAULT, rel)
+        old = notes.get(rel)
+        if not os.path.isfile(src_path):
+            if old:
+                remove_outputs(old.get("outputs", []))
+                del notes[rel]
+            continue
+        stamp = source_stamp(src_path, old)
+        if (old and rel not in force and old.get("hash") == stamp["hash"]
+                and _outputs_exist(old.get("outputs", []))):
+            notes[rel] = {**old, **stamp}
+            continue
+        todo.append((src_path, rel))
+        stamps[rel] = stamp
+        changed_media.add(doc_parent_of(rel))
+
+    # 바뀐 노트의 링크로 그래프를 다시 만들고, backlinks/related 가 달라진 다른 노트도 다시 렌더링
+    if link_graph_enabled():
+        links = {rel: e["links"] for rel, e in notes.items() if "links" in e}
+        for src_path, rel in todo:
+            stamps[rel]["links"] = links[rel] = scan_note_links(read_note(src_path), rel)
+        for rel, fp in update_link_graph(links).items():
+            if rel in stamps:
+                stamps[rel]["graph"] = fp
+            elif notes[rel].get("graph", "") != fp:
+                src_path = os.path.join(VAULT, rel)
+                todo.append((src_path, rel))
+                stamps[rel] = {**source_stamp(src_path, notes[rel]), "links": links[rel], "graph": fp}
+
+    ensure_link_graph(rel for _, rel in todo)
+    render_notes(todo, stamps, notes, verbose=True)
+    report_dangling_links({rel: notes[rel] for _, rel in todo})
+    report_missing_media({rel: notes[rel] for _, rel in todo})
+    weights = page_weights(notes)
+    write_page_weights(weights)
+    done = {rel for _, rel in todo}
+    report_page_weights([r for r in weights if r["page"] in done])
+
+    # 참조 목록이 바뀐 media 폴더도 다시 동기화
+    set_media_wanted(r for e in notes.values() for r in e.get("media_refs", []))
+    changed_media |= {d for d in media if media[d].get("refs") != media_refs_fingerprint(d)}
+
+    for d in sorted(changed_media):
+        old_outputs = media.get(d, {}).get("outputs", [])
+        media_src = os.path.join(VAULT, d, "media")
+        has_note = any(doc_parent_of(n) == d for n in notes)
+        if not (has_note and os.path.isdir(media_src)):
+            if d in media:
+                remove_outputs(old_outputs)
+                del media[d]
+            continue
+        sig, refs = media_stamp(media_src), media_refs_fingerprint(d)
+        if media.get(d, {}).get("sig") == sig and media[d].get("refs") == refs and _outputs_exist(old_outputs):
+            continue
+        outputs = copy_media_folder(os.path.join(VAULT, d), d)
+        remove_outputs(sorted(set(old_outputs) - set(outputs)))
+        media[d] = {"sig": sig, "refs": refs, "outputs": outputs}
+        print(f"{op_label('SYNC')} static/media/{d}")
+
+    derivatives = sync_derivatives(notes, state.get("derivatives", {}))
+    remove_outputs(sorted(set(state.get("derivatives", {})) - set(derivatives)))
+    state["derivatives"] = derivatives
+    # 검색/archive/미리보기 목록은 바뀐 노트가 속한 shard 와 언어만 다시 씀
+    if SEARCH_INDEX:
+        sync_search_index(notes, changed_notes | done)
+    if sync_archive_manifests(notes, changed_notes | done):
+        print(f"{op_label('SYNC')} {ARCHIVE_DIR}")
+    if LINK_PREVIEWS and sync_link_previews(notes, changed_notes | done):
+        print(f"{op_label('SYNC')} {PREVIEW_DIR}")
+    if sync_media_manifest(media):
+        print(f"{op_label('SYNC')} {MEDIA_MANIFEST}")
+
+    save_manifest(notes, media, state.get("index", ""), derivatives=derivatives, options=state.get("options", ""),
+                  graph=link_graph_options(), image_meta=referenced_image_meta(notes), media_hashes=MEDIA_HASHES)
+    return len(todo)
+
+def watch_vault(poll: float, debounce: float):
+    state = load_manifest() or {"notes": {}, "media": {}, "index": ""}
+    state["options"] = render_options_fingerprint()
+    observer, drain = _start_native_watcher()
+    snap = _snapshot_vault() if observer is None else None
+    print(f"\nWatching {VAULT} ({'native events' if observer else f'polling every {poll * 1000:.0f} ms'}). Ctrl+C to stop.")
+
+    pending, last_change = set(), 0.0
+    try:
+        while True:
+            time.sleep(poll)
+            if observer is None:
+                new_snap = _snapshot_vault()
+                changed = {p for p in snap.keys() | new_snap.keys() if snap.get(p) != new_snap.get(p)}
+                snap = new_snap
+            else:
+                changed = drain()
+            if changed:
+                # iCloud / Obsidian 은 저장 한 번에 여러 번 쓰므로 조용해질 때까지 기다림
+                pending |= changed
+                last_change = time.monotonic()
+                continue
+            if pending and time.monotonic() - last_change >= debounce:
+                t0 = time.perf_counter()
+                n = sync_changed_paths(pending, state)
+                pending = set()
+                print(f"synced {n} note(s) in {(time.perf_counter() - t0) * 1000:.0f} ms")
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+    finally:
+        if observer is not None:
+            observer.stop()
+            observer.join()
+
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Sync the Obsidian vault into the Zola content/ and static/media/ trees.")
+    ap.add_argument("--vault", default=VAULT, metavar="DIR",
+                    help="Obsidian vault to read from (default: the VAULT constant)")
+    ap.add_argument("--dest", default=DEST, metavar="DIR",
+                    help="Zola site root to write content/ and static/media/ into (default: the DEST constant)")
+    ap.add_argument("--incremental", action="store_true",
+                    help=f"reuse {MANIFEST_FILE} and only rebuild notes/media whose source changed")
+    ap.add_argument("--all-media", action="store_true",
+                    help="copy every file in media/ folders, not only the ones notes reference (junk like .DS_Store is still skipped)")
+    ap.add_argument("--media-allow", action="append", default=[], metavar="GLOB",
+                    help="also copy unreferenced media files matching GLOB (repeatable; always: %s)" % ", ".join(MEDIA_ALLOW))
+    ap.add_argument("--no-media-dedup", action="store_true",
+                    help="publish every media file under its own URL, even when another media/ folder holds the same bytes")
+    ap.add_argument("--fingerprint-media", action="store_true",
+                    help=f"publish media as <name>.<content hash>.<ext> (safe to cache forever) and write {MEDIA_MANIFEST}")
+    ap.add_argument("--no-link-media", action="store_true",
+                    help="always copy media instead of cloning/hardlinking on the same filesystem")
+    ap.add_argument("--jobs", "-j", type=int, default=1, metavar="N",
+                    help="process notes in N worker processes (0 = one per CPU)")
+    ap.add_argument("--watch", action="store_true",
+                    help="after syncing, stay resident and resync notes/media as the vault changes")
+    ap.add_argument("--poll", type=float, default=0.05, metavar="SEC",
+                    help="polling interval for --watch when watchdog is not installed (default: 0.05)")
+    ap.add_argument("--debounce", type=float, default=0.05, metavar="SEC",
+                    help="quiet period before a burst of vault writes is synced (default: 0.05)")
+    ap.add_argument("--strict", action="store_true",
+                    help="exit with an error, before publishing anything, when a wikilink points at a note "
+                         "that does not exist")
+    ap.add_argument("--page-budget", type=float, default=PAGE_BUDGET / (1 << 20), metavar="MB",
+                    help=f"report pages whose markdown + media exceed MB (0 = off; default: %(default)g); "
+                         f"all pages are listed in {PAGE_WEIGHT_FILE}")
+    ap.add_argument("--strict-budget", action="store_true",
+                    help="exit with an error when a page is over --page-budget")
+    ap.add_argument("--prefetch", type=int, default=PREFETCH, metavar="N",
+                    help="read up to N vault notes ahead on background threads so slow (iCloud) reads "
+                         "overlap with rendering; 0 disables (default: %(default)s)")
+    ap.add_argument("--prefetch-media", action="store_true",
+                    help="also read media files ahead before copying (useful when the vault is not downloaded yet)")
+    ap.add_argument("--read-latency", type=float, default=0.0, metavar="SEC",
+                    help="testing: sleep SEC on the first read of every vault file, like a cold iCloud download")
+    ap.add_argument("--no-cache", action="store_true",
+                    help="do not read or write the transform cache (render every changed note from scratch)")
+    ap.add_argument("--cache", default=CACHE_FILE, metavar="FILE",
+                    help="SQLite transform cache shared between runs and checkouts (default: %(default)s)")
+    ap.add_argument("--cache-size", type=int, default=CACHE_MAX_BYTES >> 20, metavar="MB",
+                    help="evict least recently used cache entries above this size (default: %(default)s)")
+    ap.add_argument("--responsive", action="store_true",
+                    help="generate resized WebP derivatives and emit srcset/sizes/width/height (needs Pillow)")
+    ap.add_argument("--widths", default=",".join(map(str, RESPONSIVE_WIDTHS)), metavar="W,W,...",
+                    help="derivative widths in px for --responsive (default: %(default)s)")
+    ap.add_argument("--derivative-quality", type=int, default=DERIVATIVE_QUALITY, metavar="Q",
+                    help="WebP quality for --responsive derivatives (default: %(default)s)")
+    ap.add_argument("--no-image-dims", action="store_true",
+                    help="do not read image headers for width/height attributes and extra.<key>_w/_h")
+    ap.add_argument("--lqip", action="store_true",
+                    help="embed a tiny blurred placeholder per image and extra.<key>_lqip (needs Pillow)")
+    ap.add_argument("--no-link-previews", action="store_true",
+                    help="do not write static/preview/** (first-paragraph snippets for hover previews)")
+    ap.add_argument("--no-backlinks", action="store_true",
+                    help="do not add extra.backlinks (notes whose wikilinks point at the page)")
+    ap.add_argument("--related", type=int, default=RELATED_K, metavar="K",
+                    help="add up to K notes sharing the most links as extra.related; 0 disables (default: %(default)s)")
+    ap.add_argument("--no-search-index", action="store_true",
+                    help="do not write the per-language/per-section search shards under static/search/")
+    ap.add_argument("--dry-run", "-n", action="store_true",
+                    help="render everything in memory and report what would be created/modified/deleted")
+    ap.add_argument("--diff", action="store_true",
+                    help="with --dry-run, also print unified diffs of the generated markdown")
+    ap.add_argument("--profile", action="store_true",
+                    help="print per-stage timings, I/O totals, the slowest notes and the largest media dirs")
+    ap.add_argument("--profile-json", metavar="FILE",
+                    help="also write the --profile report as JSON (implies --profile)")
+    ap.add_argument("--pstats", metavar="FILE",
+                    help="run the main process under cProfile and dump pstats to FILE (implies --profile)")
+    return ap.parse_args(argv)
+
+def main(argv=None):
+    global VAULT, DEST, LINK_MEDIA, JOBS, STRICT_LINKS, PROFILE, STAGED, SINK, PAGE_BUDGET, STRICT_BUDGET
+    global RESPONSIVE, RESPONSIVE_WIDTHS, DERIVATIVE_QUALITY, IMAGE_DIMS, LQIP, SEARCH_INDEX
+    global BACKLINKS, RELATED_K, LINK_PREVIEWS, MEDIA_ALL, MEDIA_ALLOW, MEDIA_DEDUP, FINGERPRINT_MEDIA, PREFETCH, PREFETCH_MEDIA, READ_LATENCY, USE_CACHE
+    args = parse_args(argv)
+    VAULT, DEST = args.vault, args.dest
+    # 같은 프로세스에서 main() 을 여러 번 부를 때 (벤치마크 등) 통계가 누적되지 않도록
+    MEDIA_STATS.update(dict.fromkeys(MEDIA_STATS, 0))
+    DERIVATIVE_STATS.update(dict.fromkeys(DERIVATIVE_STATS, 0))
+    RESOLVER_STATS.clear()
+    reset_profile()
+    STAGED = False
+    SINK = DryRunSink() if args.dry_run else FileSink()
+    if args.dry_run and args.watch:
+        sys.exit("--dry-run cannot be combined with --watch")
+    if args.dry_run:
+        print("DRY RUN: listing planned changes only; nothing under DEST will be written\n")
+    LINK_MEDIA = not args.no_link_media
+    JOBS = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    STRICT_LINKS = args.strict
+    PAGE_BUDGET = max(0, int(args.page_budget * (1 << 20)))
+    STRICT_BUDGET = args.strict_budget
+    PROFILE = bool(args.profile or args.profile_json or args.pstats)
+    RESPONSIVE = args.responsive
+    RESPONSIVE_WIDTHS = tuple(sorted({int(w) for w in args.widths.split(",") if w.strip()}))
+    DERIVATIVE_QUALITY = args.derivative_quality
+    if RESPONSIVE and _load_pil() is None:
+        print("WARN --responsive needs Pillow (pip install Pillow); emitting plain <img> tags")
+        RESPONSIVE = False
+    IMAGE_DIMS = not args.no_image_dims
+    SEARCH_INDEX = not args.no_search_index
+    BACKLINKS = not args.no_backlinks
+    LINK_PREVIEWS = not args.no_link_previews
+    MEDIA_ALL = args.all_media
+    MEDIA_DEDUP = not args.no_media_dedup
+    FINGERPRINT_MEDIA = args.fingerprint_media
+    MEDIA_ALLOW = MEDIA_ALLOW + [g.lower() for g in args.media_allow if g.lower() not in MEDIA_ALLOW]
+    PREFETCH = max(0, args.prefetch)
+    PREFETCH_MEDIA = args.prefetch_media
+    READ_LATENCY = max(0.0, args.read_latency)
+    USE_CACHE = not args.no_cache
+    open_transform_cache(args.cache, max(0, args.cache_size) << 20)
+    RELATED_K = max(0, args.related)
+    LQIP = args.lqip and IMAGE_DIMS
+    if LQIP and _load_pil() is None:
+        print("WARN --lqip needs Pillow (pip install Pillow); skipping placeholders")
+        LQIP = False
+    options_fp = render_options_fingerprint()
+
+    t_start = time.perf_counter()
+    prof = None
+    if args.pstats:
+        import cProfile
+        prof = cProfile.Profile()
+        prof.enable()
+
+    prev = load_manifest() if (args.incremental or args.watch) else None
+    if prev is None:
+        with profile_stage("clean_destination"):
+            clean_destination()
+    elif STRICT_LINKS:
+        stage_changed_content()
+    prev_notes = prev["notes"] if prev else {}
+    prev_media = prev["media"] if prev else {}
+    IMAGE_META.clear()
+    IMAGE_META.update(prev.get("image_meta", {}) if prev else {})
+    if prev is not None:
+        load_search_cache()
+    else:
+        SEARCH_DOCS.clear()
+
+    with profile_stage("section_indexes"):
+        for sec in SECTIONS:
+            ensure_index_for_section(sec)
+
+    with profile_stage("vault_index"):
+        vault_notes = list(iter_vault_notes())
+        set_vault_index(build_vault_index(rel for _, rel in vault_notes))
+        index_fp = vault_index_fingerprint(VAULT_INDEX)
+    # 렌더링 옵션이 바뀌었으면 모든 노트를, 링크 대상 목록이 바뀌었으면 wikilink 해석이 달라진 노트만 다시
+    stale = set()
+    if prev is not None and (prev.get("index") != index_fp or prev.get("options", "") != options_fp):
+        options_changed = prev.get("options", "") != options_fp
+        stale = {rel for _, rel in vault_notes if rel in prev_notes
+                 and (options_changed or not _links_unchanged(rel, prev_notes[rel]))}
+
+    notes, media_dirs = {}, {}
+    todo, stamps = [], {}
+    n_skipped = 0
+
+    with profile_stage("scan_notes"):
+        # 내용이 필요한 노트만 순서대로 미리 읽음 (한 번 읽은 원본은 해시, 링크, 변환에 같이 씀)
+        need = {p for p, rel in vault_notes if _needs_read(p, prev_notes.get(rel), rel in stale)}
+        ahead, sources = read_ahead(p for p, _ in vault_notes if p in need), {}
+        for src_path, rel in vault_notes:
+            old = prev_notes.get(rel)
+            data = next(ahead)[1] if src_path in need else None
+            stamp = source_stamp(src_path, old, data)
+            if data is not None:
+                sources[rel] = decode_source(data)
+            media_dirs.setdefault(doc_parent_of(rel), os.path.dirname(src_path))
+            fresh = bool(old) and rel not in stale and old.get("hash") == stamp["hash"]
+            if link_graph_enabled():
+                stamp["links"] = (old["links"] if fresh and "links" in old else
+                                  scan_note_links(sources[rel] if rel in sources else read_note(src_path), rel))
+            stamps[rel] = stamp
+
+    with profile_stage("link_graph"):
+        # 옵션이 같으면 지난 실행의 그래프에서 바뀐 노트의 간선만 고침
+        if prev is not None and prev.get("graph") == link_graph_options():
+            seed_link_graph({rel: e["links"] for rel, e in prev_notes.items() if "links" in e},
+                            {rel: e.get("graph", "") for rel, e in prev_notes.items()})
+        else:
+            reset_link_graph()
+        graph_fps = update_link_graph({rel: st["links"] for rel, st in stamps.items() if "links" in st})
+
+    # 참조를 정본 URL 로 바꾸려면 렌더링 전에 모든 media 파일의 내용 해시가 필요
+    n_hashed = 0
+    with profile_stage("media_index"):
+        if media_index_enabled():
+            n_hashed = build_media_index(media_dirs, prev.get("media_hashes", {}) if prev else {})
+        else:
+            clear_media_index()
+
+    for src_path, rel in vault_notes:
+        old, stamp = prev_notes.get(rel), stamps[rel]
+        stamp["graph"] = graph_fps.get(rel, "")
+        if (old and rel not in stale and old.get("hash") == stamp["hash"]
+                and _outputs_exist(old.get("outputs", [])) and _images_unchanged(old)
+                and _search_doc_current(rel, {**old, **stamp}) and old.get("graph", "") == stamp["graph"]
+                and _preview_current(old) and _media_urls_unchanged(old)):
+            notes[rel] = {**old, **stamp}
+            sources.pop(rel, None)
+            n_skipped += 1
+            continue
+        todo.append((src_path, rel))
+
+    with profile_stage("render_notes"):
+        ensure_link_graph(rel for _, rel in todo)
+        render_notes(todo, stamps, notes, verbose=prev is not None, sources=sources)
+    n_updated = len(todo)
+
+    # --strict: 끊어진 링크가 있으면 content/ 로 옮기거나 static/ 에 쓰기 전에 중단
+    if STRICT_LINKS and not SINK.dry and any(e.get("dangling") for e in notes.values()):
+        discard_staged_content()
+        n_dangling = report_dangling_links(notes)
+        sys.exit(f"\n{n_dangling} dangling wikilink(s); aborting before publishing anything (--strict).")
+
+    if STAGED:
+        with profile_stage("commit_content"):
+            commit_staged_content(prune=prev is None)
+
+    # media 폴더는 노트마다가 아니라 폴더 단위로 한 번만 동기화
+    media, media_todo, sigs = {}, {}, {}
+    set_media_wanted(r for e in notes.values() for r in e.get("media_refs", []))
+    with profile_stage("scan_media"):
+        for doc_parent_rel in sorted(media_dirs):
+            src_doc_dir = media_dirs[doc_parent_rel]
+            media_src = os.path.join(src_doc_dir, "media")
+            if not os.path.isdir(media_src):
+                continue
+            sig, refs = media_stamp(media_src), media_refs_fingerprint(doc_parent_rel)
+            old = prev_media.get(doc_parent_rel)
+            if (old and old.get("sig") == sig and old.get("refs") == refs
+                    and _outputs_exist(old.get("outputs", []))):
+                media[doc_parent_rel] = old
+                continue
+            media_todo[doc_parent_rel] = src_doc_dir
+            sigs[doc_parent_rel] = {"sig": sig, "refs": refs}
+
+    with profile_stage("copy_media"):
+        for doc_parent_rel, outputs in sorted(run_media_jobs(media_todo).items()):
+            media[doc_parent_rel] = {**sigs[doc_parent_rel], "outputs": outputs}
+            if prev is not None:
+                print(f"{op_label('SYNC')} static/media/{doc_parent_rel}")
+
+    with profile_stage("derivatives"):
+        derivatives = sync_derivatives(notes, prev.get("derivatives", {}) if prev else {})
+    with profile_stage("media_manifest"):
+        sync_media_manifest(media)
+
+    if SEARCH_INDEX:
+        with profile_stage("search_index"):
+            n_shards = sync_search_index(notes)
+    with profile_stage("archive_manifest"):
+        sync_archive_manifests(notes)
+    if LINK_PREVIEWS:
+        with profile_stage("link_previews"):
+            sync_link_previews(notes)
+    with profile_stage("page_weights"):
+        PAGE_WEIGHT_ROWS.clear()
+        weights = page_weights(notes)
+        write_page_weights(weights)
+
+    n_deleted = 0
+    with profile_stage("prune"):
+        for rel in sorted(set(prev_notes) - set(notes)):
+            remove_outputs(prev_notes[rel].get("outputs", []))
+            n_deleted += 1
+        prune_media({o for m in media.values() for o in m["outputs"]} | set(derivatives))
+
+    with profile_stage("save_manifest"):
+        save_manifest(notes, media, index_fp, derivatives=derivatives, options=options_fp,
+                      graph=link_graph_options(), image_meta=referenced_image_meta(notes),
+                      media_hashes=MEDIA_HASHES)
+
+    planned = " (planned)" if SINK.dry else ""
+    if prev is not None:
+        print(f"\n{n_updated} updated, {n_skipped} unchanged, {n_deleted} removed{planned}")
+    if prev is None:
+        print(f"content{planned}: " + ", ".join(f"{v} {k}" for k, v in STAGE_STATS.items()))
+    print(f"media{planned}: " + ", ".join(f"{v} {k}" for k, v in MEDIA_STATS.items()))
+    if MEDIA_CANONICAL:
+        print(f"media dedup: {len(MEDIA_CANONICAL)} duplicate file(s) served from "
+              f"{len(MEDIA_CANONICAL_SOURCES)} canonical cop{'y' if len(MEDIA_CANONICAL_SOURCES) == 1 else 'ies'}"
+              f" ({n_hashed} hashed)")
+    if derivatives:
+        print(f"derivatives{planned}: " + ", ".join(f"{v} {k}" for k, v in DERIVATIVE_STATS.items()))
+    if SEARCH_INDEX:
+        print(f"search: {n_shards} of {len(SEARCH_SHARDS)} shards rebuilt")
+    if TRANSFORM_CACHE:
+        print("transform cache: " + ", ".join(f"{v} {k}" for k, v in TRANSFORM_CACHE.stats.items()))
+    print_resolver_stats()
+    if SINK.dry:
+        print_dry_run(SINK, args.diff)
+
+    if prof is not None:
+        import pstats
+        prof.disable()
+        prof.dump_stats(args.pstats)
+        print(f"\ncProfile stats written to {args.pstats} (main process only)")
+        pstats.Stats(prof).sort_stats("cumulative").print_stats(20)
+    if PROFILE:
+        report = profile_report(time.perf_counter() - t_start)
+        print_profile(report)
+        if args.profile_json:
+            with open(args.profile_json, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            print(f"profile report written to {args.profile_json}")
+
+    report_missing_media(notes)
+    n_heavy = report_page_weights(weights)
+    n_dangling = report_dangling_links(notes)
+    if n_dangling and STRICT_LINKS:
+        sys.exit(f"\n{n_dangling} dangling wikilink(s); aborting (--strict).")
+    if n_heavy and STRICT_BUDGET:
+        sys.exit(f"\n{n_heavy} page(s) over the {_fmt_bytes(PAGE_BUDGET)} page budget; aborting (--strict-budget).")
+    print("\nDone." if SINK.dry else "\nDone. Now run: zola serve")
+
+    if args.watch:
+        PROFILE = False
+        watch_vault(args.poll, args.debounce)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+# 검색 shard (static/search/**) 에 draft 와 ignored_content 페이지가 들어가지 않는지
+#   python3 -m pytest tests/
+
+import os, sys, io, tempfile, contextlib, unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+
+import sync_obsidian_to_zola as sync
+
+
+NOTES = {
+    "glossary/GL-001.md": '---\ntitle: "Open Entry"\ndoc_no: 1\n---\nA published note about quillwort.\n',
+    "glossary/GL-002.md": '---\ntitle: "Hidden Draft Title"\ndoc_no: 2\ndraft: true\n---\nUnreleased zephyrine notes.\n',
+    "shop/SH-001.md": '---\ntitle: "Shop Item"\ndoc_no: 3\n---\nIgnored marzipanic listing.\n',
+}
+SECRETS = ("hidden", "draft", "zephyrine", "marzipanic", "gl-002", "sh-001")
+
+
+def _make_site(tmp: str) -> tuple[str, str]:
+    vault, dest = os.path.join(tmp, "vault"), os.path.join(tmp, "site")
+    for rel, text in NOTES.items():
+        p = os.path.join(vault, rel)
+        os.makedirs(os.path.dirname(p), exist_ok=True)
+        with open(p, "w", encoding="utf-8") as f:
+            f.write(text)
+    os.makedirs(dest)
+    with open(os.path.join(dest, "config.toml"), "w", encoding="utf-8") as f:
+        f.write('ignored_content = ["content/shop/**"]\n')
+    return vault, dest
+
+
+class SearchShardVisibilityTest(unittest.TestCase):
+    def assert_public_only(self, files: dict[str, str]):
+        self.assertTrue(files, "no search shards were written")
+        self.assertNotIn("static/search/en/shop.json", files)
+        text = "\n".join(files.values()).lower()
+        self.assertIn("quillwort", text)
+        for word in SECRETS:
+            self.assertNotIn(word, text)
+
+    def test_cli_skips_drafts_and_ignored_content(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            vault, dest = _make_site(tmp)
+            with contextlib.redirect_stdout(io.StringIO()):
+                sync.main(["--vault", vault, "--dest", dest, "--no-cache"])
+            files = {}
+            for dirpath, _, filenames in os.walk(os.path.join(dest, sync.SEARCH_DIR)):
+                for fn in filenames:
+                    p = os.path.join(dirpath, fn)
+                    with open(p, encoding="utf-8") as f:
+                        files[os.path.relpath(p, dest).replace(os.sep, "/")] = f.read()
+            self.assert_public_only(files)
+
+    def test_pipeline_skips_drafts_and_ignored_content(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            vault, dest = _make_site(tmp)
+            sink = sync.SyncPipeline(vault=vault, config_toml=os.path.join(dest, "config.toml"),
+                                     media=False).run(sync.DictSink())
+            files = {k: v.decode("utf-8") for k, v in sink.files.items() if k.startswith(sync.SEARCH_DIR + "/")}
+            self.assert_public_only(files)
+
+
+if __name__ == "__main__":
+    unittest.main()